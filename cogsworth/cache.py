@@ -0,0 +1,253 @@
+import os
+import glob
+import json
+import uuid
+import hashlib
+import numpy as np
+import pandas as pd
+import h5py as h5
+import cosmic
+from cosmic.evolve import Evolve
+
+__all__ = ["EvolutionCache"]
+
+
+class EvolutionCache():
+    """A content-addressed, on-disk cache of COSMIC stellar evolution results
+
+    Each binary is identified by a hash of its row in the initial binary table (ignoring its ``bin_num``),
+    the ``BSE_settings``, the BCM timestep conditions and the COSMIC version. This means that evolving the
+    same binaries again (e.g. when only changing galactic settings like the potential) can skip COSMIC
+    entirely. Results are stored in blocks (one per call to :meth:`evolve`) and the least recently used
+    blocks are deleted when the cache grows larger than `max_size`.
+
+    Parameters
+    ----------
+    directory : `str`
+        Directory in which to store the cache (created if it doesn't already exist)
+    max_size : `float`, optional
+        Maximum size of the cache in bytes, by default 10 GB. Set to None for no limit.
+    """
+    def __init__(self, directory, max_size=10 * 1024**3):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+        self._index = None
+
+    def __repr__(self):
+        return (f"<{self.__class__.__name__} - {len(self.block_files)} blocks, "
+                f"{self.size / 1024**2:1.1f} MB in {self.directory}>")
+
+    @property
+    def block_files(self):
+        """The files storing each block of cached binaries"""
+        return sorted(glob.glob(os.path.join(self.directory, "block-*.h5")))
+
+    @property
+    def size(self):
+        """The total size of the cache in bytes"""
+        return sum(os.path.getsize(block_file) for block_file in self.block_files)
+
+    @property
+    def index(self):
+        """A dictionary mapping each cached binary's key to the block file that contains it"""
+        if self._index is None:
+            self._index = {}
+            for block_file in self.block_files:
+                with h5.File(block_file, "r") as f:
+                    for key in f["keys"][...].astype(str):
+                        self._index[key] = block_file
+        return self._index
+
+    def get_keys(self, initialbinarytable, BSEDict, timestep_conditions=[]):
+        """Get the cache key of each binary in an initial binary table
+
+        Parameters
+        ----------
+        initialbinarytable : :class:`~pandas.DataFrame`
+            Initial binaries (or initC table) to evolve
+        BSEDict : `dict`
+            BSE settings to use for the evolution
+        timestep_conditions : `list`, optional
+            Timestep conditions for the BCM table, by default []
+
+        Returns
+        -------
+        keys : :class:`~numpy.ndarray`
+            Key for each binary
+        """
+        settings = json.dumps({"BSE_settings": BSEDict, "timestep_conditions": timestep_conditions,
+                               "cosmic": cosmic.__version__}, sort_keys=True,
+                              default=lambda x: np.asarray(x).tolist())
+        settings_hash = hashlib.sha256(settings.encode()).hexdigest()[:16]
+
+        # hash each row (ignoring labels), numbering any identical rows so each binary has a unique key
+        rows = initialbinarytable.drop(columns=[col for col in ["bin_num", "index"]
+                                                if col in initialbinarytable])
+        values = pd.DataFrame(rows[sorted(rows.columns)].to_numpy(dtype=float))
+        row_hashes = pd.util.hash_pandas_object(values, index=False).values
+        occurrence = pd.Series(row_hashes).groupby(row_hashes).cumcount().values
+        return np.array([f"{settings_hash}-{row_hash:016x}-{n}"
+                         for row_hash, n in zip(row_hashes, occurrence)])
+
+    def evolve(self, initialbinarytable, BSEDict, pool=None, timestep_conditions=[], evolve=None):
+        """Evolve binaries with COSMIC, reusing any results that are already in the cache
+
+        Only binaries that are missing from the cache are evolved with :meth:`cosmic.evolve.Evolve.evolve`
+        (and then added to the cache), the rest are read from the cache and relabelled with their new
+        ``bin_num``.
+
+        Parameters
+        ----------
+        initialbinarytable : :class:`~pandas.DataFrame`
+            Initial binaries (or initC table) to evolve
+        BSEDict : `dict`
+            BSE settings to use for the evolution
+        pool : :class:`multiprocessing.Pool`, optional
+            Pool to use for evolving the binaries, by default None
+        timestep_conditions : `list`, optional
+            Timestep conditions for the BCM table, by default []
+        evolve : `function`, optional
+            Function to use for evolving any binaries that aren't cached, by default
+            :meth:`cosmic.evolve.Evolve.evolve`. Must take the same arguments as this function.
+
+        Returns
+        -------
+        bpp, bcm, initC, kick_info : :class:`~pandas.DataFrame`
+            The same tables as returned by :meth:`cosmic.evolve.Evolve.evolve`
+        """
+        # label the binaries in the same way as COSMIC would
+        if "bin_num" not in initialbinarytable:
+            initialbinarytable = initialbinarytable.assign(bin_num=np.arange(len(initialbinarytable)))
+        bin_nums = initialbinarytable["bin_num"].values
+        keys = self.get_keys(initialbinarytable, BSEDict, timestep_conditions)
+        hit = np.array([key in self.index for key in keys], dtype=bool)
+
+        tables = {"bpp": [], "bcm": [], "initC": [], "kick_info": []}
+
+        # read any cached binaries from their blocks
+        key_to_bin_num = dict(zip(keys[hit], bin_nums[hit]))
+        for block_file in set(self.index[key] for key in keys[hit]):
+            for name, table in self._read_block(block_file, key_to_bin_num).items():
+                tables[name].append(table)
+
+        # evolve the rest and add them to the cache
+        if (~hit).any():
+            evolve = Evolve.evolve if evolve is None else evolve
+            bpp, bcm, initC, kick_info = evolve(initialbinarytable=initialbinarytable[~hit],
+                                                BSEDict=BSEDict, pool=pool,
+                                                timestep_conditions=timestep_conditions)
+            evolved = {"bpp": bpp, "bcm": bcm, "initC": initC, "kick_info": kick_info}
+            for name, table in evolved.items():
+                tables[name].append(table)
+
+            # evolving the initC would give the same results so store those keys too
+            initC_keys = self.get_keys(initC, BSEDict, timestep_conditions)
+            block_file = self._write_block(np.concatenate((keys[~hit], initC_keys)),
+                                           np.concatenate((bin_nums[~hit], initC["bin_num"].values)),
+                                           evolved)
+            self._evict(keep=block_file)
+
+        # put everything back in the original order
+        order = pd.Series(np.arange(len(bin_nums)), index=bin_nums)
+        for name in tables:
+            if len(tables[name]) == 0:
+                tables[name] = None
+                continue
+            table = pd.concat(tables[name])
+            tables[name] = table.iloc[np.argsort(order.loc[table["bin_num"].values].values, kind="stable")]
+
+        return tables["bpp"], tables["bcm"], tables["initC"], tables["kick_info"]
+
+    def _read_block(self, block_file, key_to_bin_num):
+        """Read the binaries with particular keys from a block, relabelling their bin_nums
+
+        Parameters
+        ----------
+        block_file : `str`
+            File containing the block
+        key_to_bin_num : `dict`
+            Mapping from the keys of the desired binaries to their new bin_nums
+
+        Returns
+        -------
+        tables : `dict`
+            The bpp, bcm, initC and kick_info tables for the selected binaries
+        """
+        with h5.File(block_file, "r") as f:
+            block_keys = f["keys"][...].astype(str)
+            block_bin_nums = f["bin_nums"][...]
+            names = [name for name in ["bpp", "bcm", "initC", "kick_info"] if name in f]
+        wanted = np.isin(block_keys, list(key_to_bin_num.keys()))
+        old_to_new = {old: key_to_bin_num[key]
+                      for old, key in zip(block_bin_nums[wanted], block_keys[wanted])}
+
+        tables = {}
+        for name in names:
+            table = pd.read_hdf(block_file, key=name)
+            table = table[table["bin_num"].isin(list(old_to_new.keys()))].copy()
+            new_bin_nums = table["bin_num"].map(old_to_new).values
+            table["bin_num"] = new_bin_nums
+            table.index = new_bin_nums
+            tables[name] = table
+
+        # mark the block as recently used
+        os.utime(block_file)
+        return tables
+
+    def _write_block(self, keys, bin_nums, tables):
+        """Write a new block of binaries to the cache
+
+        Parameters
+        ----------
+        keys : :class:`~numpy.ndarray`
+            Keys of the binaries in the block
+        bin_nums : :class:`~numpy.ndarray`
+            bin_num of each key in the tables
+        tables : `dict`
+            The bpp, bcm, initC and kick_info tables of the binaries
+
+        Returns
+        -------
+        block_file : `str`
+            The file containing the new block
+        """
+        name = uuid.uuid4().hex
+        temp_file = os.path.join(self.directory, f"tmp-{name}.h5")
+        block_file = os.path.join(self.directory, f"block-{name}.h5")
+
+        # write to a temporary file first so that interrupted writes don't corrupt the cache
+        for key, table in tables.items():
+            if table is not None:
+                table.to_hdf(temp_file, key=key)
+        with h5.File(temp_file, "a") as f:
+            f.create_dataset("keys", data=keys.astype("S"))
+            f.create_dataset("bin_nums", data=bin_nums)
+        os.replace(temp_file, block_file)
+
+        for key in keys:
+            self.index[key] = block_file
+        return block_file
+
+    def _evict(self, keep=None):
+        """Delete the least recently used blocks until the cache is smaller than `max_size` (never deleting
+        the block in `keep`)"""
+        if self.max_size is None:
+            return
+        block_files = sorted(self.block_files, key=os.path.getmtime)
+        sizes = [os.path.getsize(block_file) for block_file in block_files]
+        total_size = sum(sizes)
+
+        removed = set()
+        for block_file, size in zip(block_files, sizes):
+            if total_size <= self.max_size:
+                break
+            if block_file == keep:
+                continue
+            os.remove(block_file)
+            removed.add(block_file)
+            total_size -= size
+
+        if len(removed) > 0:
+            self._index = {key: block_file for key, block_file in self.index.items()
+                           if block_file not in removed}
@@ -144,8 +144,8 @@ def _get_rel_speed(orbits, potential):
     # create gala phase space positions based on them
     wf = gd.PhaseSpacePosition(pos=posf.T, vel=velf.T)
 
-    # calculate the circular velocities at those locations
-    v_circ = potential.circular_velocity(q=wf.pos.xyz)
+    # calculate the circular velocities at those locations (at the end of the orbits)
+    v_circ = potential.circular_velocity(q=wf.pos.xyz, t=orbits[0].t[-1] if len(orbits) > 0 else 0.0)
 
     # get the cylindrical velocities and calculate the relative speeds compared to the circular velocity
     v_R = wf.represent_as("cylindrical").vel.d_rho
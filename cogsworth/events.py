@@ -66,3 +66,16 @@ def identify_events(p):
                     "phase": initC[f"phase_sn_{j + 1:0d}"] if f"phase_sn_{j + 1:0d}" in initC else None,
                 })
     return primary_events_list, secondary_events_list
+
+
+def _get_event_key(event):
+    """Convert an event into a hashable key that identifies it"""
+    return (event["time"].to(u.Myr).value, *event["delta_v_sys_xyz"].to(u.km / u.s).value,
+            event["inc"], event["phase"])
+
+
+def _get_events_key(events):
+    """Convert a list of events (or None) into a hashable key that identifies them"""
+    if events is None:
+        return None
+    return tuple(_get_event_key(event) for event in events)
@@ -0,0 +1,82 @@
+import numpy as np
+
+__all__ = ["get_single_star_remnant_type", "remnant_type_filter"]
+
+
+def get_single_star_remnant_type(mass, metallicity, bh_mass=20.0):
+    """Predict the type of remnant that a single star would form based on its initial mass and metallicity
+
+    This uses the metallicity-dependent mass above which carbon ignites (:math:`M_{\\rm up}`) and above which
+    it ignites centrally (:math:`M_{\\rm ec}`) from `Hurley+2000
+    <https://ui.adsabs.harvard.edu/abs/2000MNRAS.315..543H/abstract>`_ (as used in COSMIC) and a simple
+    threshold for black hole formation.
+
+    Parameters
+    ----------
+    mass : `float` or :class:`~numpy.ndarray`
+        Initial mass of the star(s) in solar masses
+    metallicity : `float` or :class:`~numpy.ndarray`
+        Metallicity of the star(s)
+    bh_mass : `float`, optional
+        Initial mass above which stars form black holes in solar masses, by default 20.0
+
+    Returns
+    -------
+    kstar : :class:`~numpy.ndarray`
+        Predicted remnant type (11: CO WD, 12: ONe WD, 13: NS, 14: BH)
+    """
+    mass, metallicity = np.broadcast_arrays(np.asarray(mass, dtype=float),
+                                            np.asarray(metallicity, dtype=float))
+    log_z = np.log10(np.clip(metallicity, 1e-4, 0.03) / 0.02)
+    m_up = np.maximum(6.11044 + 1.02167 * log_z, 5.0)
+    m_ec = m_up + 1.8
+
+    kstar = np.full(mass.shape, 11)
+    kstar[mass >= m_up] = 12
+    kstar[mass >= m_ec] = 13
+    kstar[mass >= bh_mass] = 14
+    return kstar
+
+
+def remnant_type_filter(initial_binaries, final_kstar1, final_kstar2=list(range(16)), mass_margin=0.8,
+                        bh_mass=20.0):
+    """Find the binaries that could end up with certain final stellar types
+
+    This is deliberately conservative. A binary is only removed if the target types for one of its stars are
+    all neutron stars or black holes and even a single star with the total mass of the binary (increased by
+    a factor of ``1 / mass_margin``) would form a lighter remnant. Neither star can grow beyond the total
+    mass of the binary and the threshold for neutron stars is :math:`M_{\\rm up}` (rather than
+    :math:`M_{\\rm ec}`) to allow for electron-capture supernovae and accretion-induced collapse.
+
+    Parameters
+    ----------
+    initial_binaries : :class:`~pandas.DataFrame`
+        Initial binaries (must have ``mass_1``, ``mass_2`` and ``metallicity`` columns)
+    final_kstar1 : `list`
+        Target final stellar types of the primary
+    final_kstar2 : `list`, optional
+        Target final stellar types of the secondary, by default all types
+    mass_margin : `float`, optional
+        Fraction of the minimum initial mass for each remnant type that the total mass of a binary must
+        reach for it to be kept, by default 0.8
+    bh_mass : `float`, optional
+        Initial mass above which single stars form black holes in solar masses, by default 20.0
+
+    Returns
+    -------
+    keep : :class:`~numpy.ndarray`
+        Boolean mask of the binaries that could reach the target types
+    """
+    total_mass = initial_binaries["mass_1"].values + initial_binaries["mass_2"].values
+    max_kstar = get_single_star_remnant_type(total_mass / mass_margin, initial_binaries["metallicity"].values,
+                                             bh_mass=bh_mass)
+
+    # anything heavy enough for an ONe WD could become a neutron star
+    max_kstar[max_kstar == 12] = 13
+
+    keep = np.ones(len(initial_binaries), dtype=bool)
+    for final_kstar in [final_kstar1, final_kstar2]:
+        final_kstar = np.atleast_1d(final_kstar)
+        if np.all(np.isin(final_kstar, [13, 14])):
+            keep &= max_kstar >= final_kstar.min()
+    return keep
@@ -4,7 +4,7 @@ import pandas as pd
 
 from cosmic.sample.initialbinarytable import InitialBinaryTable
 
-from ..pop import Population
+from ..pop import Population, _random_stage
 from ..sfh import StarFormationHistory
 
 from .utils import dispersion_from_virial_parameter
@@ -53,11 +53,6 @@ class HydroPopulation(Population):
         self.cluster_radius = cluster_radius
         self.cluster_mass = cluster_mass
         self.virial_parameter = virial_parameter
-        self._subset_inds = self.star_particles.index.values
-        if subset is not None and isinstance(subset, int):
-            self._subset_inds = np.random.choice(self._subset_inds, size=subset, replace=False)
-        elif subset is not None:
-            self._subset_inds = subset
         if "n_binaries" not in kwargs:
             kwargs["n_binaries"] = None
 
@@ -65,6 +60,13 @@ class HydroPopulation(Population):
         base_sampling_params.update(sampling_params)
         super().__init__(sampling_params=base_sampling_params, **kwargs)
 
+        self._subset_inds = self.star_particles.index.values
+        if subset is not None and isinstance(subset, int):
+            self._subset_inds = self._get_rng("particle_subset").choice(self._subset_inds, size=subset,
+                                                                        replace=False)
+        elif subset is not None:
+            self._subset_inds = subset
+
         if snapshot_type is not None:
             if snapshot_type.lower() == "fire":
                 self.__citations__.append("FIRE")
@@ -129,7 +131,9 @@ class HydroPopulation(Population):
                                  timestep_size=self.timestep_size, BSE_settings=self.BSE_settings,
                                  sampling_params=self.sampling_params,
                                  store_entire_orbits=self.store_entire_orbits,
-                                 virial_parameter=self.virial_parameter, cluster_radius=self.cluster_radius)
+                                 virial_parameter=self.virial_parameter, cluster_radius=self.cluster_radius,
+                                 seed=self.seed)
+        new_pop._random_calls = self._random_calls.copy()
 
         new_pop.n_binaries = len(bin_nums)
         new_pop.n_binaries_match = len(bin_nums)
@@ -191,6 +195,7 @@ class HydroPopulation(Population):
               "which one so I can't automate this citation, please cite the relevant paper(s) (e.g. for FIRE "
               "snapshots see here: http://flathub.flatironinstitute.org/fire)")
 
+    @_random_stage("initial_binaries")
     def sample_initial_binaries(self):
         """Sample initial binaries from the star particles in the snapshot"""
         initial_binaries_list = [None for _ in range(len(self.star_particles))]
@@ -241,9 +246,10 @@ class HydroPopulation(Population):
         v_y = particles["v_y"].values * u.km / u.s
         v_z = particles["v_z"].values * u.km / u.s
 
-        pos = np.random.normal([x.to(u.kpc).value, y.to(u.kpc).value, z.to(u.kpc).value],
-                               self.cluster_radius.to(u.kpc).value / np.sqrt(3),
-                               size=(3, self.n_binaries_match)) * u.kpc
+        rng = self._get_rng("initial_galaxy")
+        pos = rng.normal([x.to(u.kpc).value, y.to(u.kpc).value, z.to(u.kpc).value],
+                         self.cluster_radius.to(u.kpc).value / np.sqrt(3),
+                         size=(3, self.n_binaries_match)) * u.kpc
 
         v_R = (x * v_x + y * v_y) / (x**2 + y**2)**0.5
         v_T = (x * v_y - y * v_x) / (x**2 + y**2)**0.5
@@ -251,11 +257,11 @@ class HydroPopulation(Population):
         vel_units = u.km / u.s
         dispersion = dispersion_from_virial_parameter(self.virial_parameter,
                                                       self.cluster_radius, self.cluster_mass)
-        v_R, v_T, v_z = np.random.normal([v_R.to(vel_units).value,
-                                          v_T.to(vel_units).value,
-                                          v_z.to(vel_units).value],
-                                         dispersion.to(vel_units).value / np.sqrt(3),
-                                         size=(3, self.n_binaries_match)) * vel_units
+        v_R, v_T, v_z = rng.normal([v_R.to(vel_units).value,
+                                    v_T.to(vel_units).value,
+                                    v_z.to(vel_units).value],
+                                   dispersion.to(vel_units).value / np.sqrt(3),
+                                   size=(3, self.n_binaries_match)) * vel_units
 
         self._initial_galaxy = StarFormationHistory(self.n_binaries_match, immediately_sample=False)
         self._initial_galaxy._tau = self._initial_binaries["tphysf"].values * u.Myr
@@ -1,8 +1,16 @@
 from gala.units import galactic
 import gala.potential as gp
+import astropy.units as u
+import numpy as np
 import logging
 
-__all__ = ["get_snapshot_potential"]
+__all__ = ["get_snapshot_potential", "get_time_interpolated_potential"]
+
+# how far beyond the first and last snapshot the potential is held constant
+_TIME_PADDING = 1e6 * u.Myr
+
+# interpolation types that can't overshoot, and so stay constant between the padding and snapshot knots
+_INTERPOLATION_METHODS = ["linear", "steffen"]
 
 
 def get_snapshot_potential(snap, components=[{"label": "star", "attr": "s", "r_s": 3},
@@ -56,3 +64,78 @@ def get_snapshot_potential(snap, components=[{"label": "star", "attr": "s", "r_s
         pot.save(out_path)
 
     return pot
+
+
+def get_time_interpolated_potential(potentials, times, interpolation_method="linear"):
+    """Combine the potentials of several snapshots into a single time-dependent potential
+
+    The parameters of each component of the potentials are interpolated in time (with
+    :class:`~gala.potential.potential.TimeInterpolatedPotential`) and the components are combined in a
+    :class:`~gala.potential.potential.CCompositePotential`, so orbits are integrated entirely in C and cost
+    only slightly more than in a static potential. The potential is held constant before the first and after
+    the last snapshot.
+
+    Parameters
+    ----------
+    potentials : `list` of :class:`Potential <gala.potential.potential.PotentialBase>`
+        The potential at each time (e.g. from :func:`get_snapshot_potential`), these must all have the same
+        components (with the same names and classes)
+    times : :class:`~astropy.units.Quantity` [time]
+        The time of each potential, in increasing order. These are on the same clock as the orbit
+        integration of a :class:`~cogsworth.pop.Population`, i.e. from the start of star formation (0) to the
+        present day (``max_ev_time``).
+    interpolation_method : `str`, optional
+        How to interpolate the parameters between times, either "linear" or "steffen" (a monotonic cubic
+        spline), by default "linear". Other GSL interpolation types overshoot around the padding that holds
+        the potential constant outside of the snapshots and so aren't supported.
+
+    Returns
+    -------
+    pot : :class:`gala.potential.potential.CCompositePotential`
+        The time-dependent potential, which can be used as the ``galactic_potential`` of a
+        :class:`~cogsworth.pop.Population`
+
+    Raises
+    ------
+    ValueError
+        If there are fewer than two potentials, the times don't match the potentials or aren't increasing, or
+        the potentials have different components, or the ``interpolation_method`` isn't supported
+    """
+    if not hasattr(gp, "TimeInterpolatedPotential"):      # pragma: no cover
+        raise ImportError(("Time-dependent potentials need a version of `gala` that includes "
+                           "`TimeInterpolatedPotential`, try `pip install --upgrade gala`"))
+
+    times = u.Quantity(times).to(u.Myr)
+    if len(potentials) < 2 or len(potentials) != len(times):
+        raise ValueError("You must supply at least two potentials and one time for each of them")
+    if np.any(np.diff(times) <= 0):
+        raise ValueError("`times` must be in increasing order")
+    if interpolation_method not in _INTERPOLATION_METHODS:
+        raise ValueError(f"`interpolation_method` must be one of {_INTERPOLATION_METHODS}")
+
+    # split each potential into its components and check that they all match
+    components = [dict(pot.items()) if isinstance(pot, (gp.CompositePotential, gp.CCompositePotential))
+                  else {"main": pot} for pot in potentials]
+    for comps in components[1:]:
+        if (list(comps) != list(components[0])
+                or any(comps[label].__class__ is not components[0][label].__class__ for label in comps)):
+            raise ValueError("All potentials must have the same components (with the same classes)")
+
+    # add a copy of the first and last potentials far from the snapshots to keep the potential constant there
+    knots = np.concatenate(([times[0] - _TIME_PADDING], times, [times[-1] + _TIME_PADDING]))
+
+    pot = gp.CCompositePotential()
+    for label, first in components[0].items():
+        params = {}
+        for name in first.parameters:
+            values = u.Quantity([comps[label].parameters[name] for comps in components])
+
+            # only interpolate the parameters that change
+            if np.all(values == values[0]):
+                params[name] = values[0]
+            else:
+                params[name] = np.concatenate((values[:1], values, values[-1:]))
+        pot[label] = gp.TimeInterpolatedPotential(first.__class__, knots,
+                                                  interpolation_method=interpolation_method,
+                                                  units=first.units, **params)
+    return pot
@@ -6,7 +6,9 @@ import gala.potential as gp
 import astropy.coordinates as coords
 import astropy.units as u
 
-__all__ = ["get_kick_differential", "integrate_orbit_with_events"]
+from cogsworth.events import _get_event_key
+
+__all__ = ["get_kick_differential", "integrate_orbit_with_events", "integrate_orbit_realisations"]
 
 
 def get_kick_differential(delta_v_sys_xyz, phase=None, inclination=None):
@@ -45,7 +47,7 @@ def get_kick_differential(delta_v_sys_xyz, phase=None, inclination=None):
 
 
 def integrate_orbit_with_events(w0, t1, t2, dt, potential=gp.MilkyWayPotential(), events=None,
-                                store_all=True, quiet=False):
+                                store_all=True, quiet=False, previous_orbit=None, previous_events=None):
     """Integrate :class:`~gala.dynamics.PhaseSpacePosition` in a 
     :class:`Potential <gala.potential.potential.PotentialBase>` with events that occur at certain times
 
@@ -73,6 +75,13 @@ def integrate_orbit_with_events(w0, t1, t2, dt, potential=gp.MilkyWayPotential()
         PhaseSpacePosition will be stored - this cuts down on memory usage.
     quiet : `bool`, optional
         Whether to silence warning messages about failing orbits
+    previous_orbit : :class:`~gala.dynamics.Orbit`, optional
+        An orbit that was previously integrated from the same initial conditions but with `previous_events`.
+        If the events before the first changed event are identical (and it occurs at the same time) then
+        the orbit up to that event is copied from `previous_orbit` and only the rest is integrated again.
+        Requires that the entire previous orbit was stored.
+    previous_events : `list`, optional
+        The events used when integrating `previous_orbit`
 
     Returns
     -------
@@ -97,20 +106,28 @@ def integrate_orbit_with_events(w0, t1, t2, dt, potential=gp.MilkyWayPotential()
             # work out what the timesteps would be without kicks
             timesteps = gi.parse_time_specification(units=[u.s], t1=t1, t2=t2, dt=dt) * u.s
 
-            # start the cursor at the first timestep
-            time_cursor = timesteps[0]
-            current_w0 = w0
-
-            # keep track of the orbit data throughout
-            orbit_data = []
+            # start the cursor at the first timestep (or just before the first changed event if possible)
+            resume_point = _get_resume_point(timesteps, t1, events, previous_orbit,
+                                             previous_events) if n == 0 else None
+            if resume_point is None:
+                time_cursor, current_w0, orbit_data, first_event = timesteps[0], w0, [], 0
+            else:
+                time_cursor, current_w0, orbit_data, first_event = resume_point
 
             # loop over the events
-            for event in events:
+            for i, event in enumerate(events):
+                # skip any events that were already copied from the previous orbit
+                if i < first_event:
+                    continue
+
                 # find the timesteps that occur before the kick
                 timestep_mask = (timesteps >= time_cursor) & (timesteps < (t1 + event["time"]))
 
+                # if resuming then we're already at the moment of the first event
+                if resume_point is not None and i == first_event:
+                    pass
                 # integrate up to the moment of the event (if there are any timesteps before it)
-                if any(timestep_mask):
+                elif any(timestep_mask):
                     matching_timesteps = timesteps[timestep_mask]
 
                     # integrate the orbit over these timesteps
@@ -170,3 +187,201 @@ def integrate_orbit_with_events(w0, t1, t2, dt, potential=gp.MilkyWayPotential()
         full_orbit = full_orbit[-1:]
 
     return full_orbit
+
+
+def integrate_orbit_realisations(w0, t1, t2, dt, potential=gp.MilkyWayPotential(), events=None,
+                                 phases=None, inclinations=None, previous_orbit=None):
+    """Integrate many realisations of an orbit with events, in which only the orientations of the kicks
+    differ, and return the final phase space position of each
+
+    The orbit is identical in every realisation until the first event, so this part is only integrated once
+    (or copied from `previous_orbit`). After this, all realisations are integrated together as a batch.
+
+    Parameters
+    ----------
+    w0 : :class:`~gala.dynamics.PhaseSpacePosition`
+        Initial phase space position
+    t1 : :class:`~astropy.units.Quantity` [time]
+        Integration start time
+    t2 : :class:`~astropy.units.Quantity` [time]
+        Integration end time
+    dt : :class:`~astropy.units.Quantity` [time]
+        Integration initial timestep size (integrator may adapt timesteps)
+    potential : :class:`Potential <gala.potential.potential.PotentialBase>`, optional
+        Potential in which you which to integrate the orbits, by default the
+        :class:`~gala.potential.potential.MilkyWayPotential`
+    events : `list`
+        Events that occur during the orbit evolution (see :func:`integrate_orbit_with_events`). The `phase`
+        and `inc` of each event are only used for removing its kick from `previous_orbit`.
+    phases : :class:`~numpy.ndarray`, shape (len(events), n_realisations)
+        Orbital phase angle of each event in each realisation in radians
+    inclinations : :class:`~numpy.ndarray`, shape (len(events), n_realisations)
+        Inclination to the Galactic plane of each event in each realisation in radians
+    previous_orbit : :class:`~gala.dynamics.Orbit`, optional
+        An entire orbit that was previously integrated from the same initial conditions with `events`. If
+        given, the orbit before the first event is copied from it rather than integrated again.
+
+    Returns
+    -------
+    final_w : :class:`~gala.dynamics.PhaseSpacePosition`
+        Final phase space position of each realisation. If the orbit integration failed for any reason
+        then None is returned.
+    """
+    phases, inclinations = np.atleast_2d(phases), np.atleast_2d(inclinations)
+    n_realisations = phases.shape[1]
+
+    # allow two retries with smaller timesteps
+    MAX_DT_RESIZE = 2
+    for n in range(MAX_DT_RESIZE):
+        try:
+            success = False
+
+            # work out what the timesteps would be without kicks
+            timesteps = gi.parse_time_specification(units=[u.s], t1=t1, t2=t2, dt=dt) * u.s
+
+            # get the phase space position just before the first event, which is the same in every realisation
+            ind = -1
+            if n == 0 and previous_orbit is not None and len(previous_orbit.t) == len(timesteps)\
+                    and all(event["phase"] is not None and event["inc"] is not None for event in events):
+                ind, w = _get_state_before_event(timesteps, t1, events[0]["time"], previous_orbit, events)
+            if ind < 0:
+                timestep_mask = timesteps < t1 + events[0]["time"]
+                if timestep_mask.sum() > 1:
+                    w = potential.integrate_orbit(w0, t=timesteps[timestep_mask],
+                                                  Integrator=gi.DOPRI853Integrator)[-1]
+                else:           # pragma: no cover
+                    w = w0
+                ind = max(timestep_mask.sum() - 1, 0)
+            time_cursor = timesteps[ind]
+
+            # copy the phase space position for each realisation
+            w = _as_batch(w, n_realisations)
+
+            for i, event in enumerate(events):
+                # integrate every realisation up to the moment of the event
+                timestep_mask = (timesteps >= time_cursor) & (timesteps < (t1 + event["time"]))
+                if i > 0 and timestep_mask.sum() > 1:
+                    matching_timesteps = timesteps[timestep_mask]
+                    w = _as_batch(potential.integrate_orbit(w, t=matching_timesteps,
+                                                            Integrator=gi.DOPRI853Integrator)[-1],
+                                  n_realisations)
+                    time_cursor = matching_timesteps[-1]
+
+                # apply a differently oriented kick to each realisation
+                kick_differential = get_kick_differential(delta_v_sys_xyz=event["delta_v_sys_xyz"],
+                                                          phase=phases[i], inclination=inclinations[i])
+                w = gd.PhaseSpacePosition(pos=w.pos, vel=w.vel + kick_differential)
+
+            # evolve the rest of the orbits out
+            if time_cursor < timesteps[-1]:
+                w = _as_batch(potential.integrate_orbit(w, t=timesteps[timesteps >= time_cursor],
+                                                        Integrator=gi.DOPRI853Integrator)[-1],
+                              n_realisations)
+
+            success = True
+            break
+
+        except Exception:   # pragma: no cover
+            dt /= 8.
+
+    # if the orbit failed event after resizing then just return None
+    if not success:   # pragma: no cover
+        return None
+
+    return w
+
+
+def _as_batch(w, n_realisations):
+    """Reshape a :class:`~gala.dynamics.PhaseSpacePosition` into a batch of `n_realisations` positions
+    (repeating it if it is a single position)"""
+    xyz, v_xyz = w.xyz.reshape(3, -1), w.v_xyz.reshape(3, -1)
+    if xyz.shape[1] != n_realisations:
+        xyz, v_xyz = np.repeat(xyz, n_realisations, axis=1), np.repeat(v_xyz, n_realisations, axis=1)
+    return gd.PhaseSpacePosition(pos=xyz, vel=v_xyz)
+
+
+def _get_resume_point(timesteps, t1, events, previous_orbit, previous_events):
+    """Work out where to resume the integration of an orbit that was previously integrated with other events
+
+    Parameters
+    ----------
+    timesteps : :class:`~astropy.units.Quantity` [time]
+        Timesteps of the orbit
+    t1 : :class:`~astropy.units.Quantity` [time]
+        Integration start time
+    events : `list`
+        New events for the orbit
+    previous_orbit : :class:`~gala.dynamics.Orbit`
+        Orbit integrated with `previous_events`
+    previous_events : `list`
+        Events used for `previous_orbit`
+
+    Returns
+    -------
+    resume_point : `tuple` or None
+        The time cursor, phase space position (just before the first changed event), orbit data up to that
+        point and index of the first changed event. None if the integration cannot be resumed.
+    """
+    if previous_orbit is None or previous_events is None or len(previous_orbit.t) != len(timesteps):
+        return None
+
+    # the orbit must have been integrated on the same timesteps and all events must be reproducible
+    if not np.allclose(previous_orbit.t.to(u.Myr).value, timesteps.to(u.Myr).value):
+        return None
+    if any(event["phase"] is None or event["inc"] is None for event in list(events) + list(previous_events)):
+        return None
+
+    # find the first event that changed, which must happen at the same time as before (if it existed)
+    n_same = 0
+    while (n_same < min(len(events), len(previous_events))
+           and _get_event_key(events[n_same]) == _get_event_key(previous_events[n_same])):
+        n_same += 1
+    if n_same == len(events) or (n_same < len(previous_events)
+                                 and events[n_same]["time"] != previous_events[n_same]["time"]):
+        return None
+
+    ind, current_w0 = _get_state_before_event(timesteps, t1, events[n_same]["time"], previous_orbit,
+                                              previous_events[n_same:])
+    if ind < 0:         # pragma: no cover
+        return None
+
+    orbit_data = [previous_orbit.data[:ind]] if ind > 0 else []
+    return timesteps[ind], current_w0, orbit_data, n_same
+
+
+def _get_state_before_event(timesteps, t1, event_time, previous_orbit, previous_events):
+    """Get the phase space position of a previously integrated orbit just before an event
+
+    Parameters
+    ----------
+    timesteps : :class:`~astropy.units.Quantity` [time]
+        Timesteps of the orbit
+    t1 : :class:`~astropy.units.Quantity` [time]
+        Integration start time
+    event_time : :class:`~astropy.units.Quantity` [time]
+        Time of the event (relative to `t1`)
+    previous_orbit : :class:`~gala.dynamics.Orbit`
+        Orbit integrated with `previous_events`
+    previous_events : `list`
+        Events used for `previous_orbit` that occur at or after `event_time`
+
+    Returns
+    -------
+    ind : `int`
+        Index of the last timestep before the event (-1 if there are none)
+    w : :class:`~gala.dynamics.PhaseSpacePosition`
+        Phase space position at this timestep, before any of the kicks from `previous_events`
+    """
+    ind = np.searchsorted(timesteps, t1 + event_time, side="left") - 1
+    if ind < 0:         # pragma: no cover
+        return ind, None
+
+    # the previous orbit at this timestep already includes any kicks from events between it and the next
+    # timestep, so remove them to get the phase space position before the event
+    w = previous_orbit[ind]
+    vel = w.vel
+    for event in previous_events:
+        if np.searchsorted(timesteps, t1 + event["time"], side="left") - 1 == ind:
+            vel = vel - get_kick_differential(delta_v_sys_xyz=event["delta_v_sys_xyz"],
+                                              phase=event["phase"], inclination=event["inc"])
+    return ind, gd.PhaseSpacePosition(pos=w.pos, vel=vel, frame=w.frame)
@@ -1,6 +1,7 @@
 import time
 import os
-from copy import copy
+from copy import copy, deepcopy
+from functools import partial, wraps
 from multiprocessing import Pool
 import warnings
 import numpy as np
@@ -8,6 +9,7 @@ import astropy.units as u
 import astropy.coordinates as coords
 import h5py as h5
 import pandas as pd
+from scipy.special import ndtri
 from tqdm import tqdm
 import yaml
 import logging
@@ -22,17 +24,44 @@ import gala.dynamics as gd
 from gala.potential.potential.io import to_dict as potential_to_dict, from_dict as potential_from_dict
 
 from cogsworth import sfh
-from cogsworth.kicks import integrate_orbit_with_events
-from cogsworth.events import identify_events
+from cogsworth.cache import EvolutionCache
+from cogsworth.filters import remnant_type_filter
+from cogsworth.kicks import integrate_orbit_with_events, integrate_orbit_realisations
+from cogsworth.events import identify_events, _get_events_key
 from cogsworth.classify import determine_final_classes
 from cogsworth.observables import get_photometry
 from cogsworth.tests.optional_deps import check_dependencies
 from cogsworth.plot import plot_cartoon_evolution, plot_galactic_orbit
-from cogsworth.utils import translate_COSMIC_tables
+from cogsworth.utils import (translate_COSMIC_tables, compact_COSMIC_tables, sobol_uniforms,
+                             _get_compression_kwargs, _register_compression_filters,
+                             _circular_velocity_at_times, _seeded_random_state, _as_seed_sequence,
+                             _spawn_seed, _rng_from_seed)
 
 from cogsworth.citations import CITATIONS
 
-__all__ = ["Population", "EvolvedPopulation", "load", "concat"]
+__all__ = ["Population", "EvolvedPopulation", "load", "merge_files", "concat", "evolve_in_chunks",
+           "sample_in_shards", "bootstrap_estimators"]
+
+
+# each random stage of a population draws from its own streams, spawned from the seed with these keys (and
+# the number of times that the stage has been run)
+_RANDOM_STAGES = {"initial_binaries": 0, "pre_filter": 1, "initial_galaxy": 2, "stellar_evolution": 3,
+                  "sn_phases": 4, "sn_orientations": 5, "observables": 6, "subsample": 7, "bootstrap": 8,
+                  "chunks": 9, "particle_subset": 10, "initial_velocities": 11, "pre_filter_keep": 12,
+                  "sweep": 13}
+
+
+def _random_stage(stage):
+    """Make a method of a :class:`Population` that calls code which draws from NumPy's global random state
+    (e.g. COSMIC, star formation history models or user functions) use the next stream of a stage if the
+    population has a seed (draws that we make ourselves use :meth:`Population._get_rng` instead)"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with _seeded_random_state(self._next_seed(stage)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
 
 
 class Population():
@@ -57,9 +86,15 @@ class Population():
         Any additional parameters to pass to your chosen ``SFH model`` when it is initialised
     galactic_potential : :class:`Potential <gala.potential.potential.PotentialBase>`, optional
         Galactic potential to use for evolving the orbits of binaries, by default
-        :class:`~gala.potential.potential.MilkyWayPotential`
+        :class:`~gala.potential.potential.MilkyWayPotential`. This can also be time-dependent (e.g.
+        interpolated between the potentials of several snapshots with
+        :func:`~cogsworth.hydro.potential.get_time_interpolated_potential`), in which case initial velocities
+        use the circular velocity at the time each binary is born.
     v_dispersion : :class:`~astropy.units.Quantity` [velocity], optional
-        Velocity dispersion to apply relative to the local circular velocity, by default 5*u.km/u.s
+        Velocity dispersion to apply relative to the local circular velocity, by default 5*u.km/u.s. Star
+        formation history models can replace this with their own kinematics (e.g.
+        :class:`~cogsworth.sfh.Wagg2022` with ``age_velocity_relation=True``, see
+        :meth:`~cogsworth.sfh.StarFormationHistory.get_velocity_dispersions`).
     max_ev_time : :class:`~astropy.units.Quantity` [time], optional
         Maximum evolution time for both COSMIC and Gala, by default 12.0*u.Gyr
     timestep_size : :class:`~astropy.units.Quantity` [time], optional
@@ -79,12 +114,55 @@ class Population():
         Whether to store the entire orbit for each binary, by default True. If not then only the final
         PhaseSpacePosition will be stored. This cuts down on both memory usage and disk space used if you
         save the Population (as well as how long it takes to reload the data).
+    compact_evolution_tables : `bool`, optional
+        Whether to compact the COSMIC tables (bpp, bcm and kick_info) after stellar evolution to reduce their
+        memory usage, by default False. See :meth:`compact_tables` for details.
+    evolution_cache : :class:`~cogsworth.cache.EvolutionCache` or `str`, optional
+        A cache of stellar evolution results (or a directory in which to keep one) to use when performing
+        stellar evolution, by default None (no caching). Binaries that have already been evolved with the same
+        settings are read from the cache rather than evolved again.
+    cost_balanced_evolution : `bool`, optional
+        Whether to share binaries between processes based on their expected evolution cost (most expensive
+        first) when performing stellar evolution with multiple processes, by default True. See
+        :func:`evolve_in_chunks` for details.
+    sampling_shards : `int`, optional
+        Number of independent shards to split the sampling of initial binaries into, by default 1. Shards are
+        sampled in parallel when using multiple processes and each has its own random stream, so the sampled
+        binaries don't depend on the number of processes. See :func:`sample_in_shards` for details.
+    pre_filter : `function` or `str`, optional
+        A filter to apply to the initial binaries before stellar evolution to remove any that can't reach
+        the targets of your study, by default None (no filtering). This should take the initial binaries
+        table and return a boolean mask of the binaries to keep (or the probability of keeping each binary,
+        in which case those that are kept are weighted by its inverse, see :attr:`weights`). Use "remnant"
+        to remove binaries that are too light to reach `final_kstar1` and `final_kstar2` (see
+        :func:`~cogsworth.filters.remnant_type_filter`). The mass and number of removed binaries are tracked
+        in :attr:`mass_filtered` and :attr:`n_filtered`, whilst :attr:`mass_binaries` still includes them so
+        that normalisations are unaffected.
+    quasi_random : `bool`, optional
+        Whether to use quasi-random (scrambled Sobol') sampling for the initial galaxy, the velocity
+        dispersion and the orientation of supernova kicks, by default False. This spreads the samples more
+        evenly than pseudo-random draws so that the sky distribution and kinematics converge with fewer
+        binaries. The initial galaxy uses the ``qmc`` mode of your ``sfh_model`` (see
+        :class:`~cogsworth.sfh.StarFormationHistory`), unless ``qmc`` is set in `sfh_params`.
+    seed : `int`, :class:`~numpy.random.SeedSequence` or :class:`~numpy.random.Generator`, optional
+        Seed for the random numbers of the population, by default None (use NumPy's global random state).
+        Each stage (sampling the initial binaries and galaxy, stellar evolution, supernova orientations,
+        observations etc.) gets its own independent stream spawned from this seed, and a new stream each
+        time it is run again (e.g. a second call to :meth:`subsample` gives a different subsample). Every
+        stage is therefore reproducible regardless of the number of processes or which other stages are run,
+        and the global random state is left unchanged. Random numbers drawn by ``cogsworth`` itself use a
+        :class:`~numpy.random.Generator` for each stream, whilst stages that call code which draws from
+        NumPy's global random state (COSMIC, the ``sfh_model`` and any ``pre_filter``) seed it temporarily,
+        so these shouldn't be run from several threads at once. A :class:`~numpy.random.Generator` is only
+        used to draw the entropy of a :class:`~numpy.random.SeedSequence`, which is stored in :attr:`seed`.
     """
     def __init__(self, n_binaries, processes=8, m1_cutoff=0, final_kstar1=list(range(16)),
                  final_kstar2=list(range(16)), sfh_model=sfh.Wagg2022, sfh_params={},
                  galactic_potential=gp.MilkyWayPotential(), v_dispersion=5 * u.km / u.s,
                  max_ev_time=12.0*u.Gyr, timestep_size=1 * u.Myr, BSE_settings={}, ini_file=None,
-                 sampling_params={}, bcm_timestep_conditions=[], store_entire_orbits=True):
+                 sampling_params={}, bcm_timestep_conditions=[], store_entire_orbits=True,
+                 compact_evolution_tables=False, evolution_cache=None, cost_balanced_evolution=True,
+                 sampling_shards=1, pre_filter=None, quasi_random=False, seed=None):
 
         # require a sensible number of binaries if you are not targetting total mass
         if not ("sampling_target" in sampling_params and sampling_params["sampling_target"] == "total_mass"):
@@ -105,6 +183,17 @@ class Population():
         self.timestep_size = timestep_size
         self.pool = None
         self.store_entire_orbits = store_entire_orbits
+        self.compact_evolution_tables = compact_evolution_tables
+        self.evolution_cache = (EvolutionCache(evolution_cache) if isinstance(evolution_cache, str)
+                                else evolution_cache)
+        self.cost_balanced_evolution = cost_balanced_evolution
+        self.sampling_shards = sampling_shards
+        self.pre_filter = pre_filter
+        self.quasi_random = quasi_random
+        self.seed = _as_seed_sequence(seed)
+        self._random_calls = {}
+        self.mass_filtered = 0.0
+        self.n_filtered = 0
 
         self._file = None
         self._initial_binaries = None
@@ -118,6 +207,7 @@ class Population():
         self._initC = None
         self._kick_info = None
         self._orbits = None
+        self._orbit_history = None
         self._classes = None
         self._final_pos = None
         self._final_vel = None
@@ -126,6 +216,7 @@ class Population():
         self._escaped = None
         self._observables = None
         self._bin_nums = None
+        self._weights = None
 
         self.__citations__ = ["cogsworth", "cosmic", "gala"]
 
@@ -235,8 +326,14 @@ class Population():
                                  v_dispersion=self.v_dispersion, max_ev_time=self.max_ev_time,
                                  timestep_size=self.timestep_size, BSE_settings=self.BSE_settings,
                                  sampling_params=self.sampling_params,
-                                 store_entire_orbits=self.store_entire_orbits)
+                                 store_entire_orbits=self.store_entire_orbits,
+                                 compact_evolution_tables=self.compact_evolution_tables,
+                                 evolution_cache=self.evolution_cache,
+                                 cost_balanced_evolution=self.cost_balanced_evolution,
+                                 sampling_shards=self.sampling_shards, pre_filter=self.pre_filter,
+                                 quasi_random=self.quasi_random, seed=self.seed)
         new_pop.n_binaries_match = new_pop.n_binaries
+        new_pop._random_calls = self._random_calls.copy()
 
         # proxy for checking whether sampling has been done
         if self._mass_binaries is not None:
@@ -244,6 +341,8 @@ class Population():
             new_pop._mass_singles = self._mass_singles
             new_pop._n_singles_req = self._n_singles_req
             new_pop._n_bin_req = self._n_bin_req
+            new_pop.mass_filtered = self.mass_filtered
+            new_pop.n_filtered = self.n_filtered
 
         bin_num_to_ind = {num: i for i, num in enumerate(self.bin_nums)}
         sort_idx = np.argsort(list(bin_num_to_ind.keys()))
@@ -252,6 +351,8 @@ class Population():
 
         if self._initial_galaxy is not None:
             new_pop._initial_galaxy = self._initial_galaxy[inds]
+        if self._weights is not None:
+            new_pop._weights = self._weights[inds]
         if self._initC is not None:
             new_pop._initC = self._initC.loc[bin_nums]
         if self._initial_binaries is not None:
@@ -297,6 +398,46 @@ class Population():
         """Create a copy of the population"""
         return self[:]
 
+    def subsample(self, probabilities):
+        """Randomly subsample the population, weighting the binaries that are kept to preserve normalisation
+
+        Each binary is kept with the given probability and the :attr:`weights` of those that are kept are
+        divided by it. This means that common systems can be thinned out (e.g. before expensive orbit
+        integration or observables) whilst rare ones are all kept and the weighted population still gives
+        correctly normalised numbers and rates.
+
+        Parameters
+        ----------
+        probabilities : `float` or :class:`~numpy.ndarray`
+            Probability of keeping each binary (in the same order as :attr:`bin_nums`)
+
+        Returns
+        -------
+        subsample : :class:`~cogsworth.pop.Population`
+            The subsampled population
+        """
+        probabilities = np.broadcast_to(np.asarray(probabilities, dtype=float), (len(self),))
+        if (probabilities < 0).any() or (probabilities > 1).any():
+            raise ValueError("Probabilities must be between 0 and 1")
+        keep = self._get_rng("subsample").uniform(size=len(self)) < probabilities
+        new_pop = self[keep]
+        new_pop.weights = new_pop.weights / probabilities[keep]
+        return new_pop
+
+    def _next_seed(self, stage):
+        """Get the :class:`~numpy.random.SeedSequence` for the next run of a random stage (None if there is
+        no :attr:`seed`), each run of a stage gets a new stream so that it gives new random numbers"""
+        if self.seed is None:
+            return None
+        n_calls = self._random_calls.get(stage, 0)
+        self._random_calls[stage] = n_calls + 1
+        return _spawn_seed(self.seed, _RANDOM_STAGES[stage], n_calls)
+
+    def _get_rng(self, stage):
+        """Get a :class:`~numpy.random.Generator` for the next run of a random stage (or NumPy's global
+        random state if there is no :attr:`seed`)"""
+        return _rng_from_seed(self._next_seed(stage))
+
     def get_citations(self, filename=None):
         """Print the citations for the packages/papers used in the population"""
         # ask users for a filename to save the bibtex to
@@ -468,6 +609,38 @@ class Population():
             raise ValueError("No population sampled yet, run `sample_initial_binaries` to do so.")
         return self._n_bin_req
 
+    @property
+    def weights(self):
+        """The importance weight of each binary (in the same order as :attr:`bin_nums`).
+
+        A binary with a weight of :math:`w` represents :math:`w` binaries from the unbiased population, so
+        rates and numbers should sum weights rather than count systems (e.g. see :meth:`get_class_counts`).
+        Weights are set by biased sampling (e.g. :meth:`subsample` or a :attr:`pre_filter` that returns
+        probabilities) and are 1 by default.
+
+        Returns
+        -------
+        weights : :class:`~numpy.ndarray`
+            The weight of each binary
+        """
+        if self._weights is None:
+            return np.ones(len(self))
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights):
+        weights = np.broadcast_to(np.asarray(weights, dtype=float), (len(self),)).copy()
+        if (weights < 0).any() or not np.isfinite(weights).all():
+            raise ValueError("Weights must be finite and non-negative")
+        self._weights = weights
+        if self._observables is not None:
+            self._observables["weight"] = self._weights
+
+    def _get_orbit_weights(self):
+        """Get the weight of each orbit (i.e. with the weights of disrupted binaries repeated for their
+        secondaries, in the same order as :attr:`final_pos`)"""
+        return np.concatenate((self.weights, self.weights[self.disrupted]))
+
     @property
     def initial_binaries(self):
         """The initial binaries that were sampled to generate the population.
@@ -493,10 +666,10 @@ class Population():
         # if not, try to load them from the file
         if self._initial_binaries is None and self._file is not None:       # pragma: no cover
             try:
-                self._initial_binaries = pd.read_hdf(self._file, key="initial_binaries")
+                self._initial_binaries = _read_table(self._file, key="initial_binaries")
             except KeyError:
                 try:
-                    self._initial_binaries = pd.read_hdf(self._file, key="initC")
+                    self._initial_binaries = _read_table(self._file, key="initC")
                 except KeyError:
                     raise ValueError(f"No initial binaries found in population file ({self._file})")
         elif self._initial_binaries is None:        # pragma: no cover
@@ -523,7 +696,7 @@ class Population():
             If no stellar evolution has been performed yet.
         """
         if self._bpp is None and self._file is not None:
-            self._bpp = pd.read_hdf(self._file, key="bpp")
+            self._bpp = _read_table(self._file, key="bpp")
         elif self._bpp is None:
             raise ValueError("No stellar evolution performed yet, run `perform_stellar_evolution` to do so.")
         return self._bpp
@@ -555,7 +728,7 @@ class Population():
             has_bcm = None
             with h5.File(self._file, "r") as f:
                 has_bcm = "bcm" in f
-            self._bcm = pd.read_hdf(self._file, key="bcm") if has_bcm else None
+            self._bcm = _read_table(self._file, key="bcm") if has_bcm else None
         elif self._bcm is None:
             if len(np.ravel(self.bcm_timestep_conditions)) == 0:        # pragma: no cover
                 logging.getLogger("cogsworth").warning(("cogsworth warning: You haven't set any timestep "
@@ -584,7 +757,7 @@ class Population():
             If no stellar evolution has been performed yet.
         """
         if self._initC is None and self._file is not None:
-            self._initC = pd.read_hdf(self._file, key="initC")
+            self._initC = _read_table(self._file, key="initC")
         elif self._initC is None:
             raise ValueError("No stellar evolution performed yet, run `perform_stellar_evolution` to do so.")
         return self._initC
@@ -608,7 +781,7 @@ class Population():
             If no stellar evolution has been performed yet.
         """
         if self._kick_info is None and self._file is not None:
-            self._kick_info = pd.read_hdf(self._file, key="kick_info")
+            self._kick_info = _read_table(self._file, key="kick_info")
         if self._kick_info is None:
             raise ValueError("No stellar evolution performed yet, run `perform_stellar_evolution` to do so.")
         return self._kick_info
@@ -636,6 +809,7 @@ class Population():
         # otherwise if orbits are uncalculated but a file is provided then load the orbits from the file
         elif self._orbits is None:
             # load the entire file into memory
+            _register_compression_filters()
             with h5.File(self._file, "r") as f:
                 if "orbits" not in f:
                     raise ValueError(f"No orbits found in population file ({self._file})")
@@ -697,6 +871,23 @@ class Population():
             self._classes = determine_final_classes(population=self)
         return self._classes
 
+    def get_class_counts(self, weighted=True):
+        """Count the number of binaries in each class (see :attr:`classes`)
+
+        Parameters
+        ----------
+        weighted : `bool`, optional
+            Whether to sum the :attr:`weights` of the binaries in each class rather than count them, by
+            default True
+
+        Returns
+        -------
+        counts : :class:`~pandas.Series`
+            The (weighted) number of binaries in each class
+        """
+        weights = self.weights if weighted else np.ones(len(self))
+        return pd.Series(weights @ self.classes.values.astype(float), index=self.classes.columns)
+
     @property
     def final_pos(self):
         """The final position of each binary (or star from a disrupted binary) in the galaxy.
@@ -775,7 +966,7 @@ class Population():
             v_curr = np.sum(self.final_vel**2, axis=1)**(0.5)
 
             # 0.5 * m * v_esc**2 = m * (-Phi)
-            v_esc = np.sqrt(-2 * self.galactic_potential(self.final_pos.T))
+            v_esc = np.sqrt(-2 * self.galactic_potential.energy(self.final_pos.T, t=self.max_ev_time))
             self._escaped = v_curr >= v_esc
         return self._escaped
 
@@ -841,10 +1032,83 @@ class Population():
         if with_timing:
             print(f"Overall: {time.time() - start:1.1f}s")
 
+    def create_population_until_converged(self, estimators, rtol=0.05, max_chunks=10, n_bootstrap=100,
+                                          with_timing=True):
+        """Create a population in chunks of :attr:`n_binaries` until some statistics of it have converged.
+
+        After each chunk is created (with :meth:`create_population`) it is merged into this population with
+        :func:`concat` and each estimator is evaluated with bootstrap error bars (see
+        :func:`bootstrap_estimators`). New chunks are created until the relative error of every estimator
+        is below `rtol` (or `max_chunks` is reached), so you don't need to guess how many binaries are
+        needed up front.
+
+        Parameters
+        ----------
+        estimators : `dict`
+            Functions that take a population and return the statistic to track (a `float` or an array, e.g.
+            a histogram), keyed by a name for each. These must use the :attr:`weights` of the binaries since
+            the bootstrap resamples binaries by reweighting them. For example, a class count
+            ``lambda p: p.get_class_counts()["co-1"]``, a rate per solar mass
+            ``lambda p: p.weights[p.disrupted].sum() / p.mass_binaries`` or a sky map histogram
+            ``lambda p: np.bincount(p.get_healpix_inds(nside=4), weights=p._get_orbit_weights(),
+            minlength=192)``.
+        rtol : `float`, optional
+            Relative precision at which to stop, by default 0.05. For array statistics this is the ratio of
+            the norms of the bootstrap errors and the statistic.
+        max_chunks : `int`, optional
+            Maximum number of chunks to create, by default 10
+        n_bootstrap : `int`, optional
+            Number of bootstrap resamples to use for the error bars, by default 100
+        with_timing : `bool`, optional
+            Whether to print messages about the progress, by default True
+
+        Returns
+        -------
+        history : :class:`~pandas.DataFrame`
+            The number of binaries and the relative error of each estimator after each chunk
+
+        Raises
+        ------
+        ValueError
+            If the population has already been sampled
+        """
+        if self._initial_binaries is not None:
+            raise ValueError("Population has already been sampled, start with a new population instead")
+
+        # keep an untouched copy of the settings for creating each new chunk
+        template = deepcopy(self)
+
+        history = []
+        for i in range(max_chunks):
+            if i == 0:
+                self.create_population(with_timing=False)
+            else:
+                chunk = deepcopy(template)
+                chunk.seed = _spawn_seed(template.seed, _RANDOM_STAGES["chunks"], i)
+                chunk.create_population(with_timing=False)
+                self.__dict__.update(concat(self, chunk).__dict__)
+
+            _, errors = bootstrap_estimators(self, estimators, n_bootstrap=n_bootstrap)
+            history.append({"n_binaries": self.n_binaries, "n_binaries_match": self.n_binaries_match,
+                            **{f"{name}_rel_err": err for name, err in errors.items()}})
+            if with_timing:
+                print(f"Chunk {i + 1}: {self.n_binaries_match} binaries, relative errors: "
+                      + ", ".join(f"{name}={err:1.2g}" for name, err in errors.items()))
+
+            if all(err <= rtol for err in errors.values()):
+                break
+        else:
+            logging.getLogger("cogsworth").warning(f"Estimators did not converge to rtol={rtol} within "
+                                                   f"{max_chunks} chunks, consider increasing `max_chunks`")
+
+        return pd.DataFrame(history)
+
+    @_random_stage("initial_galaxy")
     def sample_initial_galaxy(self):
         """Sample the initial galactic times, positions and velocities"""
         # initialise the initial galaxy class with correct number of binaries
-        self._initial_galaxy = self.sfh_model(size=self.n_binaries_match, **self.sfh_params)
+        sfh_params = {"qmc": True, **self.sfh_params} if self.quasi_random else self.sfh_params
+        self._initial_galaxy = self.sfh_model(size=self.n_binaries_match, **sfh_params)
 
         # add relevant citations
         self.__citations__.extend([c for c in self._initial_galaxy.__citations__ if c != "cogsworth"])
@@ -856,20 +1120,28 @@ class Population():
         # work out the initial velocities of each binary
         vel_units = u.km / u.s
 
-        # calculate the Galactic circular velocity at the initial positions
-        v_circ = self.galactic_potential.circular_velocity(q=[self._initial_galaxy.x,
-                                                              self._initial_galaxy.y,
-                                                              self._initial_galaxy.z]).to(vel_units)
+        # calculate the Galactic circular velocity at the initial positions (at the time of birth)
+        t_births = self.max_ev_time - self._initial_galaxy.tau
+        v_circ = _circular_velocity_at_times(self.galactic_potential, q=self._initial_galaxy.positions,
+                                             t=t_births).to_value(vel_units)
+
+        # add some velocity dispersion (from the model, which may depend on the age and component of each
+        # binary) and rotate at the circular velocity minus any asymmetric drift
+        sigma, v_drift = self._initial_galaxy.get_velocity_dispersions(self.v_dispersion, v_circ)
+        rng = self._get_rng("initial_velocities")
+        if self.quasi_random:
+            offsets = ndtri(sobol_uniforms(self.n_binaries_match, dims=3, rng=rng)).T
+        else:
+            offsets = rng.normal(size=(3, self.n_binaries_match))
+        v_R, v_T, v_z = offsets * sigma
+        v_T += v_circ - v_drift
 
-        # add some velocity dispersion
-        v_R, v_T, v_z = np.random.normal([np.zeros_like(v_circ), v_circ, np.zeros_like(v_circ)],
-                                         self.v_dispersion.to(vel_units) / np.sqrt(3),
-                                         size=(3, self.n_binaries_match))
-        v_R, v_T, v_z = v_R * vel_units, v_T * vel_units, v_z * vel_units
-        self._initial_galaxy.v_R = v_R
-        self._initial_galaxy.v_T = v_T
-        self._initial_galaxy.v_z = v_z
+        # store the velocities unit-free (in km/s)
+        self._initial_galaxy._v_R = v_R
+        self._initial_galaxy._v_T = v_T
+        self._initial_galaxy._v_z = v_z
 
+    @_random_stage("initial_binaries")
     def sample_initial_binaries(self, initC=None, overwrite_initC_settings=True, reset_sampled_kicks=True):
         """Sample the initial binary parameters for the population.
 
@@ -887,6 +1159,9 @@ class Population():
         """
         self._bin_nums = None
 
+        # forget the initC of any previous evolution so that the new binaries are the ones that get evolved
+        self._initC = None
+
         # if an initC table is provided then use that instead of sampling
         if initC is not None:
             self._initial_binaries = copy(initC)
@@ -907,13 +1182,26 @@ class Population():
                 raise ValueError(("You've chosen a binary fraction of 0.0 but set `keep_singles=False` (in "
                                   "self.sampling_params), so you'll draw 0 samples...I don't think you "
                                   "wanted to do that?"))
+            sampler_kwargs = dict(binfrac_model=self.BSE_settings["binfrac"],
+                                  SF_start=self.max_ev_time.to(u.Myr).value, SF_duration=0.0, met=0.02,
+                                  size=self.n_binaries, **self.sampling_params)
+            if self.sampling_shards > 1:
+                no_pool_existed = self.pool is None and self.processes > 1
+                if no_pool_existed:
+                    self.pool = Pool(self.processes)
+
+                sample = sample_in_shards(self.final_kstar1, self.final_kstar2, n_shards=self.sampling_shards,
+                                          pool=self.pool, **sampler_kwargs)
+
+                if no_pool_existed:
+                    self.pool.close()
+                    self.pool.join()
+                    self.pool = None
+            else:
+                sample = InitialBinaryTable.sampler('independent', self.final_kstar1, self.final_kstar2,
+                                                    **sampler_kwargs)
             self._initial_binaries, self._mass_singles, self._mass_binaries, self._n_singles_req, \
-                self._n_bin_req = InitialBinaryTable.sampler('independent',
-                                                             self.final_kstar1, self.final_kstar2,
-                                                             binfrac_model=self.BSE_settings["binfrac"],
-                                                             SF_start=self.max_ev_time.to(u.Myr).value,
-                                                             SF_duration=0.0, met=0.02, size=self.n_binaries,
-                                                             **self.sampling_params)
+                self._n_bin_req = sample
 
         # apply the mass cutoff
         self._initial_binaries = self._initial_binaries[self._initial_binaries["mass_1"] >= self.m1_cutoff]
@@ -932,13 +1220,58 @@ class Population():
         self.sample_initial_galaxy()
 
         # update the metallicity and birth times of the binaries to match the galaxy
-        self._initial_binaries["metallicity"] = self._initial_galaxy.Z
-        self._initial_binaries["tphysf"] = self._initial_galaxy.tau.to(u.Myr).value
+        self._initial_binaries["metallicity"] = self._initial_galaxy.Z.value
+        self._initial_binaries["tphysf"] = self._initial_galaxy.tau.to_value(u.Myr)
 
         # ensure metallicities remain in a range valid for COSMIC - original value still in initial_galaxy.Z
         self._initial_binaries.loc[self._initial_binaries["metallicity"] < 1e-4, "metallicity"] = 1e-4
         self._initial_binaries.loc[self._initial_binaries["metallicity"] > 0.03, "metallicity"] = 0.03
 
+        if self.pre_filter is not None:
+            self.apply_pre_filter()
+
+    @_random_stage("pre_filter")
+    def apply_pre_filter(self, pre_filter=None):
+        """Remove any initial binaries that can't reach the targets of your study before evolving them
+
+        The mass and number of removed binaries are added to :attr:`mass_filtered` and :attr:`n_filtered`.
+        The sampled masses used for normalisation (e.g. :attr:`mass_binaries`) still include them. If the
+        filter returns probabilities rather than a boolean mask then each binary is kept with this probability
+        and the :attr:`weights` of those that are kept are divided by it.
+
+        Parameters
+        ----------
+        pre_filter : `function` or `str`, optional
+            Filter to apply, by default :attr:`pre_filter` (see :class:`Population` for the options)
+        """
+        pre_filter = self.pre_filter if pre_filter is None else pre_filter
+        if pre_filter == "remnant":
+            pre_filter = partial(remnant_type_filter, final_kstar1=self.final_kstar1,
+                                 final_kstar2=self.final_kstar2)
+        elif not callable(pre_filter):
+            raise ValueError(f"Invalid `pre_filter` ({pre_filter}), must be a function or 'remnant'")
+
+        keep = np.asarray(pre_filter(self._initial_binaries))
+        if keep.dtype != bool:
+            keep_probability = np.clip(keep.astype(float), 0.0, 1.0)
+            keep = self._get_rng("pre_filter_keep").uniform(size=len(keep_probability)) < keep_probability
+            self.weights = self.weights / np.where(keep, keep_probability, 1.0)
+        removed = self._initial_binaries[~keep]
+        self.mass_filtered += (removed["mass_1"].sum() + removed["mass_2"].sum())
+        self.n_filtered += len(removed)
+
+        if (~keep).any():
+            self._initial_binaries = self._initial_binaries[keep].reset_index(drop=True)
+            self._initial_galaxy = self._initial_galaxy[keep]
+            if self._weights is not None:
+                self._weights = self._weights[keep]
+            self.n_binaries_match = len(self._initial_binaries)
+            self._bin_nums = None
+
+        if self.n_binaries_match == 0:
+            raise ValueError("Your `pre_filter` removed every binary, consider a larger sample size")
+
+    @_random_stage("stellar_evolution")
     def perform_stellar_evolution(self):
         """Perform the (binary) stellar evolution of the sampled binaries"""
         # delete any cached variables
@@ -969,10 +1302,11 @@ class Population():
             ibt = self.initial_binaries if self._initC is None else self._initC
 
             # perform the evolution!
+            evolve = self._get_evolve_function()
             self._bpp, bcm, self._initC, \
-                self._kick_info = Evolve.evolve(initialbinarytable=ibt,
-                                                BSEDict=self.BSE_settings, pool=self.pool,
-                                                timestep_conditions=self.bcm_timestep_conditions)
+                self._kick_info = evolve(initialbinarytable=ibt,
+                                         BSEDict=self.BSE_settings, pool=self.pool,
+                                         timestep_conditions=self.bcm_timestep_conditions)
 
             # only save BCM when it has interesting timesteps
             if self.bcm_timestep_conditions != []:
@@ -983,6 +1317,18 @@ class Population():
             self.pool.join()
             self.pool = None
 
+        self._remove_nan_binaries()
+
+        if self.compact_evolution_tables:
+            self.compact_tables()
+
+    def _remove_nan_binaries(self):
+        """Remove any binaries with NaNs in their final bpp row or kick_info from every table
+
+        The bad binaries are saved to a ``nans.h5`` file and removed from the evolution tables, initial
+        conditions, initial galaxy and weights (new objects are created rather than editing them in place so
+        that any populations sharing them are unaffected).
+        """
         # check if there are any NaNs in the final bpp table rows or the kick_info
         nans = np.isnan(self.final_bpp["sep"])
         kick_info_nans = np.isnan(self._kick_info["delta_vsysx_1"])
@@ -1009,33 +1355,88 @@ class Population():
             self._kick_info = self._kick_info[~self._kick_info["bin_num"].isin(nan_bin_nums)]
             self._initC = self._initC[~self._initC["bin_num"].isin(nan_bin_nums)]
 
-            not_nan = ~self.final_bpp["bin_num"].isin(nan_bin_nums)
-            self._initial_galaxy._tau = self._initial_galaxy._tau[not_nan]
-            self._initial_galaxy._Z = self._initial_galaxy._Z[not_nan]
-            self._initial_galaxy._x = self._initial_galaxy._x[not_nan]
-            self._initial_galaxy._y = self._initial_galaxy._y[not_nan]
-            self._initial_galaxy._z = self._initial_galaxy._z[not_nan]
+            not_nan = ~self.final_bpp["bin_num"].isin(nan_bin_nums).values
+            if self._weights is not None:
+                self._weights = self._weights[not_nan]
+            self._initial_galaxy = self._initial_galaxy[np.flatnonzero(not_nan)]
 
-            for attr in ["v_R", "v_T", "v_z", "_which_comp"]:
-                if hasattr(self._initial_galaxy, attr):
-                    setattr(self._initial_galaxy, attr, getattr(self._initial_galaxy, attr)[not_nan])
-            self._initial_galaxy._size -= n_nan
-
-            # reset final bpp
+            # reset final bpp and bin_nums
             self._final_bpp = None
+            self._bin_nums = None
 
             logging.getLogger("cogsworth").warning((f"{n_nan} bad binaries removed from tables - but "
                                                     "normalisation may be off. I've added the offending "
                                                     "binaries to a `nan.h5` file with their initC, bpp, "
                                                     "and kick_info tables"))
 
-    def perform_galactic_evolution(self, quiet=False, progress_bar=True):
+    def _get_evolve_function(self):
+        """Get the function to use for evolving binaries with COSMIC
+
+        This has the same signature as :meth:`cosmic.evolve.Evolve.evolve` but evolves binaries in
+        cost-balanced chunks when using a pool (see :func:`evolve_in_chunks`) and only evolves binaries that
+        aren't already cached when using an :attr:`evolution_cache`.
+
+        Returns
+        -------
+        evolve : `function`
+            Function for evolving binaries
+        """
+        evolve = Evolve.evolve
+        if self.pool is not None and self.cost_balanced_evolution:
+            evolve = partial(evolve_in_chunks, processes=self.processes)
+        if self.evolution_cache is not None:
+            evolve = partial(self.evolution_cache.evolve, evolve=evolve)
+        return evolve
+
+    def compact_tables(self, float_dtype="float32", quiet=False):
+        """Reduce the memory usage of the COSMIC tables (bpp, bcm and kick_info) by downcasting columns
+
+        Integer-valued labels (e.g. ``kstar_1``, ``evol_type``) are stored as ``int8``, ``bin_num`` as
+        ``int32`` and other float columns (except ``tphys``) as `float_dtype`. Translated labels (see
+        :meth:`translate_tables`) are stored as pandas Categoricals. See
+        :func:`~cogsworth.utils.compact_COSMIC_tables` for details.
+
+        Parameters
+        ----------
+        float_dtype : `str`, optional
+            Floating point type to use for float columns, by default "float32"
+        quiet : `bool`, optional
+            Whether to skip printing how much memory was saved, by default False
+
+        Returns
+        -------
+        saved : `int`
+            Number of bytes saved
+        """
+        before, after = 0, 0
+        for table in ["_bpp", "_bcm", "_kick_info"]:
+            if getattr(self, table) is not None:
+                before += getattr(self, table).memory_usage(deep=True).sum()
+                setattr(self, table, compact_COSMIC_tables(getattr(self, table), float_dtype=float_dtype))
+                after += getattr(self, table).memory_usage(deep=True).sum()
+
+        # reset the cached final bpp so that it is recreated from the compacted table
+        self._final_bpp = None
+
+        if not quiet and before > 0:
+            print((f"Compacted COSMIC tables from {before / 1024**2:1.2f} MB to {after / 1024**2:1.2f} MB "
+                   f"(saved {100 * (1 - after / before):1.0f}%)"))
+        return int(before - after)
+
+    def perform_galactic_evolution(self, quiet=False, progress_bar=True, incremental=False):
         """Use :py:mod:`gala` to perform the orbital integration for each evolved binary
 
         Parameters
         ----------
         quiet : `bool`, optional
             Whether to silence any warnings about failing orbits, by default False
+        incremental : `bool`, optional
+            Whether to only integrate the orbits that changed since this was last run, by default False.
+            Orbits of systems with the same initial conditions and events (e.g. supernova kicks and their
+            orientations) as last time are reused. If only later events changed (e.g. the orientation of the
+            second supernova) then only the part of the orbit from the first changed event is integrated
+            again. Everything is integrated again if the potential, :attr:`max_ev_time`,
+            :attr:`timestep_size` or :attr:`store_entire_orbits` changed.
         """
         # delete any cached variables that are based on orbits
         self._final_pos = None
@@ -1057,29 +1458,18 @@ class Population():
                                                     "performing evolution now."))
             self.perform_stellar_evolution()
 
-        v_phi = (self.initial_galaxy.v_T / self.initial_galaxy.rho)
-        v_X = (self.initial_galaxy.v_R * np.cos(self.initial_galaxy.phi)
-               - self.initial_galaxy.rho * np.sin(self.initial_galaxy.phi) * v_phi)
-        v_Y = (self.initial_galaxy.v_R * np.sin(self.initial_galaxy.phi)
-               + self.initial_galaxy.rho * np.cos(self.initial_galaxy.phi) * v_phi)
-
-        # combine the representation and differentials into a Gala PhaseSpacePosition
-        w0s = gd.PhaseSpacePosition(pos=[a.to(u.kpc).value for a in [self.initial_galaxy.x,
-                                                                     self.initial_galaxy.y,
-                                                                     self.initial_galaxy.z]] * u.kpc,
-                                    vel=[a.to(u.km/u.s).value for a in [v_X, v_Y,
-                                                                        self.initial_galaxy.v_z]] * u.km/u.s)
-
-        # randomly drawn phase and inclination angles as necessary
-        for col in ["phase_sn_1", "phase_sn_2", "inc_sn_1", "inc_sn_2"]:
-            if col not in self.initC:
-                self.initC[col] = np.random.uniform(0, 2 * np.pi, len(self.initC))
+        args = self._get_orbit_args(quiet=quiet)
+        history = self._get_orbit_history(args)
 
-        # identify the pertinent events in the evolution
-        primary_events, secondary_events = identify_events(p=self)
+        # work out which orbits need to be integrated (reusing any that haven't changed if possible)
+        orbits = [None for _ in args]
+        to_integrate = list(range(len(args)))
+        if incremental and self._orbits is not None and self._orbit_history is not None:
+            orbits, to_integrate, args = self._reuse_orbits(args, history)
 
         # if we want to use multiprocessing
-        if self.pool is not None or self.processes > 1:
+        integrate_args = [args[i] for i in to_integrate]
+        if len(integrate_args) > 0 and (self.pool is not None or self.processes > 1):
             # track whether a pool already existed
             pool_existed = self.pool is not None
 
@@ -1087,23 +1477,12 @@ class Population():
             if not pool_existed:
                 self.pool = Pool(self.processes)
 
-            # setup arguments to combine primary and secondaries into a single list
-            primary_args = [(w0s[i], self.max_ev_time - self.initial_galaxy.tau[i], self.max_ev_time,
-                             copy(self.timestep_size), self.galactic_potential,
-                             primary_events[i], self.store_entire_orbits, quiet)
-                            for i in range(self.n_binaries_match)]
-            secondary_args = [(w0s[i], self.max_ev_time - self.initial_galaxy.tau[i], self.max_ev_time,
-                               copy(self.timestep_size), self.galactic_potential,
-                               secondary_events[i], self.store_entire_orbits, quiet)
-                              for i in range(self.n_binaries_match) if secondary_events[i] is not None]
-            args = primary_args + secondary_args
-
             # evolve the orbits from birth until present day
             if progress_bar:
-                orbits = self.pool.starmap(integrate_orbit_with_events,
-                                           tqdm(args, total=self.n_binaries_match))
+                new_orbits = self.pool.starmap(integrate_orbit_with_events,
+                                               tqdm(integrate_args, total=len(integrate_args)))
             else:
-                orbits = self.pool.starmap(integrate_orbit_with_events, args)
+                new_orbits = self.pool.starmap(integrate_orbit_with_events, integrate_args)
 
             # if a pool didn't exist before then close the one just created
             if not pool_existed:
@@ -1112,21 +1491,11 @@ class Population():
                 self.pool = None
         else:
             # otherwise just use a for loop to evolve the orbits from birth until present day
-            orbits = []
-            for i in range(self.n_binaries_match):
-                orbits.append(integrate_orbit_with_events(w0=w0s[i], potential=self.galactic_potential,
-                                                          t1=self.max_ev_time - self.initial_galaxy.tau[i],
-                                                          t2=self.max_ev_time, dt=copy(self.timestep_size),
-                                                          events=primary_events[i], quiet=quiet,
-                                                          store_all=self.store_entire_orbits))
-            for i in range(self.n_binaries_match):
-                if secondary_events[i] is None:
-                    continue
-                orbits.append(integrate_orbit_with_events(w0=w0s[i], potential=self.galactic_potential,
-                                                          t1=self.max_ev_time - self.initial_galaxy.tau[i],
-                                                          t2=self.max_ev_time, dt=copy(self.timestep_size),
-                                                          events=secondary_events[i], quiet=quiet,
-                                                          store_all=self.store_entire_orbits))
+            new_orbits = [integrate_orbit_with_events(*arg) for arg in integrate_args]
+
+        for i, orbit in zip(to_integrate, new_orbits):
+            orbits[i] = orbit
+        self._orbit_history = history
 
         # check for bad orbits
         bad_orbits = np.array([orbit is None for orbit in orbits])
@@ -1151,6 +1520,226 @@ class Population():
 
         self._orbits = np.array(orbits, dtype="object")
 
+    def _get_orbit_history(self, args):
+        """Get a record of the settings and events used for each orbit (for incremental integration)
+
+        Parameters
+        ----------
+        args : `list` of `tuple`
+            Arguments for :func:`~cogsworth.kicks.integrate_orbit_with_events` for each orbit
+
+        Returns
+        -------
+        history : `dict`
+            The settings used for every orbit ("settings") and, for each orbit, its bin_num, initial
+            conditions and events ("orbits")
+        """
+        settings = (yaml.dump(potential_to_dict(self.galactic_potential), default_flow_style=None),
+                    self.max_ev_time.to(u.Myr).value, self.timestep_size.to(u.Myr).value,
+                    self.store_entire_orbits)
+        bin_nums = np.concatenate((self.bin_nums, self.bin_nums[self.disrupted]))
+        initial = [(*arg[0].xyz.to(u.kpc).value, *arg[0].v_xyz.to(u.km / u.s).value, arg[1].to(u.Myr).value)
+                   for arg in args]
+        return {"settings": settings,
+                "orbits": [(bin_num, init, arg[5]) for bin_num, init, arg in zip(bin_nums, initial, args)]}
+
+    def _reuse_orbits(self, args, history):
+        """Match orbits to those from the last orbit integration so that they can be reused
+
+        Parameters
+        ----------
+        args : `list` of `tuple`
+            Arguments for :func:`~cogsworth.kicks.integrate_orbit_with_events` for each orbit
+        history : `dict`
+            Record of the settings and events for each orbit (see :meth:`_get_orbit_history`)
+
+        Returns
+        -------
+        orbits : `list`
+            Orbit for each system (None if it needs to be integrated)
+        to_integrate : `list`
+            Indices of the orbits that need to be integrated
+        args : `list` of `tuple`
+            Updated arguments, including the previous orbit and events for any orbits that can be resumed
+        """
+        orbits = [None for _ in args]
+        to_integrate = list(range(len(args)))
+        if history["settings"] != self._orbit_history["settings"]:
+            return orbits, to_integrate, args
+
+        # index the previous orbits by their binary and initial conditions
+        previous = {}
+        for (bin_num, initial, events), orbit in zip(self._orbit_history["orbits"], self._orbits):
+            if orbit is not None:
+                previous.setdefault((bin_num, initial), []).append((events, orbit))
+
+        to_integrate, args = [], list(args)
+        for i, (bin_num, initial, events) in enumerate(history["orbits"]):
+            candidates = previous.get((bin_num, initial), [])
+            key = _get_events_key(events)
+            matches = [orbit for prev_events, orbit in candidates if _get_events_key(prev_events) == key]
+            if len(matches) > 0:
+                orbits[i] = matches[0]
+                continue
+            to_integrate.append(i)
+
+            # otherwise resume from the previous orbit that shares the most events (if they have any)
+            candidates = [candidate for candidate in candidates if candidate[0] is not None]
+            if events is not None and self.store_entire_orbits and len(candidates) > 0:
+                prev_events, orbit = max(candidates, key=lambda c: _count_shared_events(events, c[0]))
+                args[i] = args[i] + (orbit, prev_events)
+        return orbits, to_integrate, args
+
+    def get_sn_orientation_realisations(self, n_realisations=100, summary=False, progress_bar=True):
+        """Get the present-day positions and velocities of each system for many random orientations of its
+        supernova kicks, without evolving the population again
+
+        The orientation of each supernova kick relative to the Galaxy (``phase_sn_*`` and ``inc_sn_*`` in
+        :attr:`initC`) is drawn randomly, so this gives the uncertainty in the kinematics of each system
+        (e.g. of runaway stars or compact objects). Only systems that experienced a kick are integrated
+        again. Each one starts from its existing orbit just before the first kick (if entire orbits were
+        stored) and all of its realisations are integrated together as a batch.
+
+        Parameters
+        ----------
+        n_realisations : `int`, optional
+            Number of random orientations to draw for each system, by default 100
+        summary : `bool`, optional
+            Whether to return summary statistics for each system instead of every realisation, by default
+            False
+        progress_bar : `bool`, optional
+            Whether to show a progress bar, by default True
+
+        Returns
+        -------
+        final_pos, final_vel : :class:`~astropy.units.Quantity`, shape (len(orbits), n_realisations, 3)
+            Present-day position and velocity of each orbit (in the same order as :attr:`final_pos`) in each
+            realisation. Systems without kicks have the same position in every realisation. Only returned
+            if `summary=False`.
+        summary : :class:`~pandas.DataFrame`
+            The mean and standard deviation of each position (in kpc) and velocity (in km/s) component over
+            the realisations for each orbit, as well as its ``bin_num`` and whether it is a disrupted
+            ``secondary``. Only returned if `summary=True`.
+        """
+        if self._orbits is None and self._file is None:
+            raise ValueError("No orbits calculated yet, run `perform_galactic_evolution` to do so")
+
+        args = self._get_orbit_args(quiet=True)
+        if len(args) != len(self.orbits):           # pragma: no cover
+            raise ValueError("The orbits don't match the population, run `perform_galactic_evolution` again")
+
+        # draw new orientations for each binary (disrupted secondaries share them with their primary)
+        cols = ["phase_sn_1", "phase_sn_2", "inc_sn_1", "inc_sn_2"]
+        rng = self._get_rng("sn_orientations")
+        if self.quasi_random:
+            # share one set of quasi-random points between binaries, each with its own random shift
+            points = sobol_uniforms(n_realisations, dims=len(cols), rng=rng)
+            shifts = rng.uniform(size=(len(self), 1, len(cols)))
+            U = (points[np.newaxis] + shifts) % 1
+            angles = {col: 2 * np.pi * U[..., j] for j, col in enumerate(cols)}
+        else:
+            angles = {col: rng.uniform(0, 2 * np.pi, (len(self), n_realisations)) for col in cols}
+        binary_inds = np.concatenate((np.arange(len(self)), np.flatnonzero(self.disrupted)))
+
+        # only orbits with kicks differ between realisations
+        with_events = [i for i, arg in enumerate(args) if arg[5] is not None and self.orbits[i] is not None]
+        realisation_args = []
+        for i in with_events:
+            w0, t1, t2, dt, potential, events = args[i][:6]
+            b = binary_inds[i]
+            phases = np.array([angles[f"phase_sn_{j + 1}"][b] for j in range(len(events))])
+            incs = np.array([angles[f"inc_sn_{j + 1}"][b] for j in range(len(events))])
+            previous_orbit = self.orbits[i] if self.store_entire_orbits else None
+            realisation_args.append((w0, t1, t2, dt, potential, events, phases, incs, previous_orbit))
+
+        if len(realisation_args) > 0 and (self.pool is not None or self.processes > 1):
+            pool_existed = self.pool is not None
+            if not pool_existed:
+                self.pool = Pool(self.processes)
+
+            if progress_bar:
+                final_ws = self.pool.starmap(integrate_orbit_realisations,
+                                             tqdm(realisation_args, total=len(realisation_args)))
+            else:
+                final_ws = self.pool.starmap(integrate_orbit_realisations, realisation_args)
+
+            if not pool_existed:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+        else:
+            final_ws = [integrate_orbit_realisations(*arg) for arg in realisation_args]
+
+        # start with the current final position of every orbit and then replace those with kicks
+        final_pos = np.repeat(self.final_pos.to(u.kpc).value[:, np.newaxis], n_realisations, axis=1)
+        final_vel = np.repeat(self.final_vel.to(u.km / u.s).value[:, np.newaxis], n_realisations, axis=1)
+        for i, w in zip(with_events, final_ws):
+            if w is None:           # pragma: no cover
+                final_pos[i], final_vel[i] = np.inf, np.inf
+            else:
+                final_pos[i] = w.xyz.to(u.kpc).value.T
+                final_vel[i] = w.v_xyz.to(u.km / u.s).value.T
+
+        if not summary:
+            return final_pos * u.kpc, final_vel * u.km / u.s
+
+        stats = {"bin_num": self.bin_nums[binary_inds],
+                 "secondary": np.arange(len(binary_inds)) >= len(self)}
+        for values, labels in [(final_pos, ["x", "y", "z"]), (final_vel, ["v_x", "v_y", "v_z"])]:
+            for j, label in enumerate(labels):
+                stats[f"{label}_mean"] = values[:, :, j].mean(axis=1)
+                stats[f"{label}_std"] = values[:, :, j].std(axis=1)
+        return pd.DataFrame(stats)
+
+    def _get_orbit_args(self, quiet=False):
+        """Get the arguments for :func:`~cogsworth.kicks.integrate_orbit_with_events` for each orbit
+
+        Parameters
+        ----------
+        quiet : `bool`, optional
+            Whether to silence any warnings about failing orbits, by default False
+
+        Returns
+        -------
+        args : `list` of `tuple`
+            Arguments for each orbit, the first `len(self)` are for bound binaries and primaries and the rest
+            are for disrupted secondaries (i.e. in the same order as :attr:`orbits`)
+        """
+        # work with the unit-free arrays of the galaxy (kpc, km/s and Gyr) to avoid Quantity overheads
+        galaxy = self.initial_galaxy
+        phi = np.arctan2(galaxy._y, galaxy._x)
+        v_X = galaxy._v_R * np.cos(phi) - galaxy._v_T * np.sin(phi)
+        v_Y = galaxy._v_R * np.sin(phi) + galaxy._v_T * np.cos(phi)
+
+        # combine the representation and differentials into a Gala PhaseSpacePosition
+        w0s = gd.PhaseSpacePosition(pos=np.array([galaxy._x, galaxy._y, galaxy._z]) * u.kpc,
+                                    vel=np.array([v_X, v_Y, galaxy._v_z]) * u.km / u.s)
+        t_births = self.max_ev_time - galaxy._tau * u.Gyr
+
+        # randomly drawn phase and inclination angles as necessary
+        cols = ["phase_sn_1", "phase_sn_2", "inc_sn_1", "inc_sn_2"]
+        if any(col not in self.initC for col in cols):
+            rng = self._get_rng("sn_phases")
+            U = sobol_uniforms(len(self.initC), dims=len(cols), rng=rng) if self.quasi_random else None
+            for j, col in enumerate(cols):
+                if col not in self.initC:
+                    self.initC[col] = (2 * np.pi * U[:, j] if self.quasi_random
+                                       else rng.uniform(0, 2 * np.pi, len(self.initC)))
+
+        # identify the pertinent events in the evolution
+        primary_events, secondary_events = identify_events(p=self)
+
+        # combine primary and secondaries into a single list
+        primary_args = [(w0s[i], t_births[i], self.max_ev_time,
+                         copy(self.timestep_size), self.galactic_potential,
+                         primary_events[i], self.store_entire_orbits, quiet)
+                        for i in range(self.n_binaries_match)]
+        secondary_args = [(w0s[i], t_births[i], self.max_ev_time,
+                           copy(self.timestep_size), self.galactic_potential,
+                           secondary_events[i], self.store_entire_orbits, quiet)
+                          for i in range(self.n_binaries_match) if secondary_events[i] is not None]
+        return primary_args + secondary_args
+
     def _get_final_coords(self):
         """Get the final coordinates of each binary (or each component in disrupted binaries)
 
@@ -1163,6 +1752,7 @@ class Population():
             will be set to `np.inf` for ease of masking.
         """
         if self._file is not None:
+            _register_compression_filters()
             with h5.File(self._file, "r") as f:
                 offsets = f["orbits"]["offsets"][...]
                 pos, vel = f["orbits"]["pos"][...] * u.kpc, f["orbits"]["vel"][...] * u.km / u.s
@@ -1203,6 +1793,7 @@ class Population():
         """
         self.__citations__.extend(["MIST", "MESA", "bayestar2019"])
         self._observables = get_photometry(population=self, **kwargs)
+        self._observables["weight"] = self.weights
         return self._observables
 
     def get_gaia_observed_bin_nums(self, ra=None, dec=None):
@@ -1241,6 +1832,7 @@ class Population():
 
         # loop over first (all bound binaries & primaries from disrupted binaries)
         # and then (secondaries from disrupted binaries)
+        rng = self._get_rng("observables")
         observed = []
         for pix, g_mags, bin_nums in zip([pix_inds[:len(self)], pix_inds[len(self):]],
                                          [self.observables["G_app_1"].values,
@@ -1263,7 +1855,7 @@ class Population():
                 completeness[bright_enough] = dr3sf.query(comp_coords[bright_enough], g_mags[bright_enough])
 
                 # draw a random sample from the systems based on Gaia's completeness at each coordinate
-                observed_bin_nums = bin_nums[np.random.uniform(size=len(completeness)) < completeness]
+                observed_bin_nums = bin_nums[rng.uniform(size=len(completeness)) < completeness]
 
             observed.append(observed_bin_nums)
 
@@ -1309,7 +1901,7 @@ class Population():
             plt.show()
         return fig, ax
 
-    def get_healpix_inds(self, ra=None, dec=None, nside=128):
+    def get_healpix_inds(self, ra=None, dec=None, nside=128, return_weights=False):
         """Get the indices of the healpix pixels that each binary is in
 
         Parameters
@@ -1322,11 +1914,15 @@ class Population():
             Milky Way galactocentric coordinates
         nside : `int`, optional
             Healpix nside parameter, by default 128
+        return_weights : `bool`, optional
+            Whether to also return the weight of each system (see :attr:`weights`), by default False
 
         Returns
         -------
         pix : :class:`~numpy.ndarray`
             The indices for each system
+        weights : :class:`~numpy.ndarray`
+            The weight of each system, only returned if ``return_weights=True``
         """
         assert check_dependencies("healpy")
         import healpy as hp
@@ -1344,6 +1940,8 @@ class Population():
 
         # find the pixels for each bound binary/primary and for each disrupted secondary
         pix = hp.ang2pix(nside, nest=True, theta=colatitudes, phi=longitudes)
+        if return_weights:
+            return pix, self._get_orbit_weights()
         return pix
 
     def plot_map(self, ra=None, dec=None, nside=128, coord="C",
@@ -1374,13 +1972,15 @@ class Population():
         import healpy as hp
         import matplotlib.pyplot as plt
 
-        pix = self.get_healpix_inds(ra=ra, dec=dec, nside=nside)
+        pix, weights = self.get_healpix_inds(ra=ra, dec=dec, nside=nside, return_weights=True)
 
         # initialise an empty map
         m = np.zeros(hp.nside2npix(nside))
 
-        # count the unique pixel values and how many sources are in each
-        inds, counts = np.unique(pix, return_counts=True)
+        # count the (weighted) number of sources in each pixel
+        counts = np.bincount(pix, weights=weights, minlength=len(m))
+        inds = np.flatnonzero(counts)
+        counts = counts[inds]
 
         # apply a log if desired
         if norm == "log":
@@ -1582,7 +2182,8 @@ class Population():
                                 ecc=self.final_bpp["ecc"].values[binaries],
                                 dist=distances[binaries], interpolate_g=binaries.sum() > 1000)
 
-    def save(self, file_name, overwrite=False):
+    def save(self, file_name, overwrite=False, append=False, compression=None, compression_opts=None,
+             shuffle=True, orbit_dtype="float64"):
         """Save a Population to disk as an HDF5 file.
 
         Parameters
@@ -1591,71 +2192,88 @@ class Population():
             A file name to use. Either no file extension or ".h5".
         overwrite : `bool`, optional
             Whether to overwrite any existing files, by default False
+        append : `bool`, optional
+            Whether to append this population to an existing file, by default False. The file must have been
+            created with ``append=True`` (if it doesn't exist yet then it will be created). Rows are added to
+            each table and the orbits, ``bin_num`` values are shifted to avoid collisions with those already
+            in the file and normalisation parameters (e.g. :attr:`mass_singles`) are accumulated. This allows
+            you to build a single file chunk by chunk without holding the whole population in memory.
+        compression : `str`, optional
+            Compression to apply to the orbit and initial galaxy datasets, one of [None, "gzip", "lzf",
+            "blosc"], by default None (no compression). "blosc" requires :mod:`hdf5plugin` to be installed
+            (both when saving and loading). When appending, the compression of the existing file is used.
+        compression_opts : `int`, optional
+            Compression level to use for "gzip" (0-9, default 4) or "blosc" (0-9, default 5)
+        shuffle : `bool`, optional
+            Whether to apply a byte-shuffle filter before compression (often improves the compression ratio
+            significantly), by default True. Only used when `compression` is set.
+        orbit_dtype : `str`, optional
+            Floating point type to use for storing the orbits, by default "float64". Using "float32" halves
+            the size of the orbits on disk at the cost of precision (~1e-7 relative, e.g. ~1 kyr in time).
 
         Raises
         ------
         FileExistsError
-            If `overwrite=False` and files already exist
+            If `overwrite=False` and `append=False` and files already exist
+        ValueError
+            If both `overwrite` and `append` are set, or the file cannot be appended to
         """
         if file_name[-3:] != ".h5":
             file_name += ".h5"
+        if overwrite and append:
+            raise ValueError("You can't both `overwrite` and `append` to a file, please choose one")
         if os.path.isfile(file_name):
-            if overwrite:
+            if append:
+                self._append_to_file(file_name)
+                return
+            elif overwrite:
                 os.remove(file_name)
             else:
                 raise FileExistsError((f"{file_name} already exists. Set `overwrite=True` to overwrite "
                                        "the file."))
 
-        # save initial binaries, preferably the initC table
-        if self._initC is not None:
-            self._initC.to_hdf(file_name, key="initC")
-        elif self._initial_binaries is not None:
-            self._initial_binaries.to_hdf(file_name, key="initial_binaries")
+        # appendable files need tables in a format that can grow
+        table_kwargs = {"format": "table"} if append else {}
 
-        if self._bpp is not None:
-            self._bpp.to_hdf(file_name, key="bpp")
-        if self._bcm is not None:
-            self._bcm.to_hdf(file_name, key="bcm")
-        if self._kick_info is not None:
-            self._kick_info.to_hdf(file_name, key="kick_info")
+        # save initial binaries (preferably the initC table) and any stellar evolution tables
+        for key, table in self._get_tables_to_save().items():
+            # categorical columns (from compacted tables) can only be stored in table format
+            has_categories = any(isinstance(dtype, pd.CategoricalDtype) for dtype in table.dtypes)
+            table.to_hdf(file_name, key=key, **({"format": "table"} if has_categories else table_kwargs))
 
         with h5.File(file_name, "a") as f:
             f.attrs["potential_dict"] = yaml.dump(potential_to_dict(self.galactic_potential),
                                                   default_flow_style=None)
         if self._initial_galaxy is not None:
-            self.initial_galaxy.save(file_name, key="initial_galaxy")
+            self.initial_galaxy.save(file_name, key="initial_galaxy", append=append, compression=compression,
+                                     compression_opts=compression_opts, shuffle=shuffle)
 
         # save the orbits if they have been calculated/loaded
         if self._orbits is not None:
-            # go through the orbits calculate their lengths (and therefore offsets in the file)
-            orbit_lengths = [len(orbit.pos) for orbit in self.orbits]
-            orbit_lengths_total = sum(orbit_lengths)
-            offsets = np.insert(np.cumsum(orbit_lengths), 0, 0)
-
-            # start some empty arrays to store the data
-            orbits_data = {"offsets": offsets,
-                           "pos": np.zeros((3, orbit_lengths_total)),
-                           "vel": np.zeros((3, orbit_lengths_total)),
-                           "t": np.zeros(orbit_lengths_total)}
-
-            # save each orbit to the arrays with the same units
-            for i, orbit in enumerate(self.orbits):
-                orbits_data["pos"][:, offsets[i]:offsets[i + 1]] = orbit.pos.xyz.to(u.kpc).value
-                orbits_data["vel"][:, offsets[i]:offsets[i + 1]] = orbit.vel.d_xyz.to(u.km / u.s).value
-                orbits_data["t"][offsets[i]:offsets[i + 1]] = orbit.t.to(u.Myr).value
+            orbits_data = self._get_orbits_data(dtype=orbit_dtype)
+            dataset_kwargs = _get_compression_kwargs(compression, compression_opts, shuffle)
 
-            # save the orbits arrays to the file
+            # align chunks with the typical orbit so reading one orbit touches as few chunks as possible
+            chunk_length = int(np.clip(np.median(np.diff(orbits_data["offsets"])), 1, 2**16))
+            chunked = append or compression is not None
+
+            # save the orbits arrays to the file (resizable along the last axis if appending)
             with h5.File(file_name, "a") as file:
                 orbits = file.create_group("orbits")
                 for key in orbits_data:
-                    orbits[key] = orbits_data[key]
+                    shape = orbits_data[key].shape
+                    chunks = (shape[:-1] + (max(1, min(chunk_length, shape[-1])),)
+                              if key != "offsets" else True) if chunked else None
+                    orbits.create_dataset(key, data=orbits_data[key], chunks=chunks,
+                                          maxshape=shape[:-1] + (None,) if append else None,
+                                          **dataset_kwargs)
 
         with h5.File(file_name, "a") as file:
             numeric_params = np.array([self.n_binaries, self.n_binaries_match, self.processes, self.m1_cutoff,
                                        self.v_dispersion.to(u.km / u.s).value,
                                        self.max_ev_time.to(u.Gyr).value, self.timestep_size.to(u.Myr).value,
                                        self.mass_singles, self.mass_binaries, self.n_singles_req,
-                                       self.n_bin_req])
+                                       self.n_bin_req, self.mass_filtered, self.n_filtered])
             num_par = file.create_dataset("numeric_params", data=numeric_params)
             num_par.attrs["store_entire_orbits"] = self.store_entire_orbits
 
@@ -1672,8 +2290,566 @@ class Population():
             d = file.create_dataset("sampling_params", data=[])
             d.attrs["dict"] = yaml.dump(self.sampling_params, default_flow_style=None)
 
+            # save the seed (and how often each stage was run) so a loaded population continues its streams
+            if self.seed is not None:
+                file.attrs["seed"] = yaml.dump({"entropy": np.asarray(self.seed.entropy).tolist(),
+                                                "spawn_key": list(self.seed.spawn_key),
+                                                "calls": dict(self._random_calls)})
+
+    def _get_tables_to_save(self):
+        """Get a dictionary of the (non-empty) tables that should be saved to a file, keyed by file key"""
+        tables = {}
+        if self._initC is not None:
+            tables["initC"] = self._initC
+        elif self._initial_binaries is not None:
+            tables["initial_binaries"] = self._initial_binaries
+        for key, table in zip(["bpp", "bcm", "kick_info"], [self._bpp, self._bcm, self._kick_info]):
+            if table is not None:
+                tables[key] = table
+        if self._weights is not None:
+            tables["weights"] = pd.DataFrame({"weight": self._weights}, index=self.bin_nums)
+        return tables
+
+    def _get_orbits_data(self, dtype="float64"):
+        """Convert the orbits into flat arrays of positions, velocities and times with offsets for each orbit
+
+        Parameters
+        ----------
+        dtype : `str`, optional
+            Floating point type for the arrays, by default "float64"
+
+        Returns
+        -------
+        orbits_data : `dict`
+            Dictionary of "offsets", "pos" [kpc], "vel" [km/s] and "t" [Myr] arrays
+        """
+        return _flatten_orbits(self.orbits, dtype=dtype)
+
+    def _append_to_file(self, file_name):
+        """Append the population to an existing file that was created with ``save(..., append=True)``
+
+        Parameters
+        ----------
+        file_name : `str`
+            Name of the existing file (including the ".h5" extension)
+
+        Raises
+        ------
+        ValueError
+            If the file was not saved in an appendable format or contains different parts to the population
+        """
+        tables = self._get_tables_to_save()
+
+        # check that the file is appendable and has the same parts as this population
+        with pd.HDFStore(file_name, "r") as store:
+            file_keys = [key.lstrip("/") for key in store.keys()]
+            file_tables = [key for key in ["initC", "initial_binaries", "bpp", "bcm", "kick_info", "weights"]
+                           if key in file_keys]
+            tables_appendable = all(store.get_storer(key).is_table for key in file_tables)
+
+            # offset the bin_nums to avoid any collisions with those already in the file
+            bin_num_offset = 0
+            if len(file_tables) > 0 and tables_appendable:
+                bin_num_offset = store.select_column(file_tables[0], "index").max() + 1
+
+        with h5.File(file_name, "r") as file:
+            file_has_orbits = "orbits" in file
+            file_has_galaxy = "initial_galaxy" in file
+            n_match_existing = int(file["numeric_params"][1])
+            if not tables_appendable or (file_has_galaxy and not sfh._is_appendable(file["initial_galaxy"])):
+                raise ValueError((f"{file_name} was not saved in an appendable format, you need to first "
+                                  "save a population with `append=True` to be able to append to it"))
+
+        # unweighted populations can still be appended to weighted ones
+        if "weights" in file_tables and "weights" not in tables:
+            tables["weights"] = pd.DataFrame({"weight": self.weights}, index=self.bin_nums)
+
+        if (set(file_tables) != set(tables.keys())
+                or file_has_galaxy != (self._initial_galaxy is not None)
+                or file_has_orbits != (self._orbits is not None)):
+            raise ValueError((f"The population you are appending must contain the same parts as {file_name}"
+                              f" (the file has {file_tables + ['initial_galaxy', 'orbits']})"))
+
+        # append each table with shifted bin_nums
+        for key, table in tables.items():
+            new_table = table.copy()
+            new_table.index += bin_num_offset
+            if "bin_num" in new_table.columns:
+                new_table["bin_num"] += bin_num_offset
+            new_table.to_hdf(file_name, key=key, format="table", append=True)
+
+        if self._initial_galaxy is not None:
+            self.initial_galaxy.save(file_name, key="initial_galaxy", append=True)
+
+        if self._orbits is not None:
+            orbits_data = self._get_orbits_data()
+            with h5.File(file_name, "a") as file:
+                orbits = file["orbits"]
+                old_offsets = orbits["offsets"][...]
+
+                # the first section of the orbits is for bound binaries/primaries and the last is for
+                # disrupted secondaries, so we need to move the old secondaries after the new primaries
+                split, new_split = old_offsets[n_match_existing], orbits_data["offsets"][len(self)]
+                lengths = np.concatenate((np.diff(old_offsets[:n_match_existing + 1]),
+                                          np.diff(orbits_data["offsets"][:len(self) + 1]),
+                                          np.diff(old_offsets[n_match_existing:]),
+                                          np.diff(orbits_data["offsets"][len(self):])))
+                new_offsets = np.insert(np.cumsum(lengths), 0, 0)
+
+                for key in ["pos", "vel", "t"]:
+                    old_secondaries = orbits[key][..., split:]
+                    tail = np.concatenate((orbits_data[key][..., :new_split], old_secondaries,
+                                           orbits_data[key][..., new_split:]), axis=-1)
+                    orbits[key].resize(new_offsets[-1], axis=orbits[key].ndim - 1)
+                    orbits[key][..., split:] = tail
+                orbits["offsets"].resize(len(new_offsets), axis=0)
+                orbits["offsets"][...] = new_offsets
+
+        # accumulate the numbers of binaries and the normalisation parameters
+        with h5.File(file_name, "a") as file:
+            numeric_params = file["numeric_params"][...]
+            summed = _SUMMED_NUMERIC_PARAMS[:len(numeric_params) - 5]
+            numeric_params[summed] += [self.n_binaries, self.n_binaries_match, self.mass_singles,
+                                       self.mass_binaries, self.n_singles_req, self.n_bin_req,
+                                       self.mass_filtered, self.n_filtered][:len(summed)]
+            file["numeric_params"][...] = numeric_params
+
+
+# indices of the numeric parameters that are summed when combining files (numbers of binaries, normalisation
+# parameters and filtered binaries)
+_SUMMED_NUMERIC_PARAMS = [0, 1, 7, 8, 9, 10, 11, 12]
+
+
+def _count_shared_events(events, other_events):
+    """Count how many of the first events in two lists of events are identical"""
+    n_shared = 0
+    for key, other_key in zip(_get_events_key(events), _get_events_key(other_events)):
+        if key != other_key:
+            break
+        n_shared += 1
+    return n_shared
+
+
+def _flatten_orbits(orbits, dtype="float64"):
+    """Convert orbits into flat arrays of positions, velocities and times with offsets for each orbit
+
+    Parameters
+    ----------
+    orbits : `list` of :class:`~gala.dynamics.Orbit`
+        The orbits to convert
+    dtype : `str`, optional
+        Floating point type for the arrays, by default "float64"
+
+    Returns
+    -------
+    orbits_data : `dict`
+        Dictionary of "offsets", "pos" [kpc], "vel" [km/s] and "t" [Myr] arrays
+    """
+    # grab the representations of each orbit (avoid `.xyz` since stacking components is slow)
+    representations = {"pos": [orbit.pos for orbit in orbits], "vel": [orbit.vel for orbit in orbits]}
+    times = [orbit.t for orbit in orbits]
+
+    # calculate the lengths of the orbits (and therefore offsets in the file)
+    orbit_lengths = np.fromiter((len(t) for t in times), dtype=int, count=len(times))
+    offsets = np.insert(np.cumsum(orbit_lengths), 0, 0)
+    orbits_data = {"offsets": offsets}
+
+    # concatenate the raw buffers of each component in one go, then convert units all at once
+    for key, components, unit in [("pos", ["x", "y", "z"], u.kpc),
+                                  ("vel", ["d_x", "d_y", "d_z"], u.km / u.s)]:
+        orbits_data[key] = np.empty((3, offsets[-1]), dtype=dtype)
+        for i, component in enumerate(components):
+            quantities = [getattr(rep, component) for rep in representations[key]]
+            orbits_data[key][i] = _concatenate_quantities(quantities, unit, orbit_lengths)
+    orbits_data["t"] = _concatenate_quantities(times, u.Myr, orbit_lengths).astype(dtype, copy=False)
+    return orbits_data
+
+
+def _concatenate_quantities(quantities, unit, lengths):
+    """Concatenate a list of Quantities into a single array in `unit` (only converting units when they
+    change, which is much faster than converting each Quantity separately)"""
+    data = np.concatenate([quantity.value for quantity in quantities])
+    units = [quantity.unit for quantity in quantities]
+
+    # units are usually shared objects, so check identity first since hashing units is slow
+    scales = np.ones(len(quantities))
+    last_unit, last_scale = None, None
+    for i, quantity_unit in enumerate(units):
+        if quantity_unit is not last_unit:
+            last_unit, last_scale = quantity_unit, quantity_unit.to(unit)
+        scales[i] = last_scale
+
+    # usually every orbit has the same units so a single scaling (or none at all) is enough
+    if np.all(scales == 1.0):
+        pass
+    elif np.all(scales == scales[0]):
+        data *= scales[0]
+    else:
+        data *= np.repeat(scales, lengths)
+    return data
+
+
+def _get_merge_shifts(group):
+    """Get the ``bin_num`` shift for each row of a table that was lazily merged by :func:`merge_files`
+    (or 0 if the table wasn't merged)"""
+    if "shard_bin_num_offsets" not in group.attrs:
+        return 0
+    return np.repeat(group.attrs["shard_bin_num_offsets"], group.attrs["shard_rows"])
+
+
+def _read_table(file_name, key):
+    """Read a pandas table from a population file, applying any ``bin_num`` shifts from :func:`merge_files`
+
+    Parameters
+    ----------
+    file_name : `str`
+        Name of the population file
+    key : `str`
+        Key of the table in the file
+
+    Returns
+    -------
+    table : :class:`~pandas.DataFrame`
+        The table with shifted ``bin_num`` values
+
+    Raises
+    ------
+    KeyError
+        If the table is not in the file
+    """
+    table = pd.read_hdf(file_name, key=key)
+    with h5.File(file_name, "r") as file:
+        shifts = _get_merge_shifts(file[key])
+    if np.any(shifts != 0):
+        table.index += shifts
+        if "bin_num" in table.columns:
+            table["bin_num"] += shifts
+    return table
+
+
+def _read_table_index(file_name, key):
+    """Read only the index (``bin_num`` values) of a pandas table in a population file"""
+    with h5.File(file_name, "r") as file:
+        group = file[key]
+        index = group["table"]["index"] if "table" in group else group["axis1"][...]
+        return index + _get_merge_shifts(group)
+
+
+def _copy_attrs(source, destination):
+    """Copy the HDF5 attributes of one object to another, preserving their exact types (PyTables is picky
+    about how strings are stored)"""
+    for name in source.attrs:
+        attr = h5.h5a.open(source.id, name.encode())
+        if attr.get_space().get_simple_extent_type() == h5.h5s.NULL:
+            destination.attrs[name] = source.attrs[name]
+            continue
+        data = np.empty(attr.shape, dtype=attr.dtype)
+        attr.read(data, mtype=attr.get_type())
+        new_attr = h5.h5a.create(destination.id, name.encode(), attr.get_type(), attr.get_space())
+        new_attr.write(data, mtype=attr.get_type())
+
+
+def _create_virtual_concatenation(group, name, pieces, axis=0):
+    """Create a virtual dataset that concatenates slices of datasets in other files along an axis
+
+    Parameters
+    ----------
+    group : :class:`h5py.Group`
+        Group in which to create the dataset
+    name : `str`
+        Name of the new dataset
+    pieces : `list` of `tuple`
+        Each piece is a tuple of (:class:`h5py.VirtualSource`, start, stop) giving the section of the source
+        along `axis` that should be added
+    axis : `int`, optional
+        Axis along which to concatenate, by default 0
+    """
+    lengths = [stop - start for _, start, stop in pieces]
+    shape = list(pieces[0][0].shape)
+    shape[axis] = sum(lengths)
+    layout = h5.VirtualLayout(shape=tuple(shape), dtype=pieces[0][0].dtype)
+
+    position = 0
+    for (source, start, stop), length in zip(pieces, lengths):
+        if length == 0:
+            continue
+        source_selection, target_selection = [slice(None)] * len(shape), [slice(None)] * len(shape)
+        source_selection[axis] = slice(start, stop)
+        target_selection[axis] = slice(position, position + length)
+        layout[tuple(target_selection)] = source[tuple(source_selection)]
+        position += length
+    group.create_virtual_dataset(name, layout)
+
+
+def _can_map_table(file_names, key):
+    """Check whether a pandas table is stored in every file in fixed format, with only plain arrays and the
+    same columns, such that it can be mapped with virtual datasets"""
+    items = None
+    for file_name in file_names:
+        with h5.File(file_name, "r") as file:
+            group = file[key]
+            if (group.attrs.get("pandas_type") != b"frame"
+                    or any(group[name].attrs.get("CLASS") != b"ARRAY" for name in group)):
+                return False
+            file_items = [group[name][...].tolist() for name in sorted(group)
+                          if name == "axis0" or name.endswith("_items")]
+        if items is None:
+            items = file_items
+        elif file_items != items:
+            return False
+    return True
+
+
+def _estimate_evolution_cost(initialbinarytable):
+    """Estimate the relative cost of evolving each binary with COSMIC
+
+    This uses a model fitted to the COSMIC runtimes of individual binaries. The cost mostly depends on the
+    primary mass (increasing up to ~30 Msun), with weaker dependences on the orbital period (very close and
+    very wide binaries take longer) and on how long the binary is evolved.
+
+    Parameters
+    ----------
+    initialbinarytable : :class:`~pandas.DataFrame`
+        Initial binaries (or initC table)
+
+    Returns
+    -------
+    cost : :class:`~numpy.ndarray`
+        Relative cost of each binary
+    """
+    log_m1 = np.log10(np.maximum(np.asarray(initialbinarytable["mass_1"], dtype=float), 1e-2))
+    log_porb = np.log10(np.maximum(np.asarray(initialbinarytable["porb"], dtype=float), 1e-2))
+    log_time = np.log10(np.maximum(np.asarray(initialbinarytable["tphysf"], dtype=float), 1.0))
+
+    # least-squares fit of log10(runtime) to COSMIC v3.4.17 timings of ~300 binaries with the default
+    # BSE settings (each evolved 40 times in one batch, minus the batch overhead), with massive binaries
+    # over-represented. The constant term is dropped since only the relative cost matters.
+    return 10**(0.98 * log_m1 - 0.32 * log_m1**2 - 0.05 * log_porb + 0.011 * log_porb**2 + 0.13 * log_time)
+
+
+def _get_evolution_chunks(cost, processes):
+    """Split binaries (sorted by decreasing cost) into chunks for evolving with a pool of processes
+
+    This uses factoring: chunks are assigned in rounds of one per process, where each round shares out half
+    of the remaining cost. This makes the first chunks large (to keep the scheduling overhead low) and the
+    last chunks small (so that the processes finish at around the same time).
+
+    Parameters
+    ----------
+    cost : :class:`~numpy.ndarray`
+        Estimated cost of each binary, sorted in decreasing order
+    processes : `int`
+        Number of processes in the pool
+
+    Returns
+    -------
+    sizes : `list`
+        Number of binaries in each chunk
+    """
+    total = cost.sum()
+    min_chunk_cost = total / (32 * processes)
+    targets = []
+    remaining = total
+    while remaining > 1e-9 * total:
+        chunk_cost = max(remaining / (2 * processes), min_chunk_cost)
+        for _ in range(processes):
+            targets.append(min(chunk_cost, remaining))
+            remaining -= targets[-1]
+            if remaining <= 1e-9 * total:
+                break
+
+    # find the binaries at which each chunk ends (ensuring every chunk has at least one binary)
+    edges = np.searchsorted(np.cumsum(cost), np.cumsum(targets)[:-1], side="right")
+    edges = np.unique(np.clip(edges, 1, len(cost) - 1)) if len(cost) > 1 else np.array([], dtype=int)
+    return np.diff(np.concatenate(([0], edges, [len(cost)]))).tolist()
+
+
+def _map_chunk(func, items):
+    """Apply a function to each item in a chunk"""
+    return [func(item) for item in items]
+
+
+class _ChunkedPool():
+    """Wrapper around a pool that maps a function over items in chunks of pre-determined sizes (in order)"""
+    def __init__(self, pool, sizes):
+        self.pool = pool
+        self.sizes = sizes
+
+    def map(self, func, iterable):
+        items = list(iterable)
+        if sum(self.sizes) != len(items):
+            logging.getLogger("cogsworth").warning(("cogsworth warning: COSMIC passed the pool a different "
+                                                    f"number of items ({len(items)}) than there are "
+                                                    f"binaries ({sum(self.sizes)}), probably because "
+                                                    "`n_per_block` is set, so binaries are not evolved in "
+                                                    "cost-balanced chunks"))
+            return self.pool.map(func, items)
+        edges = np.cumsum(self.sizes)[:-1]
+        chunks = [items[start:end] for start, end in zip(np.concatenate(([0], edges)), np.cumsum(self.sizes))]
+        output = self.pool.starmap(_map_chunk, [(func, chunk) for chunk in chunks], chunksize=1)
+        return [out for chunk_output in output for out in chunk_output]
+
+
+def evolve_in_chunks(initialbinarytable, BSEDict, pool, processes, timestep_conditions=[]):
+    """Evolve binaries with COSMIC in cost-balanced chunks, most expensive first
+
+    By default, COSMIC splits binaries evenly between processes without considering how long each takes to
+    evolve. Since massive binaries take much longer to evolve this can leave a few processes working on the
+    last chunks long after the rest have finished. Instead, this sorts the binaries by their expected cost
+    (from a model of COSMIC runtimes based on primary mass, orbital period and evolution time) and passes
+    them to the pool in chunks that shrink in total cost, starting with the most expensive binaries. For
+    the same random seeds, the results are identical to :meth:`cosmic.evolve.Evolve.evolve`.
+
+    Parameters
+    ----------
+    initialbinarytable : :class:`~pandas.DataFrame`
+        Initial binaries (or initC table) to evolve
+    BSEDict : `dict`
+        BSE settings to use for the evolution
+    pool : :class:`multiprocessing.Pool`
+        Pool to use for evolving the binaries
+    processes : `int`
+        Number of processes in the pool
+    timestep_conditions : `list`, optional
+        Timestep conditions for the BCM table, by default []
+
+    Returns
+    -------
+    bpp, bcm, initC, kick_info : :class:`~pandas.DataFrame`
+        The same tables as returned by :meth:`cosmic.evolve.Evolve.evolve`, ordered by the initial binaries
+    """
+    # draw random seeds and label the binaries before sorting so they match what COSMIC would assign
+    if "randomseed" not in initialbinarytable:
+        initialbinarytable = initialbinarytable.assign(randomseed=np.random.randint(
+            np.iinfo(np.int32).min, np.iinfo(np.int32).max, size=len(initialbinarytable)))
+    if "bin_num" not in initialbinarytable:
+        initialbinarytable = initialbinarytable.assign(bin_num=np.arange(len(initialbinarytable)))
+
+    # sort the binaries by cost and evolve them in chunks
+    cost = _estimate_evolution_cost(initialbinarytable)
+    order = np.argsort(-cost, kind="stable")
+    output = Evolve.evolve(initialbinarytable=initialbinarytable.iloc[order], BSEDict=BSEDict,
+                           pool=_ChunkedPool(pool, _get_evolution_chunks(cost[order], processes)),
+                           timestep_conditions=timestep_conditions)
+
+    # put everything back in the original order
+    bin_nums = pd.Series(np.arange(len(initialbinarytable)), index=initialbinarytable["bin_num"].values)
+    return tuple(table.iloc[np.argsort(bin_nums.loc[table["bin_num"].values].values, kind="stable")]
+                 for table in output)
+
 
-def load(file_name, parts=["initial_binaries", "initial_galaxy", "stellar_evolution"]):
+def _sample_shard(seed, final_kstar1, final_kstar2, sampler_kwargs):
+    """Sample a shard of initial binaries with a particular seed, leaving the global random state unchanged"""
+    with _seeded_random_state(seed):
+        return InitialBinaryTable.sampler('independent', final_kstar1, final_kstar2, **sampler_kwargs)
+
+
+def sample_in_shards(final_kstar1, final_kstar2, n_shards, pool=None, entropy=None, **sampler_kwargs):
+    """Sample initial binaries with COSMIC's independent sampler, split into independent shards
+
+    The sampling target (``size`` or ``total_mass``) is split evenly between the shards and each shard is
+    sampled with its own random stream, spawned from a single :class:`~numpy.random.SeedSequence`. This means
+    the shards can be sampled in parallel and the result is the same regardless of the number of processes.
+    The shards are then combined into a single table (with a contiguous index) and their sampled masses and
+    numbers of systems are summed.
+
+    Parameters
+    ----------
+    final_kstar1 : `list`
+        Final stellar types of the primary to keep
+    final_kstar2 : `list`
+        Final stellar types of the secondary to keep
+    n_shards : `int`
+        Number of shards to split the sampling into
+    pool : :class:`multiprocessing.Pool`, optional
+        Pool to use for sampling the shards, by default None (sample them serially)
+    entropy : `int`, optional
+        Entropy for the :class:`~numpy.random.SeedSequence`, by default drawn from NumPy's global random
+        state (so that :func:`numpy.random.seed` still gives reproducible results)
+    **sampler_kwargs
+        Any other arguments for :meth:`~cosmic.sample.sampler.independent.get_independent_sampler`, must
+        include ``size``
+
+    Returns
+    -------
+    initial_binaries : :class:`~pandas.DataFrame`
+        Sampled initial binaries
+    mass_singles, mass_binaries : `float`
+        Total mass in single stars and binaries that was sampled (including those that were not kept)
+    n_singles_req, n_bin_req : `int`
+        Number of single stars and binaries that were sampled (including those that were not kept)
+    """
+    if entropy is None:
+        entropy = np.random.randint(np.iinfo(np.int64).max)
+
+    size = sampler_kwargs.pop("size")
+    total_mass = sampler_kwargs.pop("total_mass", np.inf)
+    if sampler_kwargs.get("sampling_target", "size") == "size":
+        n_shards = max(min(n_shards, size), 1)
+
+    # split the target between the shards and give each one an independent seed
+    sizes = [size // n_shards + (i < size % n_shards) for i in range(n_shards)]
+    seeds = [seq.generate_state(4) for seq in np.random.SeedSequence(entropy).spawn(n_shards)]
+    args = [(seed, final_kstar1, final_kstar2, {**sampler_kwargs, "size": max(shard_size, 1),
+                                                "total_mass": total_mass / n_shards})
+            for seed, shard_size in zip(seeds, sizes)]
+
+    shards = pool.starmap(_sample_shard, args) if pool is not None else [_sample_shard(*arg) for arg in args]
+
+    initial_binaries = pd.concat([shard[0] for shard in shards], ignore_index=True)
+    return (initial_binaries, *(sum(shard[i] for shard in shards) for i in range(1, 5)))
+
+
+def bootstrap_estimators(pop, estimators, n_bootstrap=100):
+    """Evaluate statistics of a population with bootstrap error bars
+
+    Binaries are resampled with a Poisson bootstrap: each resample multiplies the :attr:`~Population.weights`
+    of the binaries by independent Poisson(1) draws (the number of times each binary is chosen), which
+    avoids copying the population for each resample.
+
+    Parameters
+    ----------
+    pop : :class:`Population`
+        The population
+    estimators : `dict`
+        Functions that take a population and return a statistic (a `float` or an array), keyed by name.
+        These must use the weights of the binaries.
+    n_bootstrap : `int`, optional
+        Number of bootstrap resamples, by default 100
+
+    Returns
+    -------
+    estimates : `dict`
+        The value of each statistic for the population
+    rel_errors : `dict`
+        The relative error of each statistic (the ratio of the norms of its bootstrap standard deviation and
+        its value), which is `np.inf` for statistics that are zero
+    """
+    estimates = {name: np.asarray(func(pop), dtype=float) for name, func in estimators.items()}
+
+    original_weights = pop._weights
+    weights = pop.weights
+    resamples = {name: [] for name in estimators}
+    try:
+        rng = pop._get_rng("bootstrap")
+        for _ in range(n_bootstrap):
+            pop.weights = weights * rng.poisson(1.0, size=len(weights))
+            for name, func in estimators.items():
+                resamples[name].append(np.asarray(func(pop), dtype=float))
+    finally:
+        pop.weights = weights
+        pop._weights = original_weights
+
+    rel_errors = {}
+    for name, estimate in estimates.items():
+        error = np.linalg.norm(np.std(resamples[name], axis=0))
+        scale = np.linalg.norm(estimate)
+        rel_errors[name] = error / scale if scale > 0 else np.inf
+    return estimates, rel_errors
+
+
+def load(file_name, parts=["initial_binaries", "initial_galaxy", "stellar_evolution"], processes=1,
+         with_timing=False):
     """Load a Population from a series of files
 
     Parameters
@@ -1684,6 +2860,15 @@ def load(file_name, parts=["initial_binaries", "initial_galaxy", "stellar_evolut
         Which parts of the Population to load immediately, the rest are loaded as necessary. Any of
         ["initial_binaries", "initial_galaxy", "stellar_evolution", "galactic_orbits"], by default
         ["initial_binaries", "initial_galaxy", "stellar_evolution"]
+    processes : `int`, optional
+        How many processes to use for reading the parts in parallel, by default 1 (read everything serially
+        in this process). With more than one, each process reads its parts with its own handle on the file
+        whilst the orbits are read in this process at the same time. This only helps for large files (every
+        table is copied back from the processes) and, as with any :class:`multiprocessing.Pool`, scripts
+        need an ``if __name__ == "__main__":`` guard on macOS and Windows. Threads aren't used since h5py
+        holds a global lock, so HDF5 reads are serialised within a single process.
+    with_timing : `bool`, optional
+        Whether to print how long it took to read each part, by default False
 
     Returns
     -------
@@ -1693,13 +2878,25 @@ def load(file_name, parts=["initial_binaries", "initial_galaxy", "stellar_evolut
     if file_name[-3:] != ".h5":
         file_name += ".h5"
 
+    # read all of the metadata in a single pass over the file
     BSE_settings = {}
     sampling_params = {}
     with h5.File(file_name, "r") as file:
         if "numeric_params" not in file.keys():
             raise ValueError((f"{file_name} is not a Population file, "
                              "perhaps you meant to use `cogsworth.sfh.load`?"))
+
+        # merged files only point to the data in other files, so make sure that they are still there
+        if "shard_files" in file.attrs:
+            file_dir = os.path.dirname(os.path.abspath(file_name))
+            missing = [shard for shard in file.attrs["shard_files"]
+                       if not os.path.isfile(os.path.join(file_dir, shard))]
+            if len(missing) > 0:
+                raise FileNotFoundError((f"{file_name} was created with `merge_files` but some of the files "
+                                         f"it points to are missing: {missing}"))
+
         numeric_params = file["numeric_params"][...]
+        has_weights = "weights" in file
 
         store_entire_orbits = file["numeric_params"].attrs["store_entire_orbits"]
         final_kstars = [file["numeric_params"].attrs["final_kstar1"],
@@ -1711,9 +2908,10 @@ def load(file_name, parts=["initial_binaries", "initial_galaxy", "stellar_evolut
             BSE_settings[key] = file["BSE_settings"].attrs[key]
 
         sampling_params = yaml.load(file["sampling_params"].attrs["dict"], Loader=yaml.Loader)
-
-    with h5.File(file_name, 'r') as f:
-        galactic_potential = potential_from_dict(yaml.load(f.attrs["potential_dict"], Loader=yaml.Loader))
+        galactic_potential = potential_from_dict(yaml.load(file.attrs["potential_dict"], Loader=yaml.Loader))
+        seed_info = yaml.load(file.attrs["seed"], Loader=yaml.Loader) if "seed" in file.attrs else {}
+        random_calls = seed_info.pop("calls", {})
+        seed = np.random.SeedSequence(**seed_info) if seed_info else None
 
     p = Population(n_binaries=int(numeric_params[0]), processes=int(numeric_params[2]),
                    m1_cutoff=numeric_params[3], final_kstar1=final_kstars[0], final_kstar2=final_kstars[1],
@@ -1721,34 +2919,248 @@ def load(file_name, parts=["initial_binaries", "initial_galaxy", "stellar_evolut
                    v_dispersion=numeric_params[4] * u.km / u.s, max_ev_time=numeric_params[5] * u.Gyr,
                    timestep_size=numeric_params[6] * u.Myr, BSE_settings=BSE_settings,
                    sampling_params=sampling_params, store_entire_orbits=store_entire_orbits,
-                   bcm_timestep_conditions=bcm_tc)
+                   bcm_timestep_conditions=bcm_tc, seed=seed)
 
     p._file = file_name
+    p._random_calls = random_calls
     p.n_binaries_match = int(numeric_params[1])
     p._mass_singles = numeric_params[7]
     p._mass_binaries = numeric_params[8]
     p._n_singles_req = numeric_params[9]
     p._n_bin_req = numeric_params[10]
+    if len(numeric_params) > 12:
+        p.mass_filtered = numeric_params[11]
+        p.n_filtered = int(numeric_params[12])
+    if has_weights:
+        p._weights = _read_table(file_name, "weights")["weight"].values
+
+    # load parts as necessary, reading them in parallel when using multiple processes
+    expanded_parts = []
+    for part in parts:
+        expanded_parts.extend(["kick_info", "bcm", "bpp"] if part == "stellar_evolution" else [part])
+    expanded_parts = [part for part in _LOAD_PARTS if part in expanded_parts]
+    timings = _load_parts(p, expanded_parts, processes=processes)
+
+    if with_timing:
+        for part in expanded_parts:
+            print(f"[{timings[part][1] - timings[part][0]:1.2f}s] Load {part}")
+
+    return p
+
+
+# attributes of a population that are filled when loading each part from its file
+_LOAD_PARTS = {"initial_binaries": ["_initC", "_initial_binaries"], "initial_galaxy": ["_initial_galaxy"],
+               "kick_info": ["_kick_info"], "bcm": ["_bcm"], "bpp": ["_bpp"],
+               "galactic_orbits": ["_orbits", "_final_pos", "_final_vel"]}
+
+
+def _load_part(pop, part):
+    """Load a part of a population from its file by accessing the relevant property
 
-    # load parts as necessary
-    if "initial_binaries" in parts:
+    Parameters
+    ----------
+    pop : :class:`Population`
+        A population loaded with :func:`load`
+    part : `str`
+        Which part to load (any key of ``_LOAD_PARTS``)
+
+    Returns
+    -------
+    attrs : `dict`
+        The loaded attributes of the population (so that this can be run in another process)
+    timing : `tuple`
+        The start and end time of loading the part
+    """
+    start = time.time()
+    if part == "initial_binaries":
         try:
-            p.initC
+            pop.initC
         except KeyError:
-            p.initial_binaries
+            pop.initial_binaries
+    else:
+        getattr(pop, "orbits" if part == "galactic_orbits" else part)
+    return {attr: getattr(pop, attr) for attr in _LOAD_PARTS[part]}, (start, time.time())
 
-    if "initial_galaxy" in parts:
-        p.initial_galaxy
 
-    if "stellar_evolution" in parts:
-        p.kick_info
-        p.bcm
-        p.bpp
+def _load_parts(pop, parts, processes=1):
+    """Load parts of a population from its file, reading each part in parallel in a separate process
 
-    if "galactic_orbits" in parts:
-        p.orbits
+    The orbits are read (and converted to :class:`~gala.dynamics.Orbit` objects) in this process whilst
+    the other parts are read by a pool of processes.
 
-    return p
+    Parameters
+    ----------
+    pop : :class:`Population`
+        A population loaded with :func:`load`
+    parts : `list`
+        Which parts to load (any keys of ``_LOAD_PARTS``)
+    processes : `int`, optional
+        How many processes to use, by default 1 (every part is read serially in this process)
+
+    Returns
+    -------
+    timings : `dict`
+        The start and end time of loading each part
+    """
+    timings = {}
+    pool_parts = [part for part in parts if part != "galactic_orbits"]
+    if processes > 1 and len(pool_parts) > 0 and len(parts) > 1:
+        with Pool(min(processes, len(pool_parts))) as pool:
+            results = {part: pool.apply_async(_load_part, (pop, part)) for part in pool_parts}
+            if "galactic_orbits" in parts:
+                _, timings["galactic_orbits"] = _load_part(pop, "galactic_orbits")
+            for part, result in results.items():
+                attrs, timings[part] = result.get()
+                for attr, value in attrs.items():
+                    setattr(pop, attr, value)
+    else:
+        for part in parts:
+            _, timings[part] = _load_part(pop, part)
+    return timings
+
+
+def merge_files(file_names, output_file, overwrite=False):
+    """Merge several population files (e.g. shards saved by separate jobs) into a single file without copying
+    the bulk of their data
+
+    The orbits and stellar evolution tables are stored in the merged file as HDF5 virtual datasets that point
+    to the data in each of the original files, so merging is fast and takes almost no extra disk space.
+    ``bin_num`` values are shifted to avoid collisions between files (as in :func:`concat`), but for mapped
+    tables this is only applied when the tables are read. Tables that can't be mapped (the initial galaxy,
+    tables saved with ``append=True`` or translated tables) are copied instead. The merged file can then be
+    read with :func:`load` like any other population file.
+
+    NOTE: The merged population will have the same settings as the first file (but data from all files).
+    The original files must not be deleted or moved relative to the merged file.
+
+    Parameters
+    ----------
+    file_names : `list` of `str`
+        Names of the population files to merge. Each should either have no file extension or ".h5"
+    output_file : `str`
+        Name of the merged file. Either no file extension or ".h5".
+    overwrite : `bool`, optional
+        Whether to overwrite any existing file, by default False
+
+    Raises
+    ------
+    FileExistsError
+        If `overwrite=False` and `output_file` already exists
+    ValueError
+        If no files are provided or the files don't all contain the same parts
+    """
+    file_names = [file_name if file_name[-3:] == ".h5" else file_name + ".h5" for file_name in file_names]
+    if output_file[-3:] != ".h5":
+        output_file += ".h5"
+    if len(file_names) == 0:
+        raise ValueError("No files provided to merge")
+    if os.path.isfile(output_file) and not overwrite:
+        raise FileExistsError((f"{output_file} already exists. Set `overwrite=True` to overwrite "
+                               "the file."))
+
+    # check that every file contains the same parts
+    file_keys = []
+    for file_name in file_names:
+        with h5.File(file_name, "r") as file:
+            file_keys.append(sorted(file.keys()))
+    if any(keys != file_keys[0] for keys in file_keys):
+        raise ValueError(f"The files you are merging must all contain the same parts, but found {file_keys}")
+    table_keys = [key for key in ["initC", "initial_binaries", "bpp", "bcm", "kick_info", "weights"]
+                  if key in file_keys[0]]
+    if os.path.isfile(output_file):
+        os.remove(output_file)
+
+    # work out the bin_num offset for each file (in the same way as `concat`)
+    bin_num_offsets = np.zeros(len(file_names), dtype=int)
+    if len(table_keys) > 0:
+        for i, file_name in enumerate(file_names[:-1]):
+            max_bin_num = _read_table_index(file_name, table_keys[0]).max()
+            bin_num_offsets[i + 1] = bin_num_offsets[i] + max_bin_num + 1
+
+    # copy the tables that can't be mapped (these are usually small compared to the orbits)
+    mapped_keys = [key for key in table_keys if _can_map_table(file_names, key)]
+    for key in table_keys:
+        if key not in mapped_keys:
+            tables = []
+            for file_name, offset in zip(file_names, bin_num_offsets):
+                table = _read_table(file_name, key)
+                table.index += offset
+                if "bin_num" in table.columns:
+                    table["bin_num"] += offset
+                tables.append(table)
+            pd.concat(tables).to_hdf(output_file, key=key)
+    if "initial_galaxy" in file_keys[0]:
+        sfh.concat(*[sfh.load(file_name, key="initial_galaxy")
+                     for file_name in file_names]).save(output_file, key="initial_galaxy")
+
+    # point to the files relative to the merged file so they can be moved together
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    relative_names = [os.path.relpath(os.path.abspath(file_name), output_dir) for file_name in file_names]
+
+    with h5.File(output_file, "a") as output:
+        # map the rows of each fixed-format table and record the shift for each file's bin_nums
+        for key in mapped_keys:
+            with h5.File(file_names[0], "r") as file:
+                output.copy(file[key], key)
+            group = output[key]
+            for name in list(group.keys()):
+                if name == "axis0" or name.endswith("_items"):
+                    continue
+                pieces = []
+                for file_name, relative_name in zip(file_names, relative_names):
+                    with h5.File(file_name, "r") as file:
+                        dataset = file[key][name]
+                        pieces.append((h5.VirtualSource(relative_name, dataset.name, shape=dataset.shape,
+                                                        dtype=dataset.dtype), 0, dataset.shape[0]))
+                del group[name]
+                _create_virtual_concatenation(group, name, pieces)
+                with h5.File(file_names[0], "r") as file:
+                    _copy_attrs(file[key][name], group[name])
+
+            # merged files can themselves be merged, so combine any existing shifts
+            shard_rows, shard_offsets = [], []
+            for file_name, offset in zip(file_names, bin_num_offsets):
+                with h5.File(file_name, "r") as file:
+                    attrs = file[key].attrs
+                    shard_rows.extend(attrs.get("shard_rows", [file[key]["axis1"].shape[0]]))
+                    shard_offsets.extend(np.asarray(attrs.get("shard_bin_num_offsets", [0])) + offset)
+            group.attrs["shard_rows"] = np.array(shard_rows, dtype=int)
+            group.attrs["shard_bin_num_offsets"] = np.array(shard_offsets, dtype=int)
+
+        # map the orbits, with the bound binaries/primaries of every file before any disrupted secondaries
+        if "orbits" in file_keys[0]:
+            offsets, splits, sources = [], [], {key: [] for key in ["pos", "vel", "t"]}
+            for file_name, relative_name in zip(file_names, relative_names):
+                with h5.File(file_name, "r") as file:
+                    offsets.append(file["orbits"]["offsets"][...])
+                    splits.append(int(file["numeric_params"][1]))
+                    for key in sources:
+                        dataset = file["orbits"][key]
+                        sources[key].append(h5.VirtualSource(relative_name, dataset.name, shape=dataset.shape,
+                                                             dtype=dataset.dtype))
+            lengths = np.concatenate([np.diff(o[:split + 1]) for o, split in zip(offsets, splits)]
+                                     + [np.diff(o[split:]) for o, split in zip(offsets, splits)])
+
+            orbits = output.create_group("orbits")
+            orbits.create_dataset("offsets", data=np.insert(np.cumsum(lengths), 0, 0))
+            for key in sources:
+                shards = list(zip(sources[key], offsets, splits))
+                pieces = ([(source, 0, o[split]) for source, o, split in shards]
+                          + [(source, o[split], o[-1]) for source, o, split in shards])
+                _create_virtual_concatenation(orbits, key, pieces, axis=len(sources[key][0].shape) - 1)
+
+        # copy the settings from the first file and accumulate the normalisation parameters
+        with h5.File(file_names[0], "r") as file:
+            for key in ["numeric_params", "BSE_settings", "sampling_params"]:
+                output.copy(file[key], key)
+            output.attrs["potential_dict"] = file.attrs["potential_dict"]
+        numeric_params = output["numeric_params"][...]
+        for file_name in file_names[1:]:
+            with h5.File(file_name, "r") as file:
+                summed = _SUMMED_NUMERIC_PARAMS[:min(len(numeric_params), len(file["numeric_params"])) - 5]
+                numeric_params[summed] += file["numeric_params"][summed]
+        output["numeric_params"][...] = numeric_params
+        output.attrs["shard_files"] = relative_names
 
 
 def concat(*pops):
@@ -1777,11 +3189,21 @@ def concat(*pops):
     elif len(pops) == 0:
         raise ValueError("No populations provided to concatenate")
 
-    # get the offset for the bin numbers
-    bin_num_offset = max(pops[0].bin_nums) + 1
-
     # create a new population to store the final population (just a copy of the first population)
     final_pop = pops[0][:]
+    n_first = len(final_pop)
+
+    # collect the parts of each population and then combine them all at once (rather than pairwise, which
+    # would copy the growing population for every new one)
+    tables = {table: [getattr(final_pop, table)]
+              for table in ["_initial_binaries", "_initC", "_bpp", "_bcm", "_kick_info"]
+              if getattr(final_pop, table) is not None}
+    galaxies = [final_pop._initial_galaxy]
+    use_weights = any(pop._weights is not None for pop in pops)
+    weights = [final_pop.weights] if use_weights else []
+
+    # get the offset for the bin numbers
+    bin_num_offset = max(final_pop.bin_nums) + 1
 
     # loop over the remaining populations
     for pop in pops[1:]:
@@ -1792,44 +3214,58 @@ def concat(*pops):
         if final_pop._initial_galaxy is not None:
             if pop._initial_galaxy is None:
                 raise ValueError(f"Population {pop} does not have an initial galaxy, but the first does")
-
-            final_pop._initial_galaxy += pop._initial_galaxy
+            galaxies.append(pop._initial_galaxy)
 
         # loop through pandas tables that may need to be copied
-        for table in ["_initial_binaries", "_initC", "_bpp", "_bcm", "_kick_info", ]:
-            # only copy if the table exists in the main population
-            if getattr(final_pop, table) is not None:
-                # if the table doesn't exist in the new population then raise an error
-                if getattr(pop, table) is None:
-                    raise ValueError(f"Population {pop} does not have a {table} table, but the first does")
-
-                # otherwise copy the table and update the bin nums
-                new_table = getattr(pop, table).copy()
-                new_table.index += bin_num_offset
-
-                # if the table has a "bin_num" column then update it
-                if "bin_num" in new_table.columns:
-                    new_table["bin_num"] += bin_num_offset
-                setattr(final_pop, table, pd.concat([getattr(final_pop, table), new_table]))
+        for table in tables:
+            # if the table doesn't exist in the new population then raise an error
+            if getattr(pop, table) is None:
+                raise ValueError(f"Population {pop} does not have a {table} table, but the first does")
+
+            # otherwise copy the table and update the bin nums
+            new_table = getattr(pop, table).copy()
+            new_table.index += bin_num_offset
+
+            # if the table has a "bin_num" column then update it
+            if "bin_num" in new_table.columns:
+                new_table["bin_num"] += bin_num_offset
+            tables[table].append(new_table)
 
         # sum the sampling numbers
         final_pop._n_singles_req += pop._n_singles_req
         final_pop._n_bin_req += pop._n_bin_req
         final_pop._mass_singles += pop._mass_singles
         final_pop._mass_binaries += pop._mass_binaries
+        final_pop.mass_filtered += pop.mass_filtered
+        final_pop.n_filtered += pop.n_filtered
+        if use_weights:
+            weights.append(pop.weights)
         final_pop.n_binaries_match += pop.n_binaries_match
 
-        if final_pop._orbits is not None or pop._orbits is not None:
-            raise NotImplementedError("Cannot concatenate populations with orbits for now")
-
-        bin_num_offset = max(final_pop.bin_nums) + 1
-        final_pop._bin_nums = None
+        bin_num_offset += max(pop.bin_nums) + 1
+
+    for table, parts in tables.items():
+        setattr(final_pop, table, pd.concat(parts))
+    if final_pop._initial_galaxy is not None:
+        final_pop._initial_galaxy = sfh.concat(*galaxies)
+    if use_weights:
+        final_pop._weights = np.concatenate(weights)
+
+    # combine the orbits, keeping bound binaries and primaries before all disrupted secondaries
+    if len(set(pop._orbits is None for pop in pops)) > 1:
+        raise ValueError("Either all populations or none of them must have orbits")
+    n_primaries = [n_first] + [len(pop) for pop in pops[1:]]
+    for attr in ["_orbits", "_final_pos", "_final_vel"]:
+        parts = [getattr(final_pop, attr)] + [getattr(pop, attr) for pop in pops[1:]]
+        if any(part is None for part in parts):
+            setattr(final_pop, attr, None)
+        else:
+            setattr(final_pop, attr, np.concatenate([part[:n] for part, n in zip(parts, n_primaries)]
+                                                    + [part[n:] for part, n in zip(parts, n_primaries)]))
 
     # reset auto-calculated class variables
     final_pop._bin_nums = None
     final_pop._classes = None
-    final_pop._final_pos = None
-    final_pop._final_vel = None
     final_pop._final_bpp = None
     final_pop._disrupted = None
     final_pop._escaped = None
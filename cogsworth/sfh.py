@@ -1,9 +1,11 @@
 import sys
+import atexit
+from copy import copy
 import yaml
 import h5py as h5
 import numpy as np
 import astropy.units as u
-from scipy.integrate import quad
+from multiprocessing import Pool
 from scipy.special import lambertw
 from scipy.stats import beta
 import matplotlib.pyplot as plt
@@ -19,10 +21,69 @@ from gala.units import galactic
 from cogsworth.tests.optional_deps import check_dependencies
 
 from cogsworth.citations import CITATIONS
+from cogsworth.utils import (sobol_uniforms, _get_compression_kwargs, _register_compression_filters,
+                             _seeded_random_state)
 
 
 __all__ = ["StarFormationHistory", "Wagg2022", "BurstUniformDisc", "ConstantUniformDisc",
-           "QuasiIsothermalDisk", "SpheroidalDwarf", "load", "concat"]
+           "QuasiIsothermalDisk", "SpheroidalDwarf", "TabulatedSFH", "load", "concat"]
+
+# canonical units in which sampled values are stored
+_UNITS = {"tau": u.Gyr, "Z": u.dimensionless_unscaled, "x": u.kpc, "y": u.kpc, "z": u.kpc,
+          "v_R": u.km / u.s, "v_T": u.km / u.s, "v_z": u.km / u.s}
+
+# columns that are saved to (and loaded from) files and the attributes in which they are stored
+_COLUMNS = ["tau", "Z", "x", "y", "z", "which_comp", "v_R", "v_T", "v_z"]
+_COLUMN_ATTRS = ["_" + name for name in _COLUMNS]
+
+
+class _UnitFreeArray():
+    """An array attribute of a star formation history that is stored unit-free in a canonical unit
+
+    Any :class:`~astropy.units.Quantity` that is assigned is converted to the canonical unit, so arrays can be
+    set with whatever units are convenient. Private attributes (e.g. ``_tau``) give the plain float array for
+    fast internal calculations, whilst public ones (e.g. ``v_R``) give a cached Quantity view of the same
+    array and raise an AttributeError until they are set. Arrays that were not read when loading from a
+    file (see :func:`load`) are read the first time they are accessed.
+
+    Parameters
+    ----------
+    unit : :class:`~astropy.units.Unit`
+        The canonical unit of the array, or None for arrays that aren't numbers (stored as they are)
+    """
+    def __init__(self, unit):
+        self.unit = unit
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.public = not name.startswith("_")
+        self.key = "_" + name if self.public else name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        values = instance.__dict__.get(self.key)
+        if values is None and self.key in instance.__dict__.get("_lazy_columns", {}):
+            values = instance._read_lazy_column(self.key)
+        if not self.public:
+            return values
+        if values is None:
+            raise AttributeError(f"'{owner.__name__}' object has no attribute '{self.name}'")
+        return instance._get_view(self.name, lambda: values << self.unit)
+
+    def __set__(self, instance, value):
+        if value is not None and self.unit is None:
+            value = np.asarray(value)
+        elif value is not None:
+            value = np.asarray(value.to_value(self.unit) if isinstance(value, u.Quantity) else value,
+                               dtype=float)
+        instance.__dict__[self.key] = value
+        instance.__dict__["_views"] = {}
+
+        # anything that is set no longer needs to be read from a file (copy since copies may share the dict)
+        lazy_columns = instance.__dict__.get("_lazy_columns", {})
+        if self.key in lazy_columns:
+            instance.__dict__["_lazy_columns"] = {k: v for k, v in lazy_columns.items() if k != self.key}
 
 
 class StarFormationHistory():
@@ -35,6 +96,13 @@ class StarFormationHistory():
     sampled/calculated when accessed then it will be automatically sampled/calculated. If sampling, ALL values
     will be sampled.
 
+    Indexing with an integer, a slice or consecutive integers gives a new object whose arrays are *views* of
+    the arrays of this one (any other index gives copies), so editing the values of a slice in place (e.g.
+    ``g[:10]._x[:] = 0``) also changes the original. Assigning new arrays (e.g. ``g[:10]._x = x``) doesn't,
+    and nor do :func:`concat` or re-sampling. Use :func:`copy.deepcopy` on a slice if you need to edit it
+    independently. The same applies to the ``initial_galaxy`` of a sliced
+    :class:`~cogsworth.pop.Population`.
+
     Parameters
     ----------
     size : `int`
@@ -46,10 +114,35 @@ class StarFormationHistory():
         by default None
     immediately_sample : `bool`, optional
         Whether to immediately sample the points, by default True
+    qmc : `bool`, optional
+        Whether to draw the uniform variates fed to the inverse CDF samplers from a scrambled Sobol'
+        sequence rather than pseudo-random numbers, by default False. Each component gets its own
+        quasi-random points with one dimension for each of lookback time, radius, height and azimuth, which
+        reduces the sampling noise in statistics of the population (see
+        :func:`~cogsworth.utils.sobol_uniforms`).
 
     """
+    # sampled values are stored unit-free (Gyr, kpc and km/s) and exposed as Quantities
+    _tau = _UnitFreeArray(_UNITS["tau"])
+    _Z = _UnitFreeArray(_UNITS["Z"])
+    _x = _UnitFreeArray(_UNITS["x"])
+    _y = _UnitFreeArray(_UNITS["y"])
+    _z = _UnitFreeArray(_UNITS["z"])
+    _v_R = _UnitFreeArray(_UNITS["v_R"])
+    _v_T = _UnitFreeArray(_UNITS["v_T"])
+    _v_z = _UnitFreeArray(_UNITS["v_z"])
+    v_R = _UnitFreeArray(_UNITS["v_R"])
+    v_T = _UnitFreeArray(_UNITS["v_T"])
+    v_z = _UnitFreeArray(_UNITS["v_z"])
+    _which_comp = _UnitFreeArray(None)
+
+    # parameters that are (potentially large) arrays, saved as datasets rather than in the file attributes
+    _array_params = []
+
     def __init__(self, size, components=None, component_masses=None,
-                 immediately_sample=True, **kwargs):
+                 immediately_sample=True, qmc=False, **kwargs):
+        self.qmc = qmc
+        self._qmc_points = None
         self._components = components
         self._component_masses = component_masses
         self._size = size
@@ -85,36 +178,14 @@ class StarFormationHistory():
             raise ValueError(("Can only index using an `int`, `list`, `ndarray` or `slice`, you supplied a "
                               f"`{type(ind).__name__}`"))
 
-        # work out any extra kwargs we might need to set
-        kwargs = self.__dict__
-        actual_kwargs = {}
-        for key in list(kwargs.keys()):
-            if key[0] != "_" and key not in ["v_R", "v_T", "v_z"]:
-                actual_kwargs[key] = kwargs[key]
-            elif key.startswith("_component"):
-                actual_kwargs[key[1:]] = kwargs[key]
-
-        # pre-mask tau to get the length easily
-        tau = np.atleast_1d(self.tau[ind])
-
-        new_sfh = self.__class__(size=len(tau), immediately_sample=False, **actual_kwargs)
-
-        new_sfh._tau = tau
-        new_sfh._Z = np.atleast_1d(self._Z[ind])
-        new_sfh._x = np.atleast_1d(self._x[ind])
-        new_sfh._y = np.atleast_1d(self._y[ind])
-        new_sfh._z = np.atleast_1d(self._z[ind])
-        new_sfh._which_comp = np.atleast_1d(self._which_comp[ind])
-
-        # if we have any of the velocity components then we need to slice them too
-        if hasattr(self, "v_R"):
-            new_sfh.v_R = np.atleast_1d(self.v_R[ind])
-        if hasattr(self, "v_T"):
-            new_sfh.v_T = np.atleast_1d(self.v_T[ind])
-        if hasattr(self, "v_z"):
-            new_sfh.v_z = np.atleast_1d(self.v_z[ind])
+        if self._tau is None:
+            self.sample()
 
-        return new_sfh
+        # contiguous selections become slices so that the new columns are views rather than copies
+        ind = _as_basic_index(ind, len(self))
+        columns = {attr: getattr(self, attr) for attr in _COLUMN_ATTRS}
+        return self._with_columns({attr: None if values is None else values[ind]
+                                   for attr, values in columns.items()})
 
     @property
     def size(self):
@@ -162,7 +233,7 @@ class StarFormationHistory():
         """
         if self._tau is None:
             self.sample()
-        return self._tau
+        return self._get_view("tau", lambda: self._tau << _UNITS["tau"])
 
     @property
     def Z(self):
@@ -175,7 +246,7 @@ class StarFormationHistory():
         """
         if self._Z is None:
             self.sample()
-        return self._Z
+        return self._get_view("Z", lambda: self._Z << _UNITS["Z"])
 
     @property
     def x(self):
@@ -188,7 +259,7 @@ class StarFormationHistory():
         """
         if self._x is None:
             self.sample()
-        return self._x
+        return self._get_view("x", lambda: self._x << _UNITS["x"])
 
     @property
     def y(self):
@@ -201,7 +272,7 @@ class StarFormationHistory():
         """
         if self._y is None:
             self.sample()
-        return self._y
+        return self._get_view("y", lambda: self._y << _UNITS["y"])
 
     @property
     def z(self):
@@ -214,7 +285,7 @@ class StarFormationHistory():
         """
         if self._z is None:
             self.sample()
-        return self._z
+        return self._get_view("z", lambda: self._z << _UNITS["z"])
 
     @property
     def rho(self):
@@ -227,7 +298,9 @@ class StarFormationHistory():
         rho : :class:`~astropy.units.Quantity` [length]
             The galactocentric cylindrical radius of the sampled points
         """
-        return (self.x**2 + self.y**2)**(0.5)
+        if self._x is None:
+            self.sample()
+        return self._get_view("rho", lambda: np.sqrt(self._x**2 + self._y**2) << u.kpc)
 
     @property
     def phi(self):
@@ -240,7 +313,9 @@ class StarFormationHistory():
         phi : :class:`~astropy.units.Quantity` [angle]
             The galactocentric azimuthal angle of the sampled points
         """
-        return np.arctan2(self.y, self.x)
+        if self._x is None:
+            self.sample()
+        return self._get_view("phi", lambda: np.arctan2(self._y, self._x) << u.rad)
 
     @property
     def positions(self):
@@ -251,7 +326,48 @@ class StarFormationHistory():
         positions : :class:`~astropy.units.Quantity` [length], shape=(3, :attr:`~size`)
             The galactocentric positions of the sampled points
         """
-        return [self.x.to(u.kpc).value, self.y.to(u.kpc).value, self.z.to(u.kpc).value] * u.kpc
+        if self._x is None:
+            self.sample()
+        return self._get_view("positions", lambda: np.array([self._x, self._y, self._z]) << u.kpc)
+
+    def _get_view(self, name, func):
+        """Get a cached value (e.g. a Quantity view of an array), computing it with `func` if necessary"""
+        views = self.__dict__.setdefault("_views", {})
+        if name not in views:
+            views[name] = func()
+        return views[name]
+
+    def _with_columns(self, columns):
+        """Create a copy of the model (sharing its parameters) that holds the given sampled columns
+
+        The columns must already be unit-free arrays in the canonical units and are stored as they are, so
+        no conversions or copies are made.
+
+        Parameters
+        ----------
+        columns : `dict`
+            The arrays of the new model, keyed by their attribute (e.g. ``"_tau"``), with None for any that
+            haven't been sampled
+
+        Returns
+        -------
+        new_sfh : :class:`StarFormationHistory`
+            The new model
+        """
+        new_sfh = copy(self)
+        new_sfh.__citations__ = self.__citations__.copy()
+        new_sfh.__dict__.update(columns)
+        new_sfh.__dict__["_views"] = {}
+        new_sfh.__dict__.pop("_lazy_columns", None)
+        new_sfh._size = len(columns["_tau"])
+        return new_sfh
+
+    def _read_lazy_column(self, key):
+        """Read a column that was not read when loading the model from a file"""
+        file_name, group_key = self._lazy_columns[key]
+        with h5.File(file_name, "r") as file:
+            setattr(self, key, _read_column(file[group_key], key[1:]))
+        return self.__dict__[key]
 
     @property
     def which_comp(self):
@@ -312,6 +428,16 @@ class StarFormationHistory():
         if self.size is None:
             raise ValueError("`self.size` has not been set")
 
+        return self._sample_components(self._get_component_sizes())
+
+    def _get_component_sizes(self):
+        """Work out how many points to draw from each component based on their masses
+
+        Returns
+        -------
+        sizes : :class:`~numpy.ndarray`
+            Number of points for each component (summing to :attr:`size`)
+        """
         if self._component_masses is None or self._components is None:
             raise ValueError("`self.components` or `self.component_masses` has not been set")
 
@@ -324,20 +450,34 @@ class StarFormationHistory():
         for i in range(len(self._components) - 1):
             sizes[i] = np.round(mass_fractions[i] * self._size)
         sizes[-1] = self._size - np.sum(sizes)
+        return sizes
 
-        # create an array of which component each point belongs to
-        self._which_comp = np.concatenate([[com] * sizes[i] for i, com in enumerate(self._components)])
+    def _sample_components(self, sizes):
+        """Sample a given number of points from each component, combine and save in class attributes
+
+        Parameters
+        ----------
+        sizes : :class:`~numpy.ndarray`
+            Number of points to draw from each component (must sum to :attr:`size`)
+        """
+        # create an array of which component each point belongs to (in contiguous blocks before shuffling)
+        self._which_comp = np.repeat(self._components, sizes)
+        ends = np.cumsum(sizes)
 
-        self._tau = np.zeros(self._size) * u.Gyr
-        rho = np.zeros(self._size) * u.kpc
-        z = np.zeros(self._size) * u.kpc
+        self._tau = np.zeros(self._size)
+        rho = np.zeros(self._size)
+        z = np.zeros(self._size)
 
         # go through each component and get lookback time, radius and height
+        qmc_points = []
         for i, com in enumerate(self._components):
-            com_mask = self._which_comp == com
-            self._tau[com_mask] = self.draw_lookback_times(sizes[i], component=com)
-            rho[com_mask] = self.draw_radii(sizes[i], component=com)
-            z[com_mask] = self.draw_heights(sizes[i], component=com)
+            com_mask = slice(ends[i] - sizes[i], ends[i])
+            if self.qmc:
+                self._qmc_points = sobol_uniforms(sizes[i], dims=4)
+                qmc_points.append(self._qmc_points)
+            self._tau[com_mask] = self.draw_lookback_times(sizes[i], component=com).to_value(u.Gyr)
+            rho[com_mask] = self.draw_radii(sizes[i], component=com).to_value(u.kpc)
+            z[com_mask] = self.draw_heights(sizes[i], component=com).to_value(u.kpc)
 
         # shuffle the samples so components are well mixed (mostly for plotting)
         random_order = np.random.permutation(self._size)
@@ -346,8 +486,11 @@ class StarFormationHistory():
         z = z[random_order]
         self._which_comp = self._which_comp[random_order]
 
-        # draw a random azimuthal angle
-        phi = self.draw_phi()
+        # draw a random azimuthal angle (using the last dimension of the quasi-random points)
+        if self.qmc:
+            self._qmc_points = np.concatenate(qmc_points)[random_order]
+        phi = self.draw_phi().to_value(u.rad)
+        self._qmc_points = None
 
         self._x = rho * np.sin(phi)
         self._y = rho * np.cos(phi)
@@ -356,7 +499,92 @@ class StarFormationHistory():
         # compute the metallicity given the other values
         self._Z = self.get_metallicity()
 
-        return self._tau, self.positions, self.Z
+        return self.tau, self.positions, self.Z
+
+    def iter_chunks(self, chunk_size, seed=None):
+        """Sample the model in chunks rather than drawing every point at once
+
+        Each chunk is a new instance of the model with (up to) ``chunk_size`` sampled points, so that very
+        large galaxies can be generated lazily without ever holding all :attr:`size` points in memory.
+        Every chunk gets its own random stream, spawned from a single :class:`~numpy.random.SeedSequence`,
+        so the chunks are reproducible for a given ``seed`` (and the global random state is left unchanged).
+
+        The points of each component are spread evenly over the chunks such that, combined, the chunks
+        contain exactly the same number of points from each component as a single call to :meth:`sample`
+        would give. Models that override :meth:`sample` (e.g. those that sample with ``agama``) instead
+        call it for each chunk.
+
+        Parameters
+        ----------
+        chunk_size : `int`
+            Maximum number of points in each chunk
+        seed : `int`, optional
+            Entropy for the :class:`~numpy.random.SeedSequence`, by default drawn from NumPy's global random
+            state (so that :func:`numpy.random.seed` still gives reproducible results)
+
+        Yields
+        ------
+        chunk : :class:`StarFormationHistory`
+            A sampled instance of the same model with (up to) ``chunk_size`` points
+        """
+        if chunk_size <= 0:
+            raise ValueError("`chunk_size` must be greater than 0")
+        if seed is None:
+            seed = np.random.randint(np.iinfo(np.int64).max)
+
+        n_chunks = int(np.ceil(self._size / chunk_size))
+        seeds = [seq.generate_state(4) for seq in np.random.SeedSequence(seed).spawn(n_chunks)]
+        overrides_sample = type(self).sample is not StarFormationHistory.sample
+
+        # the number of points from each component in the first n points overall (after rounding)
+        if not overrides_sample:
+            bounds = np.cumsum(self._get_component_sizes())
+
+            def points_before(n):
+                return np.diff(np.round(bounds * n / self._size).astype(int), prepend=0)
+
+        for i in range(n_chunks):
+            start, end = i * chunk_size, min((i + 1) * chunk_size, self._size)
+
+            # copy the parameters and forget anything that has been sampled
+            chunk = copy(self)
+            chunk.__citations__ = self.__citations__.copy()
+            chunk._size = end - start
+            for attr in ["_tau", "_Z", "_x", "_y", "_z", "_v_R", "_v_T", "_v_z", "_which_comp"]:
+                setattr(chunk, attr, None)
+
+            with _seeded_random_state(seeds[i]):
+                if overrides_sample:
+                    chunk.sample()
+                else:
+                    chunk._sample_components(points_before(end) - points_before(start))
+            yield chunk
+
+    def _draw_uniform(self, size, dim):
+        """Draw uniform variates in [0, 1) for an inverse CDF sampler
+
+        Parameters
+        ----------
+        size : `int` or `None`
+            How many variates to draw (a single float if `None`)
+        dim : `int`
+            Which dimension of the quasi-random points to use (0: lookback time, 1: radius, 2: height,
+            3: azimuth), only used if :attr:`qmc` is True
+
+        Returns
+        -------
+        U : :class:`~numpy.ndarray`
+            Uniform variates
+        """
+        if not self.qmc:
+            return np.random.uniform(size=size)
+
+        # use the points for the component currently being sampled, or fresh ones for a direct call
+        if size is None:
+            return sobol_uniforms(1)[0, 0]
+        if self._qmc_points is not None and len(self._qmc_points) == size:
+            return self._qmc_points[:, dim]
+        return sobol_uniforms(size)[:, 0]
 
     def draw_lookback_times(self, size=None, component=None):
         raise NotImplementedError("This StarFormationHistory model has not implemented this method")
@@ -373,6 +601,31 @@ class StarFormationHistory():
     def get_metallicity(self):
         raise NotImplementedError("This StarFormationHistory model has not implemented this method")
 
+    def get_velocity_dispersions(self, v_dispersion, v_circ):
+        """Get the velocity dispersion in each direction and the asymmetric drift of each sampled point
+
+        By default every point has the same isotropic dispersion and rotates at the circular velocity, but
+        models can override this to give kinematics that depend on the age and component of each point (see
+        :class:`Wagg2022`).
+
+        Parameters
+        ----------
+        v_dispersion : :class:`~astropy.units.Quantity` [velocity]
+            The total velocity dispersion (split evenly between the three directions)
+        v_circ : :class:`~numpy.ndarray`
+            The circular velocity at each point in km/s
+
+        Returns
+        -------
+        sigma : :class:`~numpy.ndarray`, shape (3, size)
+            The velocity dispersion in the radial, tangential and vertical directions of each point in km/s
+        v_drift : :class:`~numpy.ndarray`, shape (size,)
+            The asymmetric drift of each point (how much slower than the circular velocity its mean rotation
+            is) in km/s
+        """
+        sigma = np.full((3, len(v_circ)), v_dispersion.to_value(u.km / u.s) / np.sqrt(3))
+        return sigma, np.zeros(len(v_circ))
+
     def plot(self, coordinates="cartesian", component=None, colour_by=None, show=True, cbar_norm=LogNorm(),
              cbar_label=r"Metallicity, $Z$", cmap="plasma", xlim=None, ylim=None, zlim=None, **kwargs):
         fig, axes = plt.subplots(2, 1, figsize=(10 * 1.2475, 14), gridspec_kw={'height_ratios': [4, 14]},
@@ -427,10 +680,11 @@ class StarFormationHistory():
         if show:
             plt.show()
 
-    def save(self, file_name, key="sfh"):
+    def save(self, file_name, key="sfh", append=False, compression=None, compression_opts=None, shuffle=True):
         """Save the entire class to storage.
 
-        Data will be stored in an hdf5 file using `file_name`.
+        Data will be stored in an hdf5 file using `file_name`, with a dataset for each column (e.g. ``tau``)
+        in a group called `key` and the parameters of the model in its attributes.
 
         Parameters
         ----------
@@ -439,50 +693,102 @@ class StarFormationHistory():
             ".h5" will be appended.
         key : `str`, optional
             Key to use for the hdf5 file, by default "sfh"
+        append : `bool`, optional
+            Whether to append the samples to any existing ones under `key` (which must have also been saved
+            with ``append=True``), by default False
+        compression : `str`, optional
+            Compression to apply to each column, one of [None, "gzip", "lzf", "blosc"], by default None (no
+            compression). "blosc" requires :mod:`hdf5plugin` to be installed (both when saving and loading).
+            When appending, the compression of the existing file is used.
+        compression_opts : `int`, optional
+            Compression level to use for "gzip" (0-9, default 4) or "blosc" (0-9, default 5)
+        shuffle : `bool`, optional
+            Whether to apply a byte-shuffle filter before compression, by default True. Only used when
+            `compression` is set.
+
+        Raises
+        ------
+        ValueError
+            If appending to samples that weren't saved with ``append=True`` or that have different columns
         """
         # append file extension if necessary
         if file_name[-3:] != ".h5":
             file_name += ".h5"
 
-        # store data in a dataframe and save this to file
-        data = {
-            "tau": self.tau.to(u.Gyr),
-            "Z": self.Z,
-            "x": self.x.to(u.kpc),
-            "y": self.y.to(u.kpc),
-            "z": self.z.to(u.kpc),
-            "which_comp": self.which_comp
-        }
-
-        # additionally store velocity components if they exist
-        for attr in ["v_R", "v_T", "v_z"]:
-            if hasattr(self, attr):
-                data[attr] = getattr(self, attr).to(u.km / u.s).value
-
-        df = pd.DataFrame(data=data)
-        df.to_hdf(file_name, key=key)
+        # gather the sampled columns (velocities are only stored if they exist)
+        if self._tau is None:
+            self.sample()
+        columns = {name: getattr(self, "_" + name) for name in _COLUMNS}
+        columns = {name: values for name, values in columns.items() if values is not None}
 
-        # convert parameters into something storable
-        params = simplify_params(self.__dict__.copy())
+        # store the components as integer codes with a list of their labels
+        codes, labels = pd.factorize(columns["which_comp"])
+        labels = [str(label) for label in labels]
 
-        # check whether the class is part of the default module, get parent recursively if not
-        module = sys.modules[__name__]
-        class_name = self.__class__.__name__
-        class_obj = self
-        while not hasattr(module, class_name):
-            class_obj = class_obj.__class__.__bases__[0]
-            class_name = class_obj.__name__
-
-        # warn the user if we saved a different class name
-        if class_name != self.__class__.__name__:
-            print((f"Warning: StarFormationHistory class being saved as `{class_name}` instead of "
-                   f"`{self.__class__.__name__}`. Data will be copied but new sampling will draw from the "
-                   f"functions in `{class_name}` rather than the custom class you used."))
-        params["class_name"] = class_name
-
-        # dump it all into the file attrs using yaml
         with h5.File(file_name, "a") as file:
-            file[key].attrs["params"] = yaml.dump(params, default_flow_style=None)
+            if append and key in file:
+                group = file[key]
+                if not _is_appendable(group):
+                    raise ValueError((f"The samples under `{key}` in {file_name} were not saved in an "
+                                      "appendable format, you need to first save with `append=True` to "
+                                      "append to them"))
+                if set(columns) != {name for name in _COLUMNS if name in group}:
+                    raise ValueError(("The samples you are appending must have the same columns as "
+                                      f"{file_name}"))
+
+                # add any new components to the labels already in the file
+                file_labels = list(group["which_comp"].attrs["labels"])
+                file_labels += [label for label in labels if label not in file_labels]
+                codes = np.array([file_labels.index(label) for label in labels], dtype=int)[codes]
+                group["which_comp"].attrs["labels"] = file_labels
+
+                n_rows = group["tau"].shape[0]
+                for name, values in columns.items():
+                    dataset = group[name]
+                    dataset.resize(n_rows + len(values), axis=0)
+                    dataset[n_rows:] = codes if name == "which_comp" else values
+            else:
+                if key in file:
+                    del file[key]
+                group = file.create_group(key)
+                dataset_kwargs = _get_compression_kwargs(compression, compression_opts, shuffle)
+                for name, values in columns.items():
+                    group.create_dataset(name, data=codes if name == "which_comp" else values,
+                                         chunks=True if append else None,
+                                         maxshape=(None,) if append else None, **dataset_kwargs)
+                group["which_comp"].attrs["labels"] = labels
+
+            # convert parameters into something storable
+            params = simplify_params({k: v for k, v in self.__dict__.items() if k not in self._array_params})
+
+            # the size should be the total number of rows now in the file
+            params["_size"] = int(group["tau"].shape[0])
+
+            # check whether the class is part of the default module, get parent recursively if not
+            module = sys.modules[__name__]
+            class_name = self.__class__.__name__
+            class_obj = self
+            while not hasattr(module, class_name):
+                class_obj = class_obj.__class__.__bases__[0]
+                class_name = class_obj.__name__
+
+            # warn the user if we saved a different class name
+            if class_name != self.__class__.__name__:
+                print((f"Warning: StarFormationHistory class being saved as `{class_name}` instead of "
+                       f"`{self.__class__.__name__}`. Data will be copied but new sampling will draw from "
+                       f"the functions in `{class_name}` rather than the custom class you used."))
+            params["class_name"] = class_name
+
+            # dump it all into the group attrs using yaml
+            group.attrs["params"] = yaml.dump(params, default_flow_style=None)
+
+            # store any array parameters as datasets alongside the samples
+            for name in self._array_params:
+                value = getattr(self, name)
+                if f"param_{name}" in group:
+                    del group[f"param_{name}"]
+                group[f"param_{name}"] = getattr(value, "value", value)
+                group[f"param_{name}"].attrs["unit"] = str(getattr(value, "unit", ""))
 
 
 class BurstUniformDisc(StarFormationHistory):
@@ -515,15 +821,15 @@ class BurstUniformDisc(StarFormationHistory):
         return np.repeat(self.t_burst.value, size) * self.t_burst.unit
 
     def draw_radii(self, size=None, component=None):
-        return np.random.uniform(0, self.R_max.value**2, size)**(0.5) * self.R_max.unit
+        return (self.R_max.value**2 * self._draw_uniform(size, 1))**(0.5) * self.R_max.unit
 
     def draw_heights(self, size=None, component=None):
-        return np.random.uniform(-self.z_max.value, self.z_max.value, size) * self.z_max.unit
+        return (2 * self._draw_uniform(size, 2) - 1) * self.z_max.value * self.z_max.unit
 
     def draw_phi(self, size=None):
         # if no size is given then use the class value
         size = self._size if size is None else size
-        return np.random.uniform(0, 2 * np.pi, size) * u.rad
+        return 2 * np.pi * self._draw_uniform(size, 3) * u.rad
 
     def get_metallicity(self):
         return np.repeat(self.Z_all, self.size) * u.dimensionless_unscaled
@@ -537,10 +843,67 @@ class ConstantUniformDisc(BurstUniformDisc):
     Based on :class:`BurstUniformDisc`.
     """
     def draw_lookback_times(self, size=None, component=None):
-        return np.random.uniform(0, self.t_burst.value, size) * self.t_burst.unit
+        return self.t_burst.value * self._draw_uniform(size, 0) * self.t_burst.unit
+
+
+class _FrankelDisc(StarFormationHistory):
+    """A base class for models with the star formation history and metallicity relations of
+    `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_. Subclasses must set
+    ``tsfr``, ``galaxy_age``, ``Fm``, ``gradient``, ``Rnow``, ``gamma`` and ``zsun``."""
+    def draw_lookback_times(self, size=None, component="low_alpha_disc"):
+        """Inverse CDF sampling of lookback times. low_alpha and high_alpha discs uses
+        `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_ Eq. 4,
+        separated and normalised at 8 Gyr. The bulge matches the distribution in Fig. 7 of
+        `Bovy+19 <https://ui.adsabs.harvard.edu/abs/2019MNRAS.490.4740B/abstract>`_ but accounts
+        for sample's bias.
+
+        Parameters
+        ----------
+        size : `int`
+            How many times to draw
+        component : `str`
+            Which component of the Milky Way
+
+        Returns
+        -------
+        tau : :class:`~astropy.units.Quantity` [time]
+            Random lookback times
+        """
+        # if no size is given then use the class value
+        size = self._size if size is None else size
+        if component in ["low_alpha_disc", "high_alpha_disc"]:
+            # the star formation rate is exponential so its CDF can be inverted analytically
+            t_sfr = self.tsfr.to(u.Gyr).value
+            t_min, t_max = (0, 8) if component == "low_alpha_disc" else (8, 12)
+            U = self._draw_uniform(size, 0)
+            tau = t_sfr * np.log(np.exp(t_min / t_sfr)
+                                 + U * (np.exp(t_max / t_sfr) - np.exp(t_min / t_sfr))) * u.Gyr
+        elif component == "bulge":
+            if self.qmc:
+                tau = beta.ppf(self._draw_uniform(size, 0), a=2, b=3, loc=6, scale=6) * u.Gyr
+            else:
+                tau = beta.rvs(a=2, b=3, loc=6, scale=6, size=size) * u.Gyr
+        return tau
+
+    def get_metallicity(self):
+        """Convert radius and time to metallicity using
+        `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_ Eq. 7 and
+        `Bertelli+1994 <https://ui.adsabs.harvard.edu/abs/1994A%26AS..106..275B/abstract>`_ Eq. 9 but
+        assuming all stars have the solar abundance pattern (so no factor of 0.977)
+
+        Returns
+        -------
+        Z : :class:`~astropy.units.Quantity` [dimensionless]
+            Metallicities corresponding to radii and times
+        """
+        gradient = self.gradient.to_value(1 / u.kpc)
+        rho = np.sqrt(self._x**2 + self._y**2)
+        FeH = self.Fm + gradient * rho - (self.Fm + gradient * self.Rnow.to_value(u.kpc))\
+            * (1 - (self._tau / self.galaxy_age.to_value(u.Gyr)))**self.gamma
+        return np.power(10, FeH + np.log10(self.zsun)) * u.dimensionless_unscaled
 
 
-class Wagg2022(StarFormationHistory):
+class Wagg2022(_FrankelDisc):
     """A semi-empirical model defined in
     `Wagg+2022 <https://ui.adsabs.harvard.edu/abs/2021arXiv211113704W/abstract>`_
     (see Figure 1 and Section 2.2.1 for a detailed explanation.), heavily based on
@@ -566,11 +929,29 @@ class Wagg2022(StarFormationHistory):
         Time dependence of chemical enrichment, by default 0.3
     zsun : `float`, optional
         Solar metallicity, by default 0.0142
+    age_velocity_relation : `bool`, optional
+        Whether initial velocities should use the age-velocity relation and asymmetric drift of each
+        component (see :meth:`get_velocity_dispersions`) rather than the isotropic ``v_dispersion`` of the
+        :class:`~cogsworth.pop.Population`, by default False
     """
+    # age-velocity relation parameters for the (radial, tangential, vertical) directions of each component,
+    # the dispersion is sigma_10 * ((tau + tau_1) / (10 Gyr + tau_1))^beta, in km/s and Gyr
+    avr_params = {
+        "low_alpha_disc": {"sigma_10": [41.9, 28.8, 25.6], "tau_1": [0.001, 0.715, 0.261],
+                           "beta": [0.307, 0.430, 0.445]},
+        "high_alpha_disc": {"sigma_10": [67.0, 38.0, 35.0], "tau_1": [0.001, 0.715, 0.261],
+                            "beta": [0.307, 0.430, 0.445]},
+        "bulge": {"sigma_10": [100.0, 100.0, 100.0], "tau_1": [0.0, 0.0, 0.0], "beta": [0.0, 0.0, 0.0]},
+    }
+
+    # constant in the Stromberg relation between the asymmetric drift and radial dispersion in km/s
+    stromberg_k = 80.0
+
     def __init__(self, size, components=["low_alpha_disc", "high_alpha_disc", "bulge"],
                  component_masses=[2.585e10, 2.585e10, 0.91e10],
                  tsfr=6.8 * u.Gyr, alpha=0.3, Fm=-1, gradient=-0.075 / u.kpc, Rnow=8.7 * u.kpc,
-                 gamma=0.3, zsun=0.0142, galaxy_age=12 * u.Gyr, **kwargs):
+                 gamma=0.3, zsun=0.0142, galaxy_age=12 * u.Gyr, age_velocity_relation=False, **kwargs):
+        self.age_velocity_relation = age_velocity_relation
         self.tsfr = tsfr
         self.alpha = alpha
         self.Fm = Fm
@@ -582,39 +963,43 @@ class Wagg2022(StarFormationHistory):
         super().__init__(size=size, components=components, component_masses=component_masses, **kwargs)
         self.__citations__.extend(["Wagg+2022", "Frankel+2018", "Bovy+2016", "Bovy+2019", "McMillan+2011"])
 
-    def draw_lookback_times(self, size=None, component="low_alpha_disc"):
-        """Inverse CDF sampling of lookback times. low_alpha and high_alpha discs uses
-        `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_ Eq. 4,
-        separated and normalised at 8 Gyr. The bulge matches the distribution in Fig. 7 of
-        `Bovy+19 <https://ui.adsabs.harvard.edu/abs/2019MNRAS.490.4740B/abstract>`_ but accounts
-        for sample's bias.
+    def get_velocity_dispersions(self, v_dispersion, v_circ):
+        r"""Get the velocity dispersion in each direction and the asymmetric drift of each sampled point
+
+        If :attr:`age_velocity_relation` is False this is the same as
+        :meth:`StarFormationHistory.get_velocity_dispersions`. Otherwise the dispersions follow a power law
+        in age for each component (:attr:`avr_params`, with disc parameters roughly following the solar
+        neighbourhood fits of `Aumer & Binney 2009
+        <https://ui.adsabs.harvard.edu/abs/2009MNRAS.397.1286A/abstract>`_, a hotter high alpha disc and an
+        isotropic bulge) and the asymmetric drift follows the Stromberg relation, :math:`\sigma_R^2 / k` (with
+        :math:`k =` :attr:`stromberg_k`, capped at the circular velocity). All points are calculated in a
+        single pass with the parameters of their component.
 
         Parameters
         ----------
-        size : `int`
-            How many times to draw
-        component : `str`
-            Which component of the Milky Way
+        v_dispersion : :class:`~astropy.units.Quantity` [velocity]
+            The total velocity dispersion (only used if :attr:`age_velocity_relation` is False)
+        v_circ : :class:`~numpy.ndarray`
+            The circular velocity at each point in km/s
 
         Returns
         -------
-        tau : :class:`~astropy.units.Quantity` [time]
-            Random lookback times
+        sigma : :class:`~numpy.ndarray`, shape (3, size)
+            The velocity dispersion in the radial, tangential and vertical directions of each point in km/s
+        v_drift : :class:`~numpy.ndarray`, shape (size,)
+            The asymmetric drift of each point in km/s
         """
-        # if no size is given then use the class value
-        size = self._size if size is None else size
-        if component == "low_alpha_disc":
-            U = np.random.rand(size)
-            norm = 1 / quad(lambda x: np.exp(-(self.galaxy_age.value - x) / self.tsfr.value), 0, 8)[0]
-            tau = self.tsfr * np.log((U * np.exp(self.galaxy_age / self.tsfr)) / (norm * self.tsfr.value) + 1)
-        elif component == "high_alpha_disc":
-            U = np.random.rand(size)
-            norm = 1 / quad(lambda x: np.exp(-(self.galaxy_age.value - x) / self.tsfr.value), 8, 12)[0]
-            tau = self.tsfr * np.log((U * np.exp(self.galaxy_age / self.tsfr)) / (norm * self.tsfr.value)
-                                     + np.exp(8 * u.Gyr / self.tsfr))
-        elif component == "bulge":
-            tau = beta.rvs(a=2, b=3, loc=6, scale=6, size=size) * u.Gyr
-        return tau
+        if not self.age_velocity_relation:
+            return super().get_velocity_dispersions(v_dispersion, v_circ)
+
+        # look up the parameters of the component of each point (each with shape (size, 3))
+        labels, comp_inds = np.unique(self._which_comp, return_inverse=True)
+        sigma_10, tau_1, beta = (np.array([self.avr_params[label][param] for label in labels])[comp_inds]
+                                 for param in ["sigma_10", "tau_1", "beta"])
+
+        sigma = sigma_10 * ((self._tau[:, np.newaxis] + tau_1) / (10 + tau_1))**beta
+        v_drift = np.minimum(sigma[:, 0]**2 / self.stromberg_k, v_circ)
+        return sigma.T, v_drift
 
     def draw_radii(self, size=None, component="low_alpha_disc"):
         """Inverse CDF sampling of galactocentric radii using
@@ -638,13 +1023,13 @@ class Wagg2022(StarFormationHistory):
         size = self._size if size is None else size
 
         if component == "low_alpha_disc":
-            R_0 = 4 * u.kpc * (1 - self.alpha * (self._tau[self._which_comp == component] / (8 * u.Gyr)))
+            R_0 = 4 * u.kpc * (1 - self.alpha * (self._tau[self._which_comp == component] / 8))
         elif component == "high_alpha_disc":
             R_0 = 1 / 0.43 * u.kpc
         else:
             R_0 = 1.5 * u.kpc
 
-        U = np.random.rand(size)
+        U = self._draw_uniform(size, 1)
         rho = - R_0 * (lambertw((U - 1) / np.exp(1), k=-1).real + 1)
         return rho
 
@@ -674,8 +1059,13 @@ class Wagg2022(StarFormationHistory):
             z_d = 0.95 * u.kpc
         else:
             z_d = 0.2 * u.kpc
-        U = np.random.rand(size)
-        z = np.random.choice([-1, 1], size) * z_d * np.log(1 - U)
+        if self.qmc:
+            # use a single variate for both the side of the disc and the distance from the plane
+            U = 2 * self._draw_uniform(size, 2) - 1
+            z = -np.sign(U) * z_d * np.log(1 - np.abs(U))
+        else:
+            U = np.random.rand(size)
+            z = np.random.choice([-1, 1], size) * z_d * np.log(1 - U)
         return z
 
     def draw_phi(self, size=None):
@@ -693,26 +1083,141 @@ class Wagg2022(StarFormationHistory):
         """
         # if no size is given then use the class value
         size = self._size if size is None else size
-        return np.random.uniform(0, 2 * np.pi, size) * u.rad
+        return 2 * np.pi * self._draw_uniform(size, 3) * u.rad
 
-    def get_metallicity(self):
-        """Convert radius and time to metallicity using
-        `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_ Eq. 7 and
-        `Bertelli+1994 <https://ui.adsabs.harvard.edu/abs/1994A%26AS..106..275B/abstract>`_ Eq. 9 but
-        assuming all stars have the solar abundance pattern (so no factor of 0.977)
 
-        Returns
-        -------
-        Z : :class:`~astropy.units.Quantity` [dimensionless]
-            Metallicities corresponding to radii and times
-        """
-        rho = (self.x**2 + self.y**2)**(0.5)
-        FeH = self.Fm + self.gradient * rho - (self.Fm + self.gradient * self.Rnow)\
-            * (1 - (self._tau / self.galaxy_age))**self.gamma
-        return np.power(10, FeH + np.log10(self.zsun))
+# potentials, distribution functions and galaxy models of action-based models, keyed by their parameters
+_AGAMA_CACHE = {}
+
+# persistent pools for sampling action-based models, keyed by number of processes, such that each worker
+# keeps its own ``_AGAMA_CACHE`` between calls
+_AGAMA_POOLS = {}
+
+
+def _get_agama_pool(processes):
+    """Get a persistent pool with ``processes`` workers for sampling action-based models (creating it if
+    needed), workers are terminated when the interpreter exits"""
+    if processes not in _AGAMA_POOLS:
+        pool = Pool(processes)
+        atexit.register(pool.terminate)
+        _AGAMA_POOLS[processes] = pool
+    return _AGAMA_POOLS[processes]
+
+
+def _sample_agama_shard(model, size, seed):
+    """Sample positions and velocities from an action-based model with a particular ``agama`` seed"""
+    import agama
+    agama.setUnits(**{k: galactic[k] for k in ['length', 'mass', 'time']})
+    agama.setRandomSeed(seed)
+    return model.galaxy_model.sample(size)[0]
+
+
+class _ActionBasedModel(_FrankelDisc):      # pragma: no cover
+    """A base class for models that sample positions and velocities from an ``agama`` distribution function.
+    Subclasses must implement ``get_DF`` (returning the distribution function and potential) and
+    ``_get_cache_key`` (a tuple of the parameters they depend on).
+
+    The potential, distribution function and :class:`agama.GalaxyModel` are built once per process for each
+    set of parameters and then reused by every instance (e.g. each new population or chunk). Sampling can
+    be split between several processes, each with an independent ``agama`` seed drawn from NumPy's global
+    random state (so that :func:`numpy.random.seed` still gives reproducible results). The worker processes
+    are kept alive between calls so that they only build each model once."""
+    def __init__(self, size, processes=1, **kwargs):
+        self.processes = processes
+        self._agama_pot = None
+        self._df = None
+        self._galaxy_model = None
+
+        # ensure we don't pass components twice
+        for var in ["components", "component_masses"]:
+            if var in kwargs:
+                kwargs.pop(var)
+
+        super().__init__(size=size, components=None, component_masses=None, **kwargs)
+
+    def __getstate__(self):
+        # agama objects can't be pickled, they are rebuilt (or taken from the cache) when needed
+        state = self.__dict__.copy()
+        state.update({"_agama_pot": None, "_df": None, "_galaxy_model": None})
+        return state
+
+    def _load_agama_model(self):
+        """Get the potential, distribution function and galaxy model from the cache (building if needed)"""
+        assert check_dependencies("agama")
+        import agama
+        agama.setUnits(**{k: galactic[k] for k in ['length', 'mass', 'time']})
+
+        key = self._get_cache_key()
+        if key not in _AGAMA_CACHE:
+            df, pot = self.get_DF()
+            _AGAMA_CACHE[key] = (pot, df, agama.GalaxyModel(pot, df))
+        self._agama_pot, self._df, self._galaxy_model = _AGAMA_CACHE[key]
+
+    @property
+    def agama_pot(self):
+        if self._agama_pot is None:
+            self._load_agama_model()
+        return self._agama_pot
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._load_agama_model()
+        return self._df
+
+    @property
+    def galaxy_model(self):
+        if self._galaxy_model is None:
+            self._load_agama_model()
+        return self._galaxy_model
+
+    def sample(self):
+        """Sample from the Galaxy distribution and save in class attributes"""
+        assert check_dependencies("agama")
+
+        # create an array of which component each point belongs to
+        self._which_comp = np.repeat("low_alpha_disc", self.size)
+        self._tau = self.draw_lookback_times(size=self.size, component="low_alpha_disc")
+
+        # get cartesian coordinates from agama, split into shards with independent seeds if using processes
+        n_shards = max(min(self.processes, self.size), 1)
+        sizes = [self.size // n_shards + (i < self.size % n_shards) for i in range(n_shards)]
+        seeds = np.random.randint(1, np.iinfo(np.int32).max, size=n_shards)
+        if n_shards > 1:
+            # only send the parameters of the model to each process, not any sampled values
+            model = copy(self)
+            for attr in ["_tau", "_Z", "_x", "_y", "_z", "_v_R", "_v_T", "_v_z", "_which_comp"]:
+                setattr(model, attr, None)
+            pool = _get_agama_pool(n_shards)
+            xv = np.concatenate(pool.starmap(_sample_agama_shard, zip([model] * n_shards, sizes, seeds)))
+        else:
+            xv = _sample_agama_shard(self, self.size, seeds[0])
+
+        # convert units for velocity
+        xv[:, 3:] *= (u.kpc / u.Myr).to(u.km / u.s)
+
+        # save the positions
+        self._x = xv[:, 0]
+        self._y = xv[:, 1]
+        self._z = xv[:, 2]
+
+        # work out the velocities by rotating using SkyCoord
+        full_coord = SkyCoord(x=self.x, y=self.y, z=self.z,
+                              v_x=xv[:, 3] * u.km / u.s, v_y=xv[:, 4] * u.km / u.s, v_z=xv[:, 5] * u.km / u.s,
+                              frame="galactocentric").represent_as("cylindrical")
 
+        with u.set_enabled_equivalencies(u.dimensionless_angles()):
+            self.v_R = full_coord.differentials['s'].d_rho
+            self.v_T = (full_coord.differentials['s'].d_phi * full_coord.rho).to(u.km / u.s)
+            self.v_z = full_coord.differentials['s'].d_z
 
-class QuasiIsothermalDisk(StarFormationHistory):      # pragma: no cover
+        # compute the metallicity given the other values
+        self._Z = self.get_metallicity()
+
+        return self.tau, self.positions, self.Z
+
+
+class QuasiIsothermalDisk(_ActionBasedModel):      # pragma: no cover
     """A quasi-isothermal distribution function with parameters from
     `Sanders & Binney 2015 <https://ui.adsabs.harvard.edu/abs/2015MNRAS.449.3479S/abstract>`_.
 
@@ -734,9 +1239,11 @@ class QuasiIsothermalDisk(StarFormationHistory):      # pragma: no cover
         Time dependence of chemical enrichment, by default 0.3
     zsun : `float`, optional
         Solar metallicity, by default 0.0142
+    processes : `int`, optional
+        Number of processes to use when sampling positions and velocities, by default 1
     """
     def __init__(self, size, tsfr=6.8 * u.Gyr, Fm=-1, gradient=-0.075 / u.kpc, Rnow=8.7 * u.kpc,
-                 gamma=0.3, zsun=0.0142, galaxy_age=12 * u.Gyr, **kwargs):
+                 gamma=0.3, zsun=0.0142, galaxy_age=12 * u.Gyr, processes=1, **kwargs):
         self.tsfr = tsfr
         self.Fm = Fm
         self.gradient = gradient
@@ -745,79 +1252,11 @@ class QuasiIsothermalDisk(StarFormationHistory):      # pragma: no cover
         self.zsun = zsun
         self.galaxy_age = galaxy_age
 
-        self._agama_pot = None
-        self._df = None
-
-        # ensure we don't pass components twice
-        for var in ["components", "component_masses"]:
-            if var in kwargs:
-                kwargs.pop(var)
-
-        # TODO: Perhaps create a "action-based-potential" subclass, there's a lot repeated here
-
-        super().__init__(size=size, components=None, component_masses=None, **kwargs)
-
-    @property
-    def agama_pot(self):
-        if self._agama_pot is None:
-            self.get_DF()
-        return self._agama_pot
-
-    @property
-    def df(self):
-        if self._df is None:
-            self.get_DF()
-        return self._df
-
-    def draw_lookback_times(self, size=None, component="low_alpha_disc"):
-        """Inverse CDF sampling of lookback times. low_alpha and high_alpha discs uses
-        `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_ Eq. 4,
-        separated and normalised at 8 Gyr. The bulge matches the distribution in Fig. 7 of
-        `Bovy+19 <https://ui.adsabs.harvard.edu/abs/2019MNRAS.490.4740B/abstract>`_ but accounts
-        for sample's bias.
-
-        Parameters
-        ----------
-        size : `int`
-            How many times to draw
-        component : `str`
-            Which component of the Milky Way
-
-        Returns
-        -------
-        tau : :class:`~astropy.units.Quantity` [time]
-            Random lookback times
-        """
-        # if no size is given then use the class value
-        size = self._size if size is None else size
-        if component == "low_alpha_disc":
-            U = np.random.rand(size)
-            norm = 1 / quad(lambda x: np.exp(-(self.galaxy_age.value - x) / self.tsfr.value), 0, 8)[0]
-            tau = self.tsfr * np.log((U * np.exp(self.galaxy_age / self.tsfr)) / (norm * self.tsfr.value) + 1)
-        elif component == "high_alpha_disc":
-            U = np.random.rand(size)
-            norm = 1 / quad(lambda x: np.exp(-(self.galaxy_age.value - x) / self.tsfr.value), 8, 12)[0]
-            tau = self.tsfr * np.log((U * np.exp(self.galaxy_age / self.tsfr)) / (norm * self.tsfr.value)
-                                     + np.exp(8 * u.Gyr / self.tsfr))
-        elif component == "bulge":
-            tau = beta.rvs(a=2, b=3, loc=6, scale=6, size=size) * u.Gyr
-        return tau
-
-    def get_metallicity(self):
-        """Convert radius and time to metallicity using
-        `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_ Eq. 7 and
-        `Bertelli+1994 <https://ui.adsabs.harvard.edu/abs/1994A%26AS..106..275B/abstract>`_ Eq. 9 but
-        assuming all stars have the solar abundance pattern (so no factor of 0.977)
+        super().__init__(size=size, processes=processes, **kwargs)
 
-        Returns
-        -------
-        Z : :class:`~astropy.units.Quantity` [dimensionless]
-            Metallicities corresponding to radii and times
-        """
-        rho = (self.x**2 + self.y**2)**(0.5)
-        FeH = self.Fm + self.gradient * rho - (self.Fm + self.gradient * self.Rnow)\
-            * (1 - (self._tau / self.galaxy_age))**self.gamma
-        return np.power(10, FeH + np.log10(self.zsun))
+    def _get_cache_key(self):
+        # the potential and distribution function don't depend on any parameters
+        return (self.__class__.__name__,)
 
     def get_DF(self):
         """Get the distribution function for a quasi-isothermal disk based on the Gala MW potential"""
@@ -872,44 +1311,8 @@ class QuasiIsothermalDisk(StarFormationHistory):      # pragma: no cover
         )
         return self._df, self._agama_pot
 
-    def sample(self):
-        """Sample from the Galaxy distribution and save in class attributes"""
-        assert check_dependencies("agama")
-        import agama
-        agama.setUnits(**{k: galactic[k] for k in ['length', 'mass', 'time']})
-
-        # create an array of which component each point belongs to
-        self._which_comp = np.repeat("low_alpha_disc", self.size)
-        self._tau = self.draw_lookback_times(size=self.size, component="low_alpha_disc")
-
-        # get cartesian coordinates from agama
-        xv, _ = agama.GalaxyModel(self.agama_pot, self.df).sample(self.size)
-
-        # convert units for velocity
-        xv[:, 3:] *= (u.kpc / u.Myr).to(u.km / u.s)
-
-        # save the positions
-        self._x = xv[:, 0] * u.kpc
-        self._y = xv[:, 1] * u.kpc
-        self._z = xv[:, 2] * u.kpc
-
-        # work out the velocities by rotating using SkyCoord
-        full_coord = SkyCoord(x=self._x, y=self._y, z=self._z,
-                              v_x=xv[:, 3] * u.km / u.s, v_y=xv[:, 4] * u.km / u.s, v_z=xv[:, 5] * u.km / u.s,
-                              frame="galactocentric").represent_as("cylindrical")
-
-        with u.set_enabled_equivalencies(u.dimensionless_angles()):
-            self.v_R = full_coord.differentials['s'].d_rho
-            self.v_T = (full_coord.differentials['s'].d_phi * full_coord.rho).to(u.km / u.s)
-            self.v_z = full_coord.differentials['s'].d_z
-
-        # compute the metallicity given the other values
-        self._Z = self.get_metallicity()
 
-        return self._tau, self.positions, self.Z
-
-
-class SpheroidalDwarf(StarFormationHistory):      # pragma: no cover
+class SpheroidalDwarf(_ActionBasedModel):      # pragma: no cover
     """An action-based model for dwarf spheroidal galaxies and globular clusters
     `Pascale+2019 <https://ui.adsabs.harvard.edu/abs/2019MNRAS.488.2423P/abstract>`_.
 
@@ -940,9 +1343,12 @@ class SpheroidalDwarf(StarFormationHistory):      # pragma: no cover
         Time dependence of chemical enrichment, by default 0.3
     zsun : `float`, optional
         Solar metallicity, by default 0.0142
+    processes : `int`, optional
+        Number of processes to use when sampling positions and velocities, by default 1
     """
     def __init__(self, size, mass, J_0_star, alpha, eta, tsfr=6.8 * u.Gyr, Fm=-1, gradient=-0.075 / u.kpc,
-                 Rnow=8.7 * u.kpc, gamma=0.3, zsun=0.0142, galaxy_age=12 * u.Gyr, **kwargs):
+                 Rnow=8.7 * u.kpc, gamma=0.3, zsun=0.0142, galaxy_age=12 * u.Gyr, processes=1,
+                 **kwargs):
         self.mass = mass
         self.J_0_star = J_0_star
         self.alpha = alpha
@@ -955,77 +1361,10 @@ class SpheroidalDwarf(StarFormationHistory):      # pragma: no cover
         self.zsun = zsun
         self.galaxy_age = galaxy_age
 
-        self._agama_pot = None
-        self._df = None
-
-        # ensure we don't pass components twice
-        for var in ["components", "component_masses"]:
-            if var in kwargs:
-                kwargs.pop(var)
-
-        super().__init__(size=size, components=None, component_masses=None, **kwargs)
-
-    @property
-    def agama_pot(self):
-        if self._agama_pot is None:
-            self.get_DF()
-        return self._agama_pot
-
-    @property
-    def df(self):
-        if self._df is None:
-            self.get_DF()
-        return self._df
-
-    def draw_lookback_times(self, size=None, component="low_alpha_disc"):
-        """Inverse CDF sampling of lookback times. low_alpha and high_alpha discs uses
-        `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_ Eq. 4,
-        separated and normalised at 8 Gyr. The bulge matches the distribution in Fig. 7 of
-        `Bovy+19 <https://ui.adsabs.harvard.edu/abs/2019MNRAS.490.4740B/abstract>`_ but accounts
-        for sample's bias.
-
-        Parameters
-        ----------
-        size : `int`
-            How many times to draw
-        component : `str`
-            Which component of the Milky Way
-
-        Returns
-        -------
-        tau : :class:`~astropy.units.Quantity` [time]
-            Random lookback times
-        """
-        # if no size is given then use the class value
-        size = self._size if size is None else size
-        if component == "low_alpha_disc":
-            U = np.random.rand(size)
-            norm = 1 / quad(lambda x: np.exp(-(self.galaxy_age.value - x) / self.tsfr.value), 0, 8)[0]
-            tau = self.tsfr * np.log((U * np.exp(self.galaxy_age / self.tsfr)) / (norm * self.tsfr.value) + 1)
-        elif component == "high_alpha_disc":
-            U = np.random.rand(size)
-            norm = 1 / quad(lambda x: np.exp(-(self.galaxy_age.value - x) / self.tsfr.value), 8, 12)[0]
-            tau = self.tsfr * np.log((U * np.exp(self.galaxy_age / self.tsfr)) / (norm * self.tsfr.value)
-                                     + np.exp(8 * u.Gyr / self.tsfr))
-        elif component == "bulge":
-            tau = beta.rvs(a=2, b=3, loc=6, scale=6, size=size) * u.Gyr
-        return tau
-
-    def get_metallicity(self):
-        """Convert radius and time to metallicity using
-        `Frankel+2018 <https://ui.adsabs.harvard.edu/abs/2018ApJ...865...96F/abstract>`_ Eq. 7 and
-        `Bertelli+1994 <https://ui.adsabs.harvard.edu/abs/1994A%26AS..106..275B/abstract>`_ Eq. 9 but
-        assuming all stars have the solar abundance pattern (so no factor of 0.977)
+        super().__init__(size=size, processes=processes, **kwargs)
 
-        Returns
-        -------
-        Z : :class:`~astropy.units.Quantity` [dimensionless]
-            Metallicities corresponding to radii and times
-        """
-        rho = (self.x**2 + self.y**2)**(0.5)
-        FeH = self.Fm + self.gradient * rho - (self.Fm + self.gradient * self.Rnow)\
-            * (1 - (self._tau / self.galaxy_age))**self.gamma
-        return np.power(10, FeH + np.log10(self.zsun))
+    def _get_cache_key(self):
+        return (self.__class__.__name__, str(self.mass), str(self.J_0_star), self.alpha, self.eta)
 
     def get_DF(self):
         """Get the distribution function for a dwarf galaxy disk based on an NFW profile"""
@@ -1040,53 +1379,127 @@ class SpheroidalDwarf(StarFormationHistory):      # pragma: no cover
             scaleradius=gala_pot.parameters["r_s"].decompose(galactic).value,
         )
 
+        # bind parameters to locals so the cached function doesn't keep this instance (and its samples) alive
         J0_no_units = (self.J_0_star).decompose(galactic).value
+        eta, alpha = self.eta, self.alpha
 
         def dwarf_df(J):
             Jr, Jz, Jphi = J.T
-            kJ = Jr + self.eta * (np.abs(Jphi) + Jz)
-            return np.exp(-(kJ / J0_no_units)**self.alpha)
+            kJ = Jr + eta * (np.abs(Jphi) + Jz)
+            return np.exp(-(kJ / J0_no_units)**alpha)
         self._df = dwarf_df
         return self._df, self._agama_pot
 
-    def sample(self):
-        """Sample from the Galaxy distribution and save in class attributes"""
-        assert check_dependencies("agama")
-        import agama
-        agama.setUnits(**{k: galactic[k] for k in ['length', 'mass', 'time']})
 
-        # create an array of which component each point belongs to
-        self._which_comp = np.repeat("low_alpha_disc", self.size)
-        self._tau = self.draw_lookback_times(size=self.size, component="low_alpha_disc")
+class TabulatedSFH(StarFormationHistory):
+    """A star formation history model sampled from a tabulated distribution of stellar mass
 
-        # get cartesian coordinates from agama
-        xv, _ = agama.GalaxyModel(self.agama_pot, self.df).sample(self.size)
+    The mass formed is given in bins of lookback time, galactocentric radius, height and metallicity, for
+    example from an external model or binned from the star particles of a hydrodynamical zoom-in simulation
+    (see :meth:`from_particles`). This is much cheaper than sampling every particle when their exact identity
+    doesn't matter.
 
-        # convert units for velocity
-        xv[:, 3:] *= (u.kpc / u.Myr).to(u.km / u.s)
+    Points are sampled by choosing bins from the cumulative distribution of the mass (with a binary search
+    for each point) and then placing them uniformly within each bin. Azimuthal angles are drawn uniformly.
 
-        # save the positions
-        self._x = xv[:, 0] * u.kpc
-        self._y = xv[:, 1] * u.kpc
-        self._z = xv[:, 2] * u.kpc
+    Parameters are the same as :class:`StarFormationHistory` but additionally with the following:
 
-        # work out the velocities by rotating using SkyCoord
-        full_coord = SkyCoord(x=self._x, y=self._y, z=self._z,
-                              v_x=xv[:, 3] * u.km / u.s, v_y=xv[:, 4] * u.km / u.s, v_z=xv[:, 5] * u.km / u.s,
-                              frame="galactocentric").represent_as("cylindrical")
+    Parameters
+    ----------
+    mass : :class:`~numpy.ndarray`
+        Stellar mass formed in each bin (with any normalisation), with shape ``(n_tau, n_R, n_z, n_Z)``
+    tau_bins : :class:`~astropy.units.Quantity` [time]
+        Edges of the lookback time bins (length ``n_tau + 1``), assumed to be in Gyr if not a Quantity
+    R_bins : :class:`~astropy.units.Quantity` [length]
+        Edges of the galactocentric radius bins (length ``n_R + 1``), assumed to be in kpc if not a Quantity
+    z_bins : :class:`~astropy.units.Quantity` [length]
+        Edges of the bins in height above the Galactic plane (length ``n_z + 1``, negative heights are below
+        the plane), assumed to be in kpc if not a Quantity
+    Z_bins : :class:`~numpy.ndarray`
+        Edges of the metallicity bins (length ``n_Z + 1``)
+    """
+    _array_params = ["mass", "tau_bins", "R_bins", "z_bins", "Z_bins"]
 
-        with u.set_enabled_equivalencies(u.dimensionless_angles()):
-            self.v_R = full_coord.differentials['s'].d_rho
-            self.v_T = (full_coord.differentials['s'].d_phi * full_coord.rho).to(u.km / u.s)
-            self.v_z = full_coord.differentials['s'].d_z
+    def __init__(self, size, mass, tau_bins, R_bins, z_bins, Z_bins, **kwargs):
+        self.mass = np.asarray(mass, dtype=float)
+        self.tau_bins = u.Quantity(tau_bins, u.Gyr)
+        self.R_bins = u.Quantity(R_bins, u.kpc)
+        self.z_bins = u.Quantity(z_bins, u.kpc)
+        self.Z_bins = np.asarray(Z_bins, dtype=float)
 
-        # compute the metallicity given the other values
-        self._Z = self.get_metallicity()
+        # check the table matches the bins
+        shape = tuple(len(bins) - 1 for bins in [self.tau_bins, self.R_bins, self.z_bins, self.Z_bins])
+        if self.mass.shape != shape:
+            raise ValueError(f"`mass` has shape {self.mass.shape} but the bins imply a shape of {shape}")
+        if np.any(self.mass < 0) or self.mass.sum() <= 0:
+            raise ValueError("`mass` must be non-negative with at least one non-empty bin")
+
+        # precompute the cumulative distribution of the mass over the (flattened) bins
+        self._cdf = np.cumsum(self.mass.ravel())
+        self._cdf /= self._cdf[-1]
+
+        super().__init__(size=size, components=kwargs.pop("components", ["tabulated"]),
+                         component_masses=kwargs.pop("component_masses", [self.mass.sum()]), **kwargs)
+
+    @classmethod
+    def from_particles(cls, size, tau, R, z, Z, mass, bins=20, **kwargs):
+        """Create a tabulated model by binning star particles (e.g. from a hydrodynamical simulation)
+
+        Parameters
+        ----------
+        size : `int`
+            Number of points to sample from the model
+        tau : :class:`~astropy.units.Quantity` [time]
+            Lookback time at which each particle formed (assumed to be in Gyr if not a Quantity)
+        R : :class:`~astropy.units.Quantity` [length]
+            Galactocentric radius at which each particle formed (assumed to be in kpc if not a Quantity)
+        z : :class:`~astropy.units.Quantity` [length]
+            Height above the plane at which each particle formed (assumed to be in kpc if not a Quantity)
+        Z : :class:`~numpy.ndarray`
+            Metallicity of each particle
+        mass : :class:`~numpy.ndarray`
+            Initial mass of each particle
+        bins : `int` or `list`, optional
+            Bins for each of lookback time (Gyr), radius (kpc), height (kpc) and metallicity, any format
+            accepted by :func:`numpy.histogramdd`, by default 20 bins in each
+        **kwargs
+            Any other arguments for :class:`TabulatedSFH`
+
+        Returns
+        -------
+        sfh : :class:`TabulatedSFH`
+            The tabulated model
+        """
+        particles = np.transpose([u.Quantity(tau, u.Gyr).value, u.Quantity(R, u.kpc).value,
+                                  u.Quantity(z, u.kpc).value, np.asarray(Z, dtype=float)])
+        table, edges = np.histogramdd(particles, bins=bins, weights=u.Quantity(mass).value)
+        return cls(size=size, mass=table, tau_bins=edges[0], R_bins=edges[1], z_bins=edges[2],
+                   Z_bins=edges[3], **kwargs)
 
-        return self._tau, self.positions, self.Z
+    def sample(self):
+        """Sample bins from the mass table and then values uniformly within them"""
+        if self.size is None:
+            raise ValueError("`self.size` has not been set")
+
+        # one uniform variate to pick the bin, one for each coordinate within it and one for the azimuth
+        U = sobol_uniforms(self._size, dims=6) if self.qmc else np.random.uniform(size=(self._size, 6))
+        inds = np.unravel_index(np.searchsorted(self._cdf, U[:, 0], side="right"), self.mass.shape)
 
+        values = []
+        for i, (bins, ind) in enumerate(zip([self.tau_bins.to_value(u.Gyr), self.R_bins.to_value(u.kpc),
+                                             self.z_bins.to_value(u.kpc), self.Z_bins], inds)):
+            values.append(bins[ind] + U[:, i + 1] * (bins[ind + 1] - bins[ind]))
+        self._tau, rho, self._z, self._Z = values
+
+        phi = 2 * np.pi * U[:, 5]
+        self._x = rho * np.sin(phi)
+        self._y = rho * np.cos(phi)
+        self._which_comp = np.repeat(self._components[0], self._size)
 
-def load(file_name, key="sfh"):
+        return self.tau, self.positions, self.Z
+
+
+def load(file_name, key="sfh", columns=None):
     """Load an entire class from storage.
 
     Data should be stored in an hdf5 file using `file_name`.
@@ -1097,22 +1510,49 @@ def load(file_name, key="sfh"):
         A name of the .h5 file in which samples are stored and .txt file in which parameters are stored
     key : `str`, optional
         Key to use for the hdf5 file, by default "sfh"
+    columns : `list`, optional
+        Columns to read immediately (any of "tau", "Z", "x", "y", "z", "which_comp", "v_R", "v_T", "v_z"), by
+        default None (all of them). Any other columns are read from the file when they are first accessed,
+        so e.g. ``columns=["tau", "Z"]`` reads only the lookback times and metallicities and ``columns=[]``
+        reads nothing but the parameters. Files saved by older versions (with pandas) are always read in full.
+
+    Raises
+    ------
+    ValueError
+        If there is no saved model under `key` or an unknown column is requested
     """
     # append file extension if necessary
     if file_name[-3:] != ".h5":
         file_name += ".h5"
+    if columns is not None and not set(columns).issubset(_COLUMNS):
+        raise ValueError(f"Unknown columns {set(columns) - set(_COLUMNS)}, choose from {_COLUMNS}")
 
     # load the parameters back in using yaml
+    _register_compression_filters()
     with h5.File(file_name, "r") as file:
         if key not in file.keys():
             raise ValueError((f"Can't find a saved SFH in {file_name} under the key {key}."))
-        params = yaml.load(file[key].attrs["params"], Loader=yaml.Loader)
+        group = file[key]
+        params = yaml.load(group.attrs["params"], Loader=yaml.Loader)
+
+        # get the current module, get a class using the name, delete it from parameters that will be passed
+        module = sys.modules[__name__]
+
+        sfh_class = getattr(module, params["class_name"])
+        del params["class_name"]
 
-    # get the current module, get a class using the name, delete it from parameters that will be passed
-    module = sys.modules[__name__]
+        # read in any array parameters
+        for name in sfh_class._array_params:
+            dataset = group[f"param_{name}"]
+            params[name] = dataset[()] * u.Unit(dataset.attrs["unit"]) if dataset.attrs["unit"] != "" \
+                else dataset[()]
 
-    sfh_class = getattr(module, params["class_name"])
-    del params["class_name"]
+        # read in the requested columns (files from older versions were saved with pandas instead)
+        legacy = "tau" not in group
+        if not legacy:
+            file_columns = [name for name in _COLUMNS if name in group]
+            read_now = file_columns if columns is None else [name for name in file_columns if name in columns]
+            data = {name: _read_column(group, name) for name in read_now}
 
     # ensure no samples are taken
     params["immediately_sample"] = False
@@ -1120,27 +1560,60 @@ def load(file_name, key="sfh"):
     # create a new sfh using the parameters
     loaded_sfh = sfh_class(**complicate_params(params))
 
-    # read in the data and save it into the class
-    df = pd.read_hdf(file_name, key=key)
-    loaded_sfh._tau = df["tau"].values * u.Gyr
-    loaded_sfh._Z = df["Z"].values * u.dimensionless_unscaled
-    loaded_sfh._which_comp = df["which_comp"].values
-    loaded_sfh._x = df["x"].values * u.kpc
-    loaded_sfh._y = df["y"].values * u.kpc
-    loaded_sfh._z = df["z"].values * u.kpc
+    if legacy:
+        df = pd.read_hdf(file_name, key=key)
+        data = {name: df[name].values for name in _COLUMNS if name in df}
+        file_columns = read_now = list(data.keys())
 
-    # additionally read in velocity components if they exist
-    for attr in ["v_R", "v_T", "v_z"]:
-        if attr in df:
-            setattr(loaded_sfh, attr, df[attr].values * u.km / u.s)
+    # save the data into the class and note which columns still need to be read
+    for name, values in data.items():
+        setattr(loaded_sfh, "_" + name, values)
+    loaded_sfh._lazy_columns = {"_" + name: (file_name, key) for name in file_columns if name not in read_now}
 
     # return the newly created class
     return loaded_sfh
 
 
+def _read_column(group, name):
+    """Read a column of a saved star formation history (converting component codes back to labels)"""
+    if name == "which_comp":
+        return np.array(list(group[name].attrs["labels"]), dtype=str)[group[name][()]]
+    return group[name][()]
+
+
+def _is_appendable(group):
+    """Check whether the samples of a saved star formation history can be appended to"""
+    return "tau" in group and group["tau"].maxshape[0] is None
+
+
+def _as_basic_index(ind, size):
+    """Convert an index into a slice where possible such that indexing an array gives a view
+
+    Integers and arrays of consecutive non-negative integers are converted to slices (integers still give an
+    array of length one), anything else is returned as an array for fancy indexing.
+    """
+    if isinstance(ind, slice):
+        return ind
+    if isinstance(ind, (int, np.integer)):
+        if not -size <= ind < size:
+            raise IndexError(f"index {ind} is out of bounds for a star formation history with size {size}")
+        return slice(ind, ind + 1 if ind != -1 else None)
+    ind = np.asarray(ind)
+    if ind.size == 0:
+        # empty lists default to floats, which can't be used as an index
+        return ind.astype(int)
+    if (ind.ndim == 1 and len(ind) > 0 and ind.dtype.kind in "iu" and ind[0] >= 0
+            and np.all(np.diff(ind) == 1)):
+        return slice(int(ind[0]), int(ind[-1]) + 1)
+    return ind
+
+
 def concat(*sfhs):
     """Concatenate multiple StarFormationHistory objects together.
 
+    Each column is filled in a single allocation (no intermediate copies are made however many objects are
+    concatenated) and the parameters of the new object are shared with the first one.
+
     Parameters
     ----------
     *sfhs : `StarFormationHistory`
@@ -1159,21 +1632,29 @@ def concat(*sfhs):
     elif len(sfhs) == 0:
         raise ValueError("No objects to concatenate")
 
-    # create a new object with the same parameters as the first
-    new_sfh = sfhs[0][:]
-
-    # concatenate the velocity components if they exist
-    for attr in ["_tau", "_Z", "_which_comp", "_x", "_y", "_z", "v_R", "v_T", "v_z"]:
-        if hasattr(sfhs[0], attr):
-            setattr(new_sfh, attr, np.concatenate([getattr(sfh, attr) for sfh in sfhs]))
-
-    new_sfh._size = len(new_sfh._tau)
+    for sfh in sfhs:
+        if sfh._tau is None:
+            sfh.sample()
+
+    # concatenate each column that the first object has (e.g. velocities may not exist)
+    columns = {}
+    for attr in _COLUMN_ATTRS:
+        parts = [getattr(sfh, attr) for sfh in sfhs]
+        if parts[0] is None:
+            columns[attr] = None
+        elif any(part is None for part in parts):
+            raise ValueError(f"Not all of the star formation histories have `{attr[1:]}` values")
+        else:
+            columns[attr] = np.concatenate(parts)
 
-    return new_sfh
+    # create a new object with the same parameters as the first
+    return sfhs[0]._with_columns(columns)
 
 
 def simplify_params(params, dont_save=["_tau", "_Z", "_x", "_y", "_z", "_which_comp", "v_R", "v_T", "v_z",
-                                       "_df", "_agama_pot", "__citations__"]):
+                                       "_v_R", "_v_T", "_v_z", "_df", "_agama_pot", "_galaxy_model",
+                                       "__citations__", "_qmc_points", "_views", "_cdf",
+                                       "_lazy_columns"]):
     # delete any keys that we don't want to save
     delete_keys = [key for key in params.keys() if key in dont_save]
     for key in delete_keys:
@@ -0,0 +1,450 @@
+import time
+import warnings
+from copy import copy
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+import h5py as h5
+import yaml
+import astropy.units as u
+from tqdm import tqdm
+import gala.dynamics as gd
+from cosmic.checkstate import set_checkstates
+from cosmic.evolve import NATAL_KICK_COLUMNS
+
+from cogsworth import pop
+from cogsworth.kicks import integrate_orbit_with_events
+from cogsworth.events import _get_events_key
+from cogsworth.utils import _random_integers
+
+__all__ = ["PopulationSweep", "load"]
+
+
+class PopulationSweep():
+    """Evolve the same population under several different sets of ``BSE_settings``
+
+    The initial binaries and initial galaxy are sampled once (using the settings of `population`) and shared
+    by every configuration. Each binary is also given the same random seed and supernova orientations in every
+    configuration so that any differences between configurations are caused only by the changes in the
+    ``BSE_settings``. All configurations are evolved with COSMIC together (in a single call with a single
+    pool of processes) and each galactic orbit is only integrated once for binaries that experience identical
+    kicks (or no kicks at all) in several configurations.
+
+    Parameters
+    ----------
+    population : :class:`~cogsworth.pop.Population`
+        The base population, which sets everything apart from the varied ``BSE_settings`` (e.g. the number
+        of binaries, star formation history, galactic potential and number of processes)
+    configurations : `dict` or `list` of `dict`
+        The changes to the ``BSE_settings`` of `population` for each configuration. Either a dictionary
+        mapping a label for each configuration to its changes or a list of changes (in which case the labels
+        are "config_0", "config_1", etc.)
+
+    Attributes
+    ----------
+    populations : `list` of :class:`~cogsworth.pop.Population`
+        The population for each configuration (None until stellar evolution has been performed)
+
+    Examples
+    --------
+    Evolve 1000 binaries with three different common-envelope efficiencies
+
+    >>> p = cogsworth.pop.Population(1000)
+    >>> sweep = cogsworth.sweep.PopulationSweep(p, {f"alpha={alpha}": {"alpha1": alpha}
+    ...                                             for alpha in [0.5, 1.0, 2.0]})
+    >>> sweep.create_populations()
+    >>> sweep["alpha=0.5"].bpp
+    """
+    def __init__(self, population, configurations):
+        if isinstance(configurations, dict):
+            self.labels = [str(label) for label in configurations.keys()]
+            self.configurations = list(configurations.values())
+        else:
+            self.labels = [f"config_{i}" for i in range(len(configurations))]
+            self.configurations = list(configurations)
+
+        if len(self.configurations) == 0:
+            raise ValueError("You need to provide at least one configuration")
+
+        self.population = population
+        self.populations = None
+        self.n_orbits_integrated = None
+
+    def __repr__(self):
+        return (f"<{self.__class__.__name__} - {len(self)} configurations of "
+                f"{self.population.n_binaries_match} binaries>")
+
+    def __len__(self):
+        return len(self.configurations)
+
+    def __getitem__(self, key):
+        if self.populations is None:
+            raise ValueError("Populations not yet evolved, run `perform_stellar_evolution` to do so")
+        if isinstance(key, str):
+            if key not in self.labels:
+                raise KeyError(f"No configuration labelled '{key}', choose from {self.labels}")
+            key = self.labels.index(key)
+        return self.populations[key]
+
+    @property
+    def BSE_settings(self):
+        """The full ``BSE_settings`` used for each configuration"""
+        return [{**self.population.BSE_settings, **configuration} for configuration in self.configurations]
+
+    def create_populations(self, with_timing=True):
+        """Create an entirely evolved population for every configuration
+
+        This will sample the initial binaries and initial galaxy and then perform both the :py:mod:`cosmic`
+        and :py:mod:`gala` evolution for every configuration (sharing a single pool of processes).
+
+        Parameters
+        ----------
+        with_timing : `bool`, optional
+            Whether to print messages about the timing, by default True
+        """
+        p = self.population
+        if with_timing:
+            start = time.time()
+            print(f"Run for {p.n_binaries} binaries in {len(self)} configurations")
+
+        self.sample_initial_binaries()
+        if with_timing:
+            print(f"Ended up with {p.n_binaries_match} binaries with m1 > {p.m1_cutoff} solar masses")
+            print(f"[{time.time() - start:1.0e}s] Sample initial binaries")
+            lap = time.time()
+
+        p.pool = Pool(p.processes) if p.processes > 1 else None
+        self.perform_stellar_evolution()
+        if with_timing:
+            print(f"[{time.time() - lap:1.1f}s] Evolve binaries (run COSMIC)")
+            lap = time.time()
+
+        self.perform_galactic_evolution(progress_bar=with_timing)
+        if with_timing:
+            n_orbits = sum(len(p_config.orbits) for p_config in self.populations)
+            print((f"[{time.time() - lap:1.1f}s] Get orbits (run gala, integrated {self.n_orbits_integrated} "
+                   f"of {n_orbits} orbits)"))
+
+        if p.pool is not None:
+            p.pool.close()
+            p.pool.join()
+            p.pool = None
+
+        if with_timing:
+            print(f"Overall: {time.time() - start:1.1f}s")
+
+    def sample_initial_binaries(self):
+        """Sample the initial binaries and initial galaxy shared by every configuration
+
+        This also draws the random seed and supernova orientations of each binary so that they are the same
+        in every configuration (from a random stream of the population, so a population with a ``seed``
+        gives a reproducible sweep).
+        """
+        p = self.population
+        p.sample_initial_binaries()
+
+        n_bin = len(p._initial_binaries)
+        rng = p._get_rng("sweep")
+        p._initial_binaries["randomseed"] = _random_integers(rng, np.iinfo(np.int32).min,
+                                                             np.iinfo(np.int32).max, size=n_bin)
+        for col in ["phase_sn_1", "phase_sn_2", "inc_sn_1", "inc_sn_2"]:
+            p._initial_binaries[col] = rng.uniform(0, 2 * np.pi, n_bin)
+
+        self.populations = None
+        self.n_orbits_integrated = None
+
+    def perform_stellar_evolution(self):
+        """Perform the (binary) stellar evolution of every configuration
+
+        The initial binaries of every configuration (with their ``BSE_settings`` as columns) are combined
+        into a single table and evolved together, which keeps every process busy until all configurations
+        are finished.
+        """
+        p = self.population
+        if p._initial_binaries is None:
+            self.sample_initial_binaries()
+
+        if p.bcm_timestep_conditions != []:
+            set_checkstates(p.bcm_timestep_conditions)
+
+        # give the binaries in each configuration separate bin_nums
+        ibt = p._initial_binaries
+        bin_nums = ibt["bin_num"].values if "bin_num" in ibt else np.arange(len(ibt))
+        offset = int(bin_nums.max()) + 1
+        combined = pd.concat([ibt.assign(bin_num=bin_nums + i * offset, **_get_settings_columns(settings))
+                              for i, settings in enumerate(self.BSE_settings)], ignore_index=True)
+
+        no_pool_existed = p.pool is None and p.processes > 1
+        if no_pool_existed:
+            p.pool = Pool(p.processes)
+
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message=".*to a different value than assumed in the mlwind.*")
+
+            # settings are passed as columns so every configuration can be evolved at once
+            evolve = p._get_evolve_function()
+            bpp, bcm, initC, kick_info = evolve(initialbinarytable=combined, BSEDict={}, pool=p.pool,
+                                                timestep_conditions=p.bcm_timestep_conditions)
+
+        if no_pool_existed:
+            p.pool.close()
+            p.pool.join()
+            p.pool = None
+
+        # split the tables back into each configuration
+        tables = {"bpp": bpp, "bcm": bcm if p.bcm_timestep_conditions != [] else None,
+                  "initC": initC, "kick_info": kick_info}
+        split = [{} for _ in range(len(self))]
+        for name, table in tables.items():
+            if table is None:
+                continue
+            config = table["bin_num"].values // offset
+            for i in range(len(self)):
+                split[i][name] = _relabel(table[config == i], i * offset)
+
+        # add the shared supernova orientations to each initC
+        for i in range(len(self)):
+            initC = split[i]["initC"]
+            for col in ["phase_sn_1", "phase_sn_2", "inc_sn_1", "inc_sn_2"]:
+                initC[col] = pd.Series(ibt[col].values, index=bin_nums).loc[initC["bin_num"].values].values
+
+        self.populations = [self._create_population(i, **split[i]) for i in range(len(self))]
+        self.n_orbits_integrated = None
+
+        for p_config in self.populations:
+            p_config._remove_nan_binaries()
+            if p_config.compact_evolution_tables:
+                p_config.compact_tables()
+
+    def perform_galactic_evolution(self, quiet=False, progress_bar=True):
+        """Use :py:mod:`gala` to perform the orbital integration for each evolved binary in every
+        configuration
+
+        Binaries that experience the same kicks (at the same times) in several configurations, or no kicks at
+        all, follow the same galactic orbit and so each unique orbit is only integrated once.
+
+        Parameters
+        ----------
+        quiet : `bool`, optional
+            Whether to silence any warnings about failing orbits, by default False
+        progress_bar : `bool`, optional
+            Whether to show a progress bar, by default True
+        """
+        if self.populations is None:
+            self.perform_stellar_evolution()
+
+        # find the unique orbits based on the binary and its events
+        unique_args, orbit_inds, keys = [], [], {}
+        for p_config in self.populations:
+            args = p_config._get_orbit_args(quiet=quiet)
+            bin_nums = np.concatenate((p_config.bin_nums, p_config.bin_nums[p_config.disrupted]))
+            inds = []
+            for bin_num, arg in zip(bin_nums, args):
+                key = (bin_num, _get_events_key(arg[5]))
+                if key not in keys:
+                    keys[key] = len(unique_args)
+                    unique_args.append(arg)
+                inds.append(keys[key])
+            orbit_inds.append(inds)
+
+        # integrate every unique orbit with a single pool
+        p = self.population
+        if p.pool is not None or p.processes > 1:
+            pool_existed = p.pool is not None
+            if not pool_existed:
+                p.pool = Pool(p.processes)
+
+            orbits = p.pool.starmap(integrate_orbit_with_events,
+                                    tqdm(unique_args) if progress_bar else unique_args)
+
+            if not pool_existed:
+                p.pool.close()
+                p.pool.join()
+                p.pool = None
+        else:
+            orbits = [integrate_orbit_with_events(*arg) for arg in unique_args]
+
+        if any(orbit is None for orbit in orbits):         # pragma: no cover
+            warnings.warn(f"{sum(orbit is None for orbit in orbits)} bad orbit(s) detected, these are "
+                          "stored as None")
+
+        for p_config, inds in zip(self.populations, orbit_inds):
+            p_config._final_pos = None
+            p_config._final_vel = None
+            p_config._observables = None
+            p_config._orbits = np.array([orbits[i] for i in inds], dtype="object")
+        self.n_orbits_integrated = len(unique_args)
+
+    def save(self, file_name, overwrite=False):
+        """Save every configuration to a single HDF5 file
+
+        The shared initial binaries and initial galaxy are saved (as by
+        :meth:`~cogsworth.pop.Population.save`) alongside the tables of every configuration (with a
+        ``config`` column giving the index of each configuration) and each unique orbit (with an index of
+        the orbits of each configuration). Load the file with :func:`load`.
+
+        Parameters
+        ----------
+        file_name : `str`
+            A file name to use. Either no file extension or ".h5".
+        overwrite : `bool`, optional
+            Whether to overwrite any existing files, by default False
+
+        Raises
+        ------
+        ValueError
+            If stellar evolution has not been performed yet
+        """
+        if self.populations is None:
+            raise ValueError("Populations not yet evolved, run `perform_stellar_evolution` to do so")
+        if file_name[-3:] != ".h5":
+            file_name += ".h5"
+
+        self.population.save(file_name, overwrite=overwrite)
+
+        # save the tables of every configuration, stacked along a configuration axis
+        for key in ["bpp", "bcm", "initC", "kick_info"]:
+            tables = [getattr(p, f"_{key}").assign(config=i) for i, p in enumerate(self.populations)
+                      if getattr(p, f"_{key}") is not None]
+            if len(tables) > 0:
+                table = pd.concat(tables)
+                has_categories = any(isinstance(dtype, pd.CategoricalDtype) for dtype in table.dtypes)
+                table.to_hdf(file_name, key=f"sweep/{key}", **({"format": "table"} if has_categories else {}))
+
+        with h5.File(file_name, "a") as f:
+            sweep = f.require_group("sweep")
+            sweep.attrs["labels"] = self.labels
+            sweep.attrs["configurations"] = yaml.dump(self.configurations, default_flow_style=None)
+            sweep.attrs["n_orbits_integrated"] = (self.n_orbits_integrated
+                                                  if self.n_orbits_integrated is not None else -1)
+
+            # save each unique orbit once, with an index of the orbits in each configuration (-1 for None)
+            if all(p._orbits is not None for p in self.populations):
+                unique_orbits, orbit_index = {}, np.full((len(self), max(len(p._orbits)
+                                                                         for p in self.populations)), -1)
+                for i, p in enumerate(self.populations):
+                    for j, orbit in enumerate(p._orbits):
+                        if orbit is not None:
+                            orbit_index[i, j] = unique_orbits.setdefault(id(orbit), (len(unique_orbits),
+                                                                                     orbit))[0]
+                orbits_data = pop._flatten_orbits([orbit for _, orbit in unique_orbits.values()])
+                orbits = sweep.create_group("orbits")
+                for key in orbits_data:
+                    orbits.create_dataset(key, data=orbits_data[key])
+                orbits.create_dataset("index", data=orbit_index)
+                orbits.create_dataset("n_orbits", data=[len(p._orbits) for p in self.populations])
+
+    def _create_population(self, i, bpp=None, bcm=None, initC=None, kick_info=None):
+        """Create the population for a configuration from the base population and its evolution tables
+
+        Parameters
+        ----------
+        i : `int`
+            Index of the configuration
+        bpp, bcm, initC, kick_info : :class:`~pandas.DataFrame`, optional
+            COSMIC tables for the configuration
+
+        Returns
+        -------
+        p : :class:`~cogsworth.pop.Population`
+            The population for the configuration
+        """
+        p = copy(self.population)
+        p.BSE_settings = self.BSE_settings[i]
+        p.pool = None
+        p._file = None
+        p._bpp, p._bcm, p._initC, p._kick_info = bpp, bcm, initC, kick_info
+        p._random_calls = self.population._random_calls.copy()
+        for attr in ["_orbits", "_orbit_history", "_classes", "_final_pos", "_final_vel", "_final_bpp",
+                     "_disrupted", "_escaped", "_observables", "_bin_nums"]:
+            setattr(p, attr, None)
+        p.__citations__ = copy(self.population.__citations__)
+        return p
+
+
+def _get_settings_columns(BSE_settings):
+    """Convert ``BSE_settings`` into initial binary table columns (in the same format as COSMIC's initC)
+
+    Parameters
+    ----------
+    BSE_settings : `dict`
+        BSE settings to convert
+
+    Returns
+    -------
+    columns : `dict`
+        Value of each column
+    """
+    columns = {}
+    for key, value in BSE_settings.items():
+        if key == "natal_kick_array":
+            for sn in range(2):
+                for i, col in enumerate(NATAL_KICK_COLUMNS):
+                    columns[f"{col}_{sn + 1}"] = value[sn][i]
+        elif key in ["qcrit_array", "fprimc_array"]:
+            for kstar in range(16):
+                columns[f"{key.split('_')[0]}_{kstar}"] = value[kstar]
+        else:
+            columns[key] = value
+    return columns
+
+
+def _relabel(table, offset):
+    """Shift the bin_nums (and index) of a table back by `offset`"""
+    table = table.copy()
+    table["bin_num"] = table["bin_num"].values - offset
+    table.index = table["bin_num"].values
+    return table
+
+
+def load(file_name):
+    """Load a PopulationSweep from a file created with :meth:`PopulationSweep.save`
+
+    Parameters
+    ----------
+    file_name : `str`
+        Name of the file to load. Should either have no file extension or ".h5"
+
+    Returns
+    -------
+    sweep : :class:`PopulationSweep`
+        The loaded sweep
+    """
+    if file_name[-3:] != ".h5":
+        file_name += ".h5"
+
+    base = pop.load(file_name, parts=["initial_binaries", "initial_galaxy"])
+    base._file = None
+
+    with h5.File(file_name, "r") as f:
+        if "sweep" not in f:
+            raise ValueError(f"{file_name} is not a PopulationSweep file, perhaps you meant `pop.load`?")
+        labels = [str(label) for label in f["sweep"].attrs["labels"]]
+        configurations = yaml.load(f["sweep"].attrs["configurations"], Loader=yaml.Loader)
+        n_orbits_integrated = int(f["sweep"].attrs["n_orbits_integrated"])
+        table_keys = [key for key in ["bpp", "bcm", "initC", "kick_info"] if key in f["sweep"]]
+
+        orbits_data = None
+        if "orbits" in f["sweep"]:
+            orbits_data = {key: f["sweep"]["orbits"][key][...] for key in f["sweep"]["orbits"]}
+
+    sweep = PopulationSweep(base, dict(zip(labels, configurations)))
+    sweep.n_orbits_integrated = n_orbits_integrated if n_orbits_integrated >= 0 else None
+
+    tables = {key: pd.read_hdf(file_name, key=f"sweep/{key}") for key in table_keys}
+    sweep.populations = []
+    for i in range(len(sweep)):
+        config_tables = {key: table[table["config"] == i].drop(columns="config")
+                         for key, table in tables.items()}
+        sweep.populations.append(sweep._create_population(i, **config_tables))
+
+    if orbits_data is not None:
+        offsets = orbits_data["offsets"]
+        pos, vel = orbits_data["pos"] * u.kpc, orbits_data["vel"] * u.km / u.s
+        t = orbits_data["t"] * u.Myr
+        orbits = [gd.Orbit(pos[:, offsets[i]:offsets[i + 1]], vel[:, offsets[i]:offsets[i + 1]],
+                           t[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+        for p, index, n_orbits in zip(sweep.populations, orbits_data["index"], orbits_data["n_orbits"]):
+            p._orbits = np.array([orbits[j] if j >= 0 else None for j in index[:n_orbits]], dtype="object")
+
+    return sweep
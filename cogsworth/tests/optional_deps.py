@@ -14,11 +14,11 @@ import logging
 # some of the package names are different from the pip-install name (e.g.,
 # beautifulsoup4 -> bs4).
 _optional_deps = ['nose', 'tables', 'isochrones', 'dustmaps', 'healpy', 'gaiaunlimited', 'agama',
-                  'legwork', 'pynbody']
+                  'legwork', 'pynbody', 'hdf5plugin']
 _purposes = ['observables predictions', 'observables predictions', 'observables predictions',
              'observables predictions', 'healpix maps', 'GAIA observation predictions',
              'action-based potentials', 'LISA gravitational wave predictions',
-             'loading hydrodynamical snapshots']
+             'loading hydrodynamical snapshots', 'blosc compression of saved populations']
 _deps = {k: (k, p) for k, p in zip(_optional_deps, _purposes)}
 
 # Any subpackages that have different import behaviour:
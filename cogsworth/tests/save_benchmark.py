@@ -0,0 +1,56 @@
+"""This file is used to benchmark the write time and file size of saving populations with different
+settings"""
+
+import time
+import cogsworth
+import argparse
+import os
+
+SETTINGS = {
+    "uncompressed": {},
+    "float32": {"orbit_dtype": "float32"},
+    "gzip": {"compression": "gzip"},
+    "gzip-float32": {"compression": "gzip", "orbit_dtype": "float32"},
+    "lzf": {"compression": "lzf"},
+    "lzf-float32": {"compression": "lzf", "orbit_dtype": "float32"},
+    "blosc": {"compression": "blosc"},
+    "blosc-float32": {"compression": "blosc", "orbit_dtype": "float32"},
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark saving cogsworth populations")
+    parser.add_argument("-i", "--input", type=str, default=None, help="Input file to load in")
+    parser.add_argument("-n", "--nbin", type=int, default=1000,
+                        help="Number of binaries to simulate")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Number of processes to use")
+    args = parser.parse_args()
+
+    if args.input is None:
+        print("Creating a population")
+        p = cogsworth.pop.Population(args.nbin, processes=args.processes)
+        p.create_population(with_timing=False)
+    else:
+        print("Loading in a population")
+        p = cogsworth.pop.load(args.input, parts=["initial_binaries", "initial_galaxy",
+                                                  "stellar_evolution", "galactic_orbits"])
+
+    print(f"{'setting':>15s} | {'write time [s]':>14s} | {'orbit write [s]':>15s} | {'size [MB]':>9s}")
+    for name, kwargs in SETTINGS.items():
+        file_name = f"save_benchmark_{name}.h5"
+        try:
+            start = time.time()
+            p.save(file_name, overwrite=True, **kwargs)
+            total_time = time.time() - start
+        except ImportError:
+            print(f"{name:>15s} | skipped (missing dependency)")
+            continue
+
+        # time the orbit conversion separately since this is usually the bottleneck
+        start = time.time()
+        p._get_orbits_data(dtype=kwargs.get("orbit_dtype", "float64"))
+        orbit_time = time.time() - start
+
+        size = os.path.getsize(file_name) / 1024**2
+        print(f"{name:>15s} | {total_time:14.2f} | {orbit_time:15.2f} | {size:9.2f}")
+        os.remove(file_name)
@@ -0,0 +1,57 @@
+import unittest
+import shutil
+import os
+import numpy as np
+import cogsworth
+from cogsworth.cache import EvolutionCache
+
+
+class Test(unittest.TestCase):
+    def test_cached_evolution(self):
+        """Ensure that cached evolution gives the same results without evolving again"""
+        p = cogsworth.pop.Population(10, processes=1, evolution_cache="testing-cache",
+                                     bcm_timestep_conditions=[['dtp=100000.0']])
+        p.perform_stellar_evolution()
+        self.assertTrue(len(p.evolution_cache.block_files) == 1)
+        bpp, kick_info = p.bpp.copy(), p.kick_info.copy()
+
+        # evolving again should only read from the cache
+        p.perform_stellar_evolution()
+        self.assertTrue(len(p.evolution_cache.block_files) == 1)
+        self.assertTrue(np.all(p.bpp.values == bpp.values))
+        self.assertTrue(np.all(p.bpp.index == bpp.index))
+        self.assertTrue(np.all(p.kick_info.values == kick_info.values))
+
+        # a new cache object should find the same blocks on disk, and relabel cached binaries
+        cache = EvolutionCache("testing-cache")
+        initC = p.initC.iloc[::2].copy()
+        initC["bin_num"] += 100
+        new_bpp, _, _, _ = cache.evolve(initC, BSEDict=p.BSE_settings,
+                                        timestep_conditions=p.bcm_timestep_conditions)
+        self.assertTrue(len(cache.block_files) == 1)
+        self.assertTrue(np.all(new_bpp["bin_num"].unique() == initC["bin_num"].values))
+        self.assertTrue(np.all(new_bpp.loc[100]["mass_1"].values == bpp.loc[0]["mass_1"].values))
+
+        # different settings should be a cache miss
+        self.assertFalse(np.any(np.isin(cache.get_keys(initC, BSEDict={**p.BSE_settings, "alpha1": 5.0}),
+                                        cache.get_keys(initC, BSEDict=p.BSE_settings))))
+
+        shutil.rmtree("testing-cache")
+
+    def test_eviction(self):
+        """Ensure that the least recently used blocks are evicted"""
+        cache = EvolutionCache("testing-cache-eviction", max_size=0)
+        p = cogsworth.pop.Population(5, processes=1, evolution_cache=cache)
+        p.perform_stellar_evolution()
+
+        # the newest block is always kept
+        self.assertTrue(len(cache.block_files) == 1)
+        first_block = cache.block_files[0]
+
+        q = cogsworth.pop.Population(5, processes=1, evolution_cache=cache)
+        q.perform_stellar_evolution()
+        self.assertTrue(len(cache.block_files) == 1)
+        self.assertFalse(os.path.exists(first_block))
+        self.assertTrue(all(block_file != first_block for block_file in cache.index.values()))
+
+        shutil.rmtree("testing-cache-eviction")
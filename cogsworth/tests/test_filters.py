@@ -0,0 +1,48 @@
+import unittest
+import os
+import numpy as np
+import cogsworth
+
+
+class Test(unittest.TestCase):
+    def test_remnant_types(self):
+        """Check the single star remnant predictions are sensible"""
+        kstars = cogsworth.filters.get_single_star_remnant_type([1.0, 7.0, 10.0, 50.0], 0.02)
+        self.assertTrue(np.all(kstars == [11, 12, 13, 14]))
+
+        # lower metallicity stars form neutron stars at lower masses
+        self.assertTrue(cogsworth.filters.get_single_star_remnant_type(7.5, 0.0001)
+                        > cogsworth.filters.get_single_star_remnant_type(7.5, 0.02))
+
+    def test_pre_filter(self):
+        """Ensure that pre-filtering removes binaries and tracks their mass"""
+        p = cogsworth.pop.Population(100, processes=1, final_kstar1=[14], pre_filter="remnant")
+        p.sample_initial_binaries()
+
+        # every remaining binary could form a black hole and the mass of the rest is tracked
+        self.assertTrue(p.n_filtered > 0)
+        self.assertTrue(len(p) == len(p.initial_binaries) == len(p.initial_galaxy))
+        self.assertTrue(np.all(p.bin_nums == np.arange(len(p))))
+        self.assertTrue(np.all(cogsworth.filters.remnant_type_filter(p.initial_binaries, [14])))
+        self.assertTrue(p.mass_filtered > 0)
+        self.assertTrue(p.mass_binaries > p.initial_binaries["mass_1"].sum() + p.mass_filtered)
+
+        # custom filters work too and the filtered mass accumulates
+        n_filtered = p.n_filtered
+        p.apply_pre_filter(lambda ib: ib["mass_1"].values > 20)
+        self.assertTrue(np.all(p.initial_binaries["mass_1"] > 20))
+        self.assertTrue(p.n_filtered > n_filtered)
+
+        # the tracking is saved with the population
+        p.save("testing-filters", overwrite=True)
+        loaded = cogsworth.pop.load("testing-filters", parts=[])
+        self.assertTrue(loaded.n_filtered == p.n_filtered)
+        self.assertTrue(np.isclose(loaded.mass_filtered, p.mass_filtered))
+        os.remove("testing-filters.h5")
+
+        it_broke = False
+        try:
+            p.apply_pre_filter("nonsense")
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
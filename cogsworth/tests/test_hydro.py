@@ -26,6 +26,56 @@ class Test(unittest.TestCase):
         self.assertTrue(os.path.exists("test_pot.yml"))
         os.remove("test_pot.yml")
 
+    def test_time_interpolated_potential(self):
+        """Test that potentials at several times can be combined into a time-dependent potential"""
+        import gala.potential as gp
+        import pickle
+        early, late = gp.MilkyWayPotential(disk={"m": 3e10}), gp.MilkyWayPotential()
+        pot = cogsworth.hydro.potential.get_time_interpolated_potential([early, late], [4, 8] * u.Gyr)
+        q = [8, 0, 0] * u.kpc
+
+        # matches the snapshots at their times, interpolates between them and is constant outside of them
+        for t, snap_pot in [(0, early), (4, early), (8, late), (12, late)]:
+            self.assertTrue(np.isclose(pot.energy(q, t=t * u.Gyr), snap_pot.energy(q)))
+        self.assertTrue(early.energy(q) > pot.energy(q, t=6 * u.Gyr) > late.energy(q))
+
+        # a monotonic spline is also constant outside of the snapshots
+        mid = gp.MilkyWayPotential(disk={"m": 5e10})
+        spline = cogsworth.hydro.potential.get_time_interpolated_potential(
+            [early, mid, late], [4, 6, 8] * u.Gyr, interpolation_method="steffen")
+        for t, snap_pot in [(0, early), (2, early), (6, mid), (10, late), (12, late)]:
+            self.assertTrue(np.isclose(spline.energy(q, t=t * u.Gyr), snap_pot.energy(q)))
+
+        # can be sent to other processes
+        self.assertTrue(np.isclose(pickle.loads(pickle.dumps(pot)).energy(q, t=6 * u.Gyr),
+                                   pot.energy(q, t=6 * u.Gyr)))
+
+        # initial velocities of a population follow the circular velocity at birth
+        p = cogsworth.pop.Population(100, galactic_potential=pot, v_dispersion=0 * u.km / u.s)
+        p.sample_initial_galaxy()
+        g = p.initial_galaxy
+        old, young = g.tau > 8 * u.Gyr, g.tau < 4 * u.Gyr
+        self.assertTrue(np.allclose(g.v_T[old], early.circular_velocity(g.positions[:, old])))
+        self.assertTrue(np.allclose(g.v_T[young], late.circular_velocity(g.positions[:, young])))
+
+        halo = gp.NFWPotential(m=1e12, r_s=10, units=early.units)
+        for potentials, times in [([early], [4] * u.Gyr), ([early, late], [8, 4] * u.Gyr),
+                                  ([early, halo], [4, 8] * u.Gyr)]:
+            it_broke = False
+            try:
+                cogsworth.hydro.potential.get_time_interpolated_potential(potentials, times)
+            except ValueError:
+                it_broke = True
+            self.assertTrue(it_broke)
+
+        it_broke = False
+        try:
+            cogsworth.hydro.potential.get_time_interpolated_potential([early, late], [4, 8] * u.Gyr,
+                                                                      interpolation_method="cspline")
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
     def test_rewind(self):
         """Test that we can rewind a snapshot of a hydrodynamical simulation"""
         snap = cogsworth.hydro.utils.prepare_snapshot(os.path.join(THIS_DIR, "test_data/hydro_test"))
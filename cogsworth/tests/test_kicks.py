@@ -1,6 +1,8 @@
 import unittest
 import cogsworth
 import numpy as np
+import gala.potential as gp
+import astropy.units as u
 
 
 class Test(unittest.TestCase):
@@ -48,3 +50,68 @@ class Test(unittest.TestCase):
         second_pos = p.final_pos.copy()
 
         self.assertTrue(np.allclose(first_pos, second_pos))
+
+    def test_incremental_integration(self):
+        """Ensure that incrementally re-integrating orbits after changing kicks matches a full integration"""
+        p = cogsworth.pop.Population(10, final_kstar1=[13, 14], processes=1, BSE_settings={"binfrac": 1.0})
+        p.create_population(with_timing=False)
+        first_pos = p.final_pos.copy()
+        first_orbits = p.orbits
+
+        # nothing has changed so every orbit should be reused
+        p.perform_galactic_evolution(progress_bar=False, incremental=True)
+        self.assertTrue(all(new is old for new, old in zip(p.orbits, first_orbits)))
+        self.assertTrue(np.allclose(first_pos, p.final_pos))
+
+        # change the orientation of the second supernova, then compare to integrating everything again
+        p.initC["phase_sn_2"] = np.random.uniform(0, 2 * np.pi, len(p.initC))
+        p.perform_galactic_evolution(progress_bar=False, incremental=True)
+        incremental_pos = p.final_pos.copy()
+        p.perform_galactic_evolution(progress_bar=False)
+        self.assertTrue(np.allclose(incremental_pos, p.final_pos))
+
+        # changing the potential means everything is integrated again
+        orbits = p.orbits
+        p.galactic_potential = gp.MilkyWayPotential2022()
+        p.perform_galactic_evolution(progress_bar=False, incremental=True)
+        self.assertFalse(any(new is old for new, old in zip(p.orbits, orbits)))
+
+    def test_orientation_realisations(self):
+        """Check that realisations of supernova orientations match integrating each orbit separately"""
+        p = cogsworth.pop.Population(10, final_kstar1=[13, 14], processes=1, BSE_settings={"binfrac": 1.0})
+
+        it_broke = False
+        try:
+            p.get_sn_orientation_realisations()
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        p.create_population(with_timing=False)
+        pos, vel = p.get_sn_orientation_realisations(n_realisations=3, progress_bar=False)
+        self.assertTrue(pos.shape == (len(p.orbits), 3, 3))
+        self.assertTrue(vel.shape == (len(p.orbits), 3, 3))
+
+        # systems without kicks shouldn't change
+        args = p._get_orbit_args()
+        no_kicks = np.array([arg[5] is None for arg in args])
+        self.assertTrue(np.allclose(pos[no_kicks], p.final_pos[no_kicks][:, np.newaxis]))
+
+        # a single realisation should exactly match a normal integration with the same angles
+        for i, arg in enumerate(args):
+            if arg[5] is None:
+                continue
+            w0, t1, t2, dt, potential, events = arg[:6]
+            phases = np.random.uniform(0, 2 * np.pi, (len(events), 1))
+            incs = np.random.uniform(0, 2 * np.pi, (len(events), 1))
+            w = cogsworth.kicks.integrate_orbit_realisations(w0, t1, t2, dt, potential, events,
+                                                             phases, incs, previous_orbit=p.orbits[i])
+            new_events = [{**event, "phase": phases[j, 0], "inc": incs[j, 0]}
+                          for j, event in enumerate(events)]
+            orbit = cogsworth.kicks.integrate_orbit_with_events(w0, t1, t2, dt, potential, new_events)
+            self.assertTrue(np.allclose(w.xyz.to(u.kpc).value[:, 0], orbit[-1].xyz.to(u.kpc).value))
+            break
+
+        summary = p.get_sn_orientation_realisations(n_realisations=3, summary=True, progress_bar=False)
+        self.assertTrue(len(summary) == len(p.orbits))
+        self.assertTrue(np.allclose(summary["x_std"][no_kicks], 0.0))
@@ -4,8 +4,11 @@ import cogsworth.pop as pop
 import cogsworth.sfh as sfh
 import cogsworth.observables as obs
 import h5py as h5
+import pandas as pd
 import os
+import shutil
 import pytest
+from multiprocessing import Pool
 
 
 class Test(unittest.TestCase):
@@ -73,6 +76,148 @@ class Test(unittest.TestCase):
 
         os.remove("testing-pop-io.h5")
 
+    def test_append_io(self):
+        """Check that populations can be appended to a file chunk by chunk"""
+        p = pop.Population(10, processes=1, final_kstar1=[13, 14], bcm_timestep_conditions=[['dtp=100000.0']])
+        p.create_population(with_timing=False)
+        q = pop.Population(10, processes=1, final_kstar1=[13, 14], bcm_timestep_conditions=[['dtp=100000.0']])
+        q.create_population(with_timing=False)
+
+        if os.path.exists("testing-pop-append.h5"):
+            os.remove("testing-pop-append.h5")
+        p.save("testing-pop-append", append=True)
+        q.save("testing-pop-append", append=True)
+
+        r = pop.load("testing-pop-append", parts=["initial_binaries", "initial_galaxy",
+                                                  "stellar_evolution", "galactic_orbits"])
+
+        # check lengths, unique bin_nums and normalisation are all sensible
+        self.assertTrue(len(r) == len(p) + len(q))
+        self.assertTrue(len(r.initial_galaxy) == len(r))
+        self.assertTrue(len(np.unique(r.bin_nums)) == len(r))
+        self.assertTrue(np.isclose(r.mass_singles, p.mass_singles + q.mass_singles))
+        self.assertTrue(r.n_bin_req == p.n_bin_req + q.n_bin_req)
+
+        # check data from the second chunk landed in the right place
+        self.assertTrue(np.all(r.bpp.loc[len(p)]["mass_1"].values == q.bpp.loc[0]["mass_1"].values))
+        self.assertTrue(np.all(r.primary_orbits[len(p)].pos == q.primary_orbits[0].pos))
+        self.assertTrue(len(r.orbits) == len(p.orbits) + len(q.orbits))
+        self.assertTrue(np.all(r.final_pos[len(r):]
+                               == np.concatenate((p.final_pos[len(p):], q.final_pos[len(q):]))))
+
+        # can't overwrite and append at the same time
+        it_broke = False
+        try:
+            p.save("testing-pop-append", overwrite=True, append=True)
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        # can't append to a file that wasn't saved in an appendable format
+        p.save("testing-pop-append", overwrite=True)
+        it_broke = False
+        try:
+            q.save("testing-pop-append", append=True)
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        os.remove("testing-pop-append.h5")
+
+    def test_merge_files(self):
+        """Check that population files can be merged with virtual datasets"""
+        p = pop.Population(10, processes=1, final_kstar1=[13, 14], bcm_timestep_conditions=[['dtp=100000.0']])
+        p.create_population(with_timing=False)
+        q = pop.Population(10, processes=1, final_kstar1=[13, 14], bcm_timestep_conditions=[['dtp=100000.0']])
+        q.create_population(with_timing=False)
+
+        os.makedirs("testing-shards", exist_ok=True)
+        p.save("testing-shards/p", overwrite=True)
+        q.save("testing-shards/q", overwrite=True)
+        pop.merge_files(["testing-shards/p", "testing-shards/q"], "testing-pop-merged", overwrite=True)
+
+        # orbits and evolution tables shouldn't be copied
+        with h5.File("testing-pop-merged.h5", "r") as f:
+            self.assertTrue(f["orbits"]["pos"].is_virtual)
+            self.assertTrue(f["bpp"]["block0_values"].is_virtual)
+
+        r = pop.load("testing-pop-merged", parts=["initial_binaries", "initial_galaxy",
+                                                  "stellar_evolution", "galactic_orbits"])
+
+        # check lengths, unique bin_nums and normalisation are all sensible
+        self.assertTrue(len(r) == len(p) + len(q))
+        self.assertTrue(len(r.initial_galaxy) == len(r))
+        self.assertTrue(len(np.unique(r.bin_nums)) == len(r))
+        self.assertTrue(np.isclose(r.mass_singles, p.mass_singles + q.mass_singles))
+        self.assertTrue(r.n_bin_req == p.n_bin_req + q.n_bin_req)
+
+        # check data from the second file is in the right place (with shifted bin_nums)
+        offset = max(p.bin_nums) + 1
+        self.assertTrue(np.all(r.bpp.loc[offset]["mass_1"].values == q.bpp.loc[0]["mass_1"].values))
+        self.assertTrue(np.all(r.bpp.loc[offset]["bin_num"].values == offset))
+        self.assertTrue(np.all(r.primary_orbits[len(p)].pos == q.primary_orbits[0].pos))
+        self.assertTrue(len(r.orbits) == len(p.orbits) + len(q.orbits))
+        self.assertTrue(np.all(r.final_pos[len(r):]
+                               == np.concatenate((p.final_pos[len(p):], q.final_pos[len(q):]))))
+
+        # merged files can be merged again
+        pop.merge_files(["testing-pop-merged", "testing-shards/p"], "testing-pop-merged-again",
+                        overwrite=True)
+        s = pop.load("testing-pop-merged-again", parts=["stellar_evolution"])
+        self.assertTrue(len(s) == len(r) + len(p))
+        self.assertTrue(len(np.unique(s.bpp["bin_num"])) == len(s))
+
+        # can't merge files with different parts
+        p.save("testing-shards/p-no-orbits", overwrite=True)
+        with h5.File("testing-shards/p-no-orbits.h5", "a") as f:
+            del f["orbits"]
+        it_broke = False
+        try:
+            pop.merge_files(["testing-shards/p", "testing-shards/p-no-orbits"], "testing-pop-merged",
+                            overwrite=True)
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        # can't load a merged file when its shards are missing
+        os.remove("testing-shards/q.h5")
+        it_broke = False
+        try:
+            pop.load("testing-pop-merged")
+        except FileNotFoundError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        shutil.rmtree("testing-shards")
+        os.remove("testing-pop-merged.h5")
+        os.remove("testing-pop-merged-again.h5")
+
+    def test_compressed_io(self):
+        """Check that populations can be saved with compressed orbits and reduced precision"""
+        p = pop.Population(5, processes=1)
+        p.create_population(with_timing=False)
+
+        for compression in ["gzip", "lzf"]:
+            p.save("testing-pop-compressed", overwrite=True, compression=compression, orbit_dtype="float32")
+            p_loaded = pop.load("testing-pop-compressed", parts=["galactic_orbits"])
+
+            with h5.File("testing-pop-compressed.h5", "r") as f:
+                self.assertTrue(f["orbits"]["pos"].compression == compression)
+                self.assertTrue(f["orbits"]["pos"].dtype == np.float32)
+
+            self.assertTrue(np.allclose(p.final_pos, p_loaded.final_pos, rtol=1e-6))
+            self.assertTrue(np.allclose(p.orbits[0].t, p_loaded.orbits[0].t, rtol=1e-6))
+
+        # unknown compression should fail
+        it_broke = False
+        try:
+            p.save("testing-pop-compressed", overwrite=True, compression="nonsense")
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        os.remove("testing-pop-compressed.h5")
+
     def test_save_complicated_sampling(self):
         """Check that you can save a population with complicated sampling params"""
         p = pop.Population(2, processes=1, 
@@ -108,6 +253,27 @@ class Test(unittest.TestCase):
 
         os.remove("testing-lazy-io.h5")
 
+    def test_parallel_load(self):
+        """Check that loading parts in parallel gives the same result as loading serially"""
+        p = pop.Population(5, processes=1, bcm_timestep_conditions=[['dtp=100000.0']])
+        p.create_population(with_timing=False)
+        p.save("testing-parallel-load", overwrite=True)
+
+        parts = ["initial_binaries", "initial_galaxy", "stellar_evolution", "galactic_orbits"]
+        p_serial = pop.load("testing-parallel-load", parts=parts)
+        p_parallel = pop.load("testing-parallel-load", parts=parts, processes=3, with_timing=True)
+
+        for loaded in [p_serial, p_parallel]:
+            self.assertTrue(loaded._bpp is not None and loaded._orbits is not None)
+            self.assertTrue(loaded._initial_galaxy is not None and loaded._kick_info is not None)
+            self.assertTrue(np.all(p.bpp == loaded.bpp))
+            self.assertTrue(np.all(p.bcm == loaded.bcm))
+            self.assertTrue(np.all(p.initC == loaded.initC))
+            self.assertTrue(np.all(p.initial_galaxy.v_R == loaded.initial_galaxy.v_R))
+            self.assertTrue(np.all(p.final_pos == loaded.final_pos))
+
+        os.remove("testing-parallel-load.h5")
+
     def test_load_no_orbits(self):
         """Check that a population can be saved without orbits, and raises an error if trying to load them"""
         p = pop.Population(2, processes=1, bcm_timestep_conditions=[['dtp=100000.0']],
@@ -224,6 +390,13 @@ class Test(unittest.TestCase):
         p.plot_map(ra="auto", dec="auto", coord="G", show=False)
         p.plot_sky_locations(show=False)
 
+        # weights are carried through to the observables and maps
+        p.weights = np.arange(len(p)) + 1
+        self.assertTrue(np.all(p.observables["weight"] == p.weights))
+        pix, weights = p.get_healpix_inds(ra="auto", dec="auto", return_weights=True)
+        self.assertTrue(len(pix) == len(weights) == len(p.final_pos))
+        p.plot_map(ra="auto", dec="auto", show=False)
+
     def test_getters(self):
         """Test the property getters"""
         p = pop.Population(2, processes=1, store_entire_orbits=False, bcm_timestep_conditions=[['dtp=1000.0']])
@@ -538,6 +711,231 @@ class Test(unittest.TestCase):
         p.translate_tables(replace_columns=True)
         self.assertFalse(p.bpp["kstar_1"].dtype == np.float64)
 
+    def test_compact_tables(self):
+        """Ensure that COSMIC tables can be compacted without losing information"""
+        p = pop.Population(10, processes=1, bcm_timestep_conditions=[['dtp=100000.0']])
+        p.perform_stellar_evolution()
+        bpp = p.bpp.copy()
+
+        saved = p.compact_tables(quiet=True)
+        self.assertTrue(saved > 0)
+        self.assertTrue(p.bpp["kstar_1"].dtype == np.int8)
+        self.assertTrue(p.bpp["mass_1"].dtype == np.float32)
+        self.assertTrue(p.bpp["tphys"].dtype == np.float64)
+        self.assertTrue(p.kick_info["bin_num"].dtype == np.int32)
+        self.assertTrue(np.all(p.bpp["kstar_1"].values == bpp["kstar_1"].values))
+        self.assertTrue(np.allclose(p.bpp["mass_1"].values, bpp["mass_1"].values, rtol=1e-6))
+        self.assertTrue(np.all(p.final_bpp["bin_num"].values == p.bin_nums))
+
+        # translated labels should become categoricals (which still save and load)
+        p.translate_tables(replace_columns=False)
+        p.compact_tables(quiet=True)
+        self.assertTrue(isinstance(p.bpp["kstar_1_str"].dtype, pd.CategoricalDtype))
+        p.save("testing-pop-compact", overwrite=True)
+        p_loaded = pop.load("testing-pop-compact", parts=["stellar_evolution"])
+        self.assertTrue(np.all(p_loaded.bpp["kstar_1_str"] == p.bpp["kstar_1_str"]))
+        os.remove("testing-pop-compact.h5")
+
+        # compaction can also be done automatically after evolution
+        p = pop.Population(10, processes=1, compact_evolution_tables=True)
+        p.perform_stellar_evolution()
+        self.assertTrue(p.bpp["evol_type"].dtype == np.int8)
+
+    def test_cost_balanced_evolution(self):
+        """Ensure that evolving binaries in cost-balanced chunks gives the same results as COSMIC"""
+        p = pop.Population(20, processes=1, BSE_settings={"binfrac": 1.0})
+        p.sample_initial_binaries()
+
+        # every binary should end up in exactly one chunk
+        cost = pop._estimate_evolution_cost(p.initial_binaries)
+        sizes = pop._get_evolution_chunks(np.sort(cost)[::-1], processes=2)
+        self.assertTrue(sum(sizes) == len(p.initial_binaries))
+        self.assertTrue(min(sizes) > 0)
+
+        np.random.seed(42)
+        p_chunked = pop.Population(20, processes=2, BSE_settings={"binfrac": 1.0})
+        p_chunked._initial_binaries = p.initial_binaries
+        p_chunked._initial_galaxy = p.initial_galaxy
+        p_chunked.perform_stellar_evolution()
+
+        np.random.seed(42)
+        p_default = pop.Population(20, processes=2, BSE_settings={"binfrac": 1.0},
+                                   cost_balanced_evolution=False)
+        p_default._initial_binaries = p.initial_binaries
+        p_default._initial_galaxy = p.initial_galaxy
+        p_default.perform_stellar_evolution()
+
+        self.assertTrue(p_chunked.bpp.equals(p_default.bpp))
+        self.assertTrue(p_chunked.initC.equals(p_default.initC))
+        self.assertTrue(np.all(p_chunked.kick_info["bin_num"].values
+                               == p_default.kick_info["bin_num"].values))
+
+        # if COSMIC splits the binaries into blocks, fall back to a plain map and warn about it
+        with Pool(2) as pool:
+            chunked_pool = pop._ChunkedPool(pool, [2, 1])
+            with self.assertLogs("cogsworth", level="WARNING"):
+                self.assertTrue(chunked_pool.map(abs, [-1, -2]) == [1, 2])
+            self.assertTrue(chunked_pool.map(abs, [-1, -2, -3]) == [1, 2, 3])
+
+    def test_quasi_random(self):
+        """Ensure that quasi-random sampling is used for the galaxy, velocities and kick orientations"""
+        p = pop.Population(1000, processes=1, quasi_random=True)
+        p.sample_initial_galaxy()
+        self.assertTrue(p.initial_galaxy.qmc)
+
+        # the dispersion should be almost exactly as requested
+        dispersion = np.std(p.initial_galaxy.v_R.value) * np.sqrt(3)
+        self.assertTrue(np.isclose(dispersion, p.v_dispersion.value, rtol=0.02))
+
+        # sfh_params take precedence
+        p = pop.Population(10, processes=1, quasi_random=True, sfh_params={"qmc": False})
+        p.sample_initial_galaxy()
+        self.assertFalse(p.initial_galaxy.qmc)
+
+        p = pop.Population(10, processes=1, final_kstar1=[13, 14], quasi_random=True,
+                           BSE_settings={"binfrac": 1.0})
+        p.create_population(with_timing=False)
+        self.assertTrue(np.all((p.initC["phase_sn_1"] >= 0) & (p.initC["phase_sn_1"] < 2 * np.pi)))
+        pos, _ = p.get_sn_orientation_realisations(n_realisations=4, progress_bar=False)
+        self.assertTrue(pos.shape == (len(p.orbits), 4, 3))
+
+    def test_age_velocity_relation(self):
+        """Ensure that initial velocities can follow the kinematics of the star formation history model"""
+        p = pop.Population(2000, processes=1, quasi_random=True, sfh_params={"age_velocity_relation": True})
+        p.sample_initial_galaxy()
+        g = p.initial_galaxy
+        bulge = g.which_comp == "bulge"
+        self.assertTrue(np.isclose(np.std(g.v_z[bulge].value), 100, rtol=0.1))
+
+        # disc stars lag behind the circular velocity and their vertical dispersion matches the model
+        v_circ = p.galactic_potential.circular_velocity(g.positions).value
+        sigma, v_drift = g.get_velocity_dispersions(p.v_dispersion, v_circ)
+        disc = g.which_comp == "low_alpha_disc"
+        self.assertTrue(np.mean(g.v_T[disc].value - v_circ[disc]) < 0)
+        self.assertTrue(np.isclose(np.std(g.v_z[disc].value / sigma[2, disc]), 1, rtol=0.1))
+
+    def test_sharded_sampling(self):
+        """Ensure that sampling in shards is reproducible and independent of the number of processes"""
+        samples = []
+        for processes in [1, 2]:
+            np.random.seed(42)
+            p = pop.Population(100, processes=processes, sampling_shards=3, m1_cutoff=0.5)
+            p.sample_initial_binaries()
+            samples.append(p)
+
+        self.assertTrue(samples[0].initial_binaries.equals(samples[1].initial_binaries))
+        self.assertTrue(samples[0].mass_binaries == samples[1].mass_binaries)
+        self.assertTrue(np.all(samples[0].bin_nums == np.arange(len(samples[0]))))
+
+        # the sampled masses should be the sum of those in each shard
+        kwargs = {"binfrac_model": 0.5, "SF_start": 12000.0, "SF_duration": 0.0, "met": 0.02,
+                  "primary_model": "kroupa01", "ecc_model": "sana12", "porb_model": "sana12", "qmin": -1}
+        combined = pop.sample_in_shards(list(range(16)), list(range(16)), n_shards=2, entropy=1, size=20,
+                                        **kwargs)
+        shards = [pop._sample_shard(seq.generate_state(4), list(range(16)), list(range(16)),
+                                    {**kwargs, "size": 10, "total_mass": np.inf})
+                  for seq in np.random.SeedSequence(1).spawn(2)]
+        self.assertTrue(len(combined[0]) == sum(len(shard[0]) for shard in shards))
+        self.assertTrue(np.all(combined[0].index == np.arange(len(combined[0]))))
+        for i in range(1, 5):
+            self.assertTrue(np.isclose(combined[i], sum(shard[i] for shard in shards)))
+
+        # a total mass target is split between the shards
+        p = pop.Population(10, processes=1, sampling_shards=3,
+                           sampling_params={"sampling_target": "total_mass", "total_mass": 3000})
+        p.sample_initial_binaries()
+        self.assertTrue(np.isclose(p.mass_singles + p.mass_binaries, 3000, rtol=0.1))
+
+    def test_seed(self):
+        """Check that a seed makes a population reproducible without touching the global random state"""
+        samples = []
+        for processes, seed in [(1, 42), (2, 42), (1, np.random.default_rng(42)), (1, 43)]:
+            state = np.random.get_state()
+            p = pop.Population(100, processes=processes, sampling_shards=2, seed=seed)
+            p.sample_initial_binaries()
+            self.assertTrue(np.all(np.random.get_state()[1] == state[1]))
+            samples.append(p)
+
+        # same seed gives the same binaries and galaxy regardless of the number of processes
+        self.assertTrue(samples[0].initial_binaries.equals(samples[1].initial_binaries))
+        self.assertTrue(np.all(samples[0].initial_galaxy.tau == samples[1].initial_galaxy.tau))
+        self.assertTrue(np.all(samples[0].initial_galaxy.v_R == samples[1].initial_galaxy.v_R))
+
+        # a generator is accepted and a different seed gives a different population
+        self.assertTrue(isinstance(samples[2].seed, np.random.SeedSequence))
+        self.assertFalse(np.all(samples[0].initial_galaxy.tau[:10] == samples[3].initial_galaxy.tau[:10]))
+
+        # running a stage again gives new random numbers, but the same ones for the same sequence of calls
+        for p in samples[:2]:
+            p.sample_initial_galaxy()
+            self.assertFalse(np.all(p.initial_galaxy.tau[:10] == samples[2].initial_galaxy.tau[:10]))
+        self.assertTrue(np.all(samples[0].initial_galaxy.tau == samples[1].initial_galaxy.tau))
+        self.assertTrue(np.all(samples[0].initial_galaxy.v_T == samples[1].initial_galaxy.v_T))
+        first, second = samples[0].subsample(0.5), samples[0].subsample(0.5)
+        self.assertFalse(len(first) == len(second) and np.all(first.bin_nums == second.bin_nums))
+
+        # the seed and the number of runs of each stage are carried through indexing, saving and loading
+        self.assertTrue(samples[0][:10].seed.entropy == 42)
+        self.assertTrue(samples[0][:10]._random_calls == samples[0]._random_calls)
+        samples[0].save("testing-seed.h5", overwrite=True)
+        p_loaded = pop.load("testing-seed.h5", parts=["initial_binaries"])
+        self.assertTrue(p_loaded.seed.entropy == 42)
+        self.assertTrue(p_loaded.seed.spawn_key == samples[0].seed.spawn_key)
+        self.assertTrue(p_loaded._random_calls == samples[0]._random_calls)
+        os.remove("testing-seed.h5")
+
+    def test_weights(self):
+        """Check that importance weights are carried through subsampling, saving and concatenation"""
+        p = pop.Population(20, processes=1, final_kstar1=[13, 14])
+        p.create_population(with_timing=False)
+        self.assertTrue(np.all(p.weights == 1.0))
+
+        # keep every black hole but only half of everything else
+        is_bh = p.final_bpp["kstar_1"].values == 14
+        q = p.subsample(np.where(is_bh, 1.0, 0.5))
+        self.assertTrue(np.all(q.weights[q.final_bpp["kstar_1"].values == 14] == 1.0))
+        self.assertTrue(np.all(q.weights[q.final_bpp["kstar_1"].values != 14] == 2.0))
+        self.assertTrue(np.all(q.get_class_counts() == q.weights @ q.classes.values))
+        self.assertTrue(q.get_class_counts(weighted=False).sum() == q.classes.values.sum())
+
+        # indexing keeps the right weights
+        self.assertTrue(np.all(q[q.bin_nums[::-1]].weights == q.weights[::-1]))
+
+        # weights are saved and loaded
+        q.save("testing-pop-weights", overwrite=True)
+        loaded = pop.load("testing-pop-weights", parts=["stellar_evolution"])
+        self.assertTrue(np.all(loaded.weights == q.weights))
+        os.remove("testing-pop-weights.h5")
+
+        # concatenating with an unweighted population gives it weights of 1
+        p_no_orbits = pop.Population(5, processes=1)
+        p_no_orbits.sample_initial_binaries()
+        q_no_orbits = p_no_orbits.subsample(0.5)
+        combined = pop.concat(p_no_orbits, q_no_orbits)
+        self.assertTrue(np.all(combined.weights == np.concatenate((np.ones(len(p_no_orbits)),
+                                                                   2 * np.ones(len(q_no_orbits))))))
+
+        # probabilistic pre-filters set weights
+        r = pop.Population(50, processes=1, pre_filter=lambda ib: np.where(ib["mass_1"] > 1.0, 1.0, 0.25))
+        r.sample_initial_binaries()
+        self.assertTrue(np.all(r.weights[r.initial_binaries["mass_1"].values > 1.0] == 1.0))
+        self.assertTrue(np.all(r.weights[r.initial_binaries["mass_1"].values <= 1.0] == 4.0))
+
+        for bad_weights in [-1.0, np.inf]:
+            it_broke = False
+            try:
+                p.weights = bad_weights
+            except ValueError:
+                it_broke = True
+            self.assertTrue(it_broke)
+
+        it_broke = False
+        try:
+            p.subsample(2.0)
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
     def test_cartoon(self):
         """Ensure that the cartoon plot works"""
         p = pop.Population(10, final_kstar1=[14])
@@ -594,6 +992,13 @@ class Test(unittest.TestCase):
         self.assertTrue(len(pop.concat(p)) == len(p))
         self.assertTrue(len(sfh.concat(p.initial_galaxy)) == len(p.initial_galaxy))
 
+        # concatenating many at once gives the same as doing it pairwise
+        s = pop.concat(p, q, p)
+        t = (p + q) + p
+        self.assertTrue(np.all(s.bin_nums == t.bin_nums))
+        self.assertTrue(np.all(s.initial_galaxy.tau == t.initial_galaxy.tau))
+        self.assertTrue(len(s) == 2 * len(p) + len(q) and len(s.initial_galaxy) == len(s))
+
     def test_concat_wrong_type(self):
         """Check that we can't concatenate with the wrong type"""
         p = pop.Population(10)
@@ -649,16 +1054,54 @@ class Test(unittest.TestCase):
             it_failed = True
         self.assertTrue(it_failed)
 
-    def test_concat_no_orbits(self):
-        """Check that we can't concatenate populations without orbits"""
-        p = pop.Population(10)
-        q = pop.Population(10)
+    def test_concat_orbits(self):
+        """Check that we can concatenate populations with orbits"""
+        p = pop.Population(10, final_kstar1=[13, 14], BSE_settings={"binfrac": 1.0})
+        q = pop.Population(10, final_kstar1=[13, 14], BSE_settings={"binfrac": 1.0})
         p.create_population()
         q.create_population()
 
+        r = p + q
+        self.assertTrue(len(r.orbits) == len(p.orbits) + len(q.orbits))
+        self.assertTrue(np.all(r.disrupted == np.concatenate((p.disrupted, q.disrupted))))
+
+        # bound binaries and primaries come first, then all disrupted secondaries (checked from the orbits)
+        r._final_pos, r._final_vel = None, None
+        self.assertTrue(np.all(r.final_pos[:len(r)] == np.concatenate((p.final_pos[:len(p)],
+                                                                       q.final_pos[:len(q)]))))
+        self.assertTrue(np.all(r.final_pos[len(r):] == np.concatenate((p.final_pos[len(p):],
+                                                                       q.final_pos[len(q):]))))
+
+        # can't mix populations with and without orbits
+        s = pop.Population(10)
+        s.perform_stellar_evolution()
         it_failed = False
         try:
-            r = p + q
-        except NotImplementedError:
+            r = p + s
+        except ValueError:
             it_failed = True
         self.assertTrue(it_failed)
+
+    def test_adaptive_size(self):
+        """Ensure populations can be grown in chunks until statistics converge"""
+        p = pop.Population(20, processes=1, final_kstar1=[13, 14], BSE_settings={"binfrac": 1.0})
+        estimators = {"disrupted_frac": lambda p: p.weights[p.disrupted].sum() / p.weights.sum(),
+                      "rate": lambda p: p.get_class_counts()["co-1"] / p.mass_binaries}
+        history = p.create_population_until_converged(estimators, rtol=0.5, max_chunks=3, n_bootstrap=20,
+                                                      with_timing=False)
+        self.assertTrue(1 <= len(history) <= 3)
+        self.assertTrue(history["n_binaries_match"].iloc[-1] == len(p))
+        self.assertTrue(len(p.orbits) == len(p) + p.disrupted.sum())
+        self.assertTrue(p.final_kstar1 == [13, 14])
+        self.assertTrue(np.all(p.weights == 1))
+
+        # errors shrink as the population grows
+        _, errors = pop.bootstrap_estimators(p, {"n": lambda p: p.weights.sum()}, n_bootstrap=50)
+        self.assertTrue(0 < errors["n"] < 1)
+
+        it_broke = False
+        try:
+            p.create_population_until_converged(estimators)
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
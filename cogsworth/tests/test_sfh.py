@@ -2,10 +2,197 @@ import numpy as np
 import unittest
 import cogsworth.sfh as sfh
 import os
+import gc
+import weakref
 import astropy.units as u
+from cogsworth.tests.optional_deps import check_dependencies
+
+
+def _has_dependency(name):
+    try:
+        return check_dependencies(name)
+    except ImportError:
+        return False
 
 
 class Test(unittest.TestCase):
+    def test_unit_free_storage(self):
+        """Check that values are stored unit-free with cached Quantity views"""
+        g = sfh.Wagg2022(size=100)
+        self.assertFalse(isinstance(g._tau, u.Quantity))
+        self.assertTrue(g.tau.unit == u.Gyr and g.x.unit == u.kpc)
+        self.assertTrue(g.tau is g.tau and g.positions is g.positions)
+        self.assertTrue(np.shares_memory(g.x.value, g._x))
+
+        # assigning a Quantity converts it and resets the views
+        g._x = g.x.to(u.pc)
+        self.assertTrue(np.allclose(g._x, g.x.value) and g.x.unit == u.kpc)
+        self.assertTrue(np.allclose(g.rho, np.sqrt(g.x**2 + g.y**2)))
+
+        # velocities only exist once set
+        self.assertFalse(hasattr(g, "v_R"))
+        g.v_R = np.ones(100) * u.m / u.s
+        self.assertTrue(np.allclose(g.v_R.value, 1e-3) and g.v_R.unit == u.km / u.s)
+        self.assertTrue(np.allclose(g[:10].v_R.value, 1e-3))
+        self.assertFalse(isinstance(g[:10]._v_R, u.Quantity))
+
+    def test_iter_chunks(self):
+        """Check that models can be sampled reproducibly in chunks"""
+        g = sfh.Wagg2022(size=1000, immediately_sample=False)
+        state = np.random.get_state()[1].copy()
+        chunks = list(g.iter_chunks(300, seed=42))
+        self.assertTrue(np.all(np.random.get_state()[1] == state))
+        self.assertTrue([len(chunk) for chunk in chunks] == [300, 300, 300, 100])
+        self.assertTrue(g._tau is None)
+
+        # combined, the chunks have exactly the same number of points from each component as a full sample
+        full = sfh.Wagg2022(size=1000)
+        combined = sfh.concat(*chunks)
+        for com in g.components:
+            self.assertTrue(np.sum(combined.which_comp == com) == np.sum(full.which_comp == com))
+
+        # the same seed gives the same chunks and a different one doesn't
+        self.assertTrue(np.all(next(g.iter_chunks(300, seed=42)).tau == chunks[0].tau))
+        self.assertFalse(np.all(next(g.iter_chunks(300, seed=43)).tau == chunks[0].tau))
+
+        it_broke = False
+        try:
+            next(g.iter_chunks(0))
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+    def test_slicing_and_concat(self):
+        """Check that contiguous selections are views and that many objects can be concatenated at once"""
+        g = sfh.Wagg2022(size=100)
+        for ind in [slice(10, 20), np.arange(10, 20), 5, -1]:
+            self.assertTrue(np.shares_memory(g[ind]._tau, g._tau))
+        self.assertFalse(np.shares_memory(g[[3, 1, 2]]._tau, g._tau))
+        self.assertTrue(len(g[5]) == 1 and g[-1].tau == g.tau[-1])
+        self.assertTrue(len(g[[]]) == 0 and len(g[np.array([], dtype=int)]) == 0)
+
+        # views share edits made in place with the original, but not new assignments
+        view = g[10:20]
+        view._x[0] = 1000.0
+        self.assertTrue(g._x[10] == 1000.0)
+        view._x = np.zeros(10)
+        self.assertTrue(g._x[11] != 0.0)
+
+        it_broke = False
+        try:
+            g[100]
+        except IndexError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        # concatenating pieces gives back the original values without changing the parameters
+        pieces = [g[i:i + 10] for i in range(0, 100, 10)]
+        combined = sfh.concat(*pieces)
+        self.assertTrue(len(combined) == 100 and combined.tsfr == g.tsfr)
+        for attr in ["_tau", "_x", "_which_comp"]:
+            self.assertTrue(np.all(getattr(combined, attr) == getattr(g, attr)))
+
+        # all pieces must have the same columns
+        pieces[1].v_R = np.zeros(10)
+        pieces[0].v_R = np.zeros(10)
+        it_broke = False
+        try:
+            sfh.concat(*pieces)
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+    def test_age_velocity_relation(self):
+        """Check the age and component dependent kinematics of the Wagg2022 model"""
+        g = sfh.Wagg2022(size=5000)
+        v_circ = np.full(len(g), 220.0)
+        sigma, v_drift = g.get_velocity_dispersions(5 * u.km / u.s, v_circ)
+        self.assertTrue(np.allclose(sigma, 5 / np.sqrt(3)) and np.all(v_drift == 0))
+
+        g.age_velocity_relation = True
+        sigma, v_drift = g.get_velocity_dispersions(5 * u.km / u.s, v_circ)
+        self.assertTrue(sigma.shape == (3, len(g)) and v_drift.shape == (len(g),))
+
+        # older disc stars are hotter, the bulge is isotropic and nothing rotates backwards on average
+        thin = g.which_comp == "low_alpha_disc"
+        old, young = thin & (g.tau > 6 * u.Gyr), thin & (g.tau < 1 * u.Gyr)
+        self.assertTrue(np.all(sigma[:, old].min(axis=1) > sigma[:, young].max(axis=1)))
+        self.assertTrue(np.all(sigma[:, g.which_comp == "bulge"] == 100.0))
+        self.assertTrue(v_drift[old].min() > v_drift[young].max())
+        self.assertTrue(np.all(v_drift <= v_circ))
+
+        # the setting is kept when saving and slicing
+        g.save("testing-galaxy-avr")
+        self.assertTrue(sfh.load("testing-galaxy-avr").age_velocity_relation and g[:10].age_velocity_relation)
+        os.remove("testing-galaxy-avr.h5")
+
+    @unittest.skipUnless(_has_dependency("agama"), "agama is not installed")
+    def test_agama_cache(self):
+        """Check that action-based models reuse cached agama objects without keeping instances alive"""
+        params = {"mass": 1e8 * u.Msun, "J_0_star": 10 * u.kpc * u.km / u.s, "alpha": 0.5, "eta": 1.0}
+        g = sfh.SpheroidalDwarf(size=10, **params)
+        h = sfh.SpheroidalDwarf(size=10, **params)
+        self.assertTrue(g.galaxy_model is h.galaxy_model)
+        self.assertTrue(g._get_cache_key() in sfh._AGAMA_CACHE)
+
+        # the cached distribution function shouldn't hold on to the first instance
+        ref = weakref.ref(g)
+        del g
+        gc.collect()
+        self.assertTrue(ref() is None)
+
+    @unittest.skipUnless(_has_dependency("agama"), "agama is not installed")
+    def test_agama_shard_seeding(self):
+        """Check that sampling an action-based model in parallel is reproducible and reuses the workers"""
+        samples, pools = [], []
+        for seed in [7, 7, 8]:
+            np.random.seed(seed)
+            samples.append(sfh.QuasiIsothermalDisk(size=50, processes=2))
+            pools.append(sfh._AGAMA_POOLS[2])
+        self.assertTrue(pools[0] is pools[1] and pools[1] is pools[2])
+
+        self.assertTrue(np.all(samples[0]._x == samples[1]._x))
+        self.assertTrue(np.all(samples[0]._v_R == samples[1]._v_R))
+        self.assertFalse(np.all(samples[0]._x == samples[2]._x))
+
+    def test_lookback_times(self):
+        """Check the lookback times of the Wagg2022 discs follow an exponential star formation rate"""
+        g = sfh.Wagg2022(size=10, immediately_sample=False)
+        for component, (t_min, t_max) in zip(["low_alpha_disc", "high_alpha_disc"], [(0, 8), (8, 12)]):
+            np.random.seed(42)
+            tau = g.draw_lookback_times(10000, component=component).to(u.Gyr).value
+            self.assertTrue(np.all((tau >= t_min) & (tau <= t_max)))
+
+            # compare the empirical CDF to the analytic one
+            t_sfr = g.tsfr.to(u.Gyr).value
+            cdf = ((np.exp(np.sort(tau) / t_sfr) - np.exp(t_min / t_sfr))
+                   / (np.exp(t_max / t_sfr) - np.exp(t_min / t_sfr)))
+            self.assertTrue(np.max(np.abs(cdf - np.arange(len(tau)) / len(tau))) < 0.02)
+
+        # many small draws should work just as well
+        self.assertTrue(len(np.concatenate([g.draw_lookback_times(3) for _ in range(10)])) == 30)
+
+    def test_qmc(self):
+        """Check that quasi-random sampling follows the same distributions but more evenly"""
+        for model in [sfh.Wagg2022, sfh.ConstantUniformDisc]:
+            g = model(size=1000, qmc=True)
+            self.assertTrue(g[:10].qmc)
+            self.assertTrue(np.all((g.tau >= 0 * u.Gyr) & (g.tau <= 12 * u.Gyr)))
+            self.assertTrue(np.isclose(np.mean(g.z.value), 0.0, atol=0.05))
+
+            # the empirical distribution of the azimuths should be almost exactly uniform
+            U = np.sort(np.arctan2(g.x, g.y).value % (2 * np.pi)) / (2 * np.pi)
+            self.assertTrue(np.max(np.abs(U - np.arange(len(U)) / len(U))) < 0.01)
+
+            # direct draws work too
+            self.assertTrue(len(g.draw_phi(10)) == 10)
+            self.assertTrue(np.isscalar(g._draw_uniform(None, 0)))
+
+        g.save("testing-galaxy-qmc")
+        g_loaded = sfh.load("testing-galaxy-qmc")
+        self.assertTrue(g_loaded.qmc)
+        os.remove("testing-galaxy-qmc.h5")
+
     def test_basic_class(self):
         """Check that base class can't be used alone"""
 
@@ -70,6 +257,40 @@ class Test(unittest.TestCase):
         self.assertTrue(np.all(g.rho <= 20 * u.kpc))
         self.assertTrue(np.all(g.Z == 0.02))
 
+    def test_tabulated(self):
+        """Ensure the tabulated class samples within its bins, follows the mass and can be saved"""
+        mass = np.zeros((3, 4, 2, 2))
+        mass[0, 1, 0, 1] = 1.0
+        mass[2, 3, 1, 0] = 3.0
+        g = sfh.TabulatedSFH(size=10000, mass=mass, tau_bins=[0, 1, 5, 12] * u.Gyr, R_bins=[0, 2, 4, 8, 16],
+                             z_bins=[-1, 0, 1], Z_bins=[0.001, 0.01, 0.03])
+        first = g.tau < 1 * u.Gyr
+        self.assertTrue(np.isclose(np.mean(first), 0.25, atol=0.02))
+        self.assertTrue(np.all(g.rho[first] >= 2 * u.kpc) & np.all(g.rho[first] <= 4 * u.kpc))
+        self.assertTrue(np.all(g.z[first] <= 0 * u.kpc) & np.all(g.Z[first] >= 0.01))
+        self.assertTrue(np.all(g.tau[~first] >= 5 * u.Gyr) & np.all(g.rho[~first] >= 8 * u.kpc))
+        self.assertTrue(np.all(g.which_comp == "tabulated"))
+
+        # binning particles gives a similar distribution
+        h = sfh.TabulatedSFH.from_particles(size=1000, tau=g.tau, R=g.rho, z=g.z, Z=g.Z, mass=np.ones(len(g)),
+                                            bins=5, qmc=True)
+        self.assertTrue(np.isclose(np.mean(h.tau < h.tau_bins[1]), 0.25, atol=0.05))
+
+        g.save("testing-tabulated-io")
+        g_loaded = sfh.load("testing-tabulated-io")
+        self.assertTrue(np.all(g.tau == g_loaded.tau))
+        self.assertTrue(np.all(g_loaded.mass == mass) and np.all(g_loaded.R_bins == g.R_bins))
+        self.assertTrue(np.all(g_loaded.Z_bins == g.Z_bins))
+        os.remove("testing-tabulated-io.h5")
+
+        it_broke = False
+        try:
+            sfh.TabulatedSFH(size=10, mass=mass, tau_bins=[0, 12], R_bins=[0, 2, 4, 8, 16],
+                             z_bins=[-1, 0, 1], Z_bins=[0.001, 0.01, 0.03])
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
     def test_bad_inputs(self):
         """Ensure the classes fail with bad input"""
         g = sfh.Wagg2022(size=None, immediately_sample=False)
@@ -106,6 +327,32 @@ class Test(unittest.TestCase):
         self.assertTrue(np.all(g.tau == g_loaded.tau))
         self.assertTrue(np.all(g.rho == g_loaded.rho))
         self.assertTrue(np.all(g.z == g_loaded.z))
+        self.assertTrue(np.all(g.which_comp == g_loaded.which_comp))
+
+        # columns can be compressed and only the requested ones are read immediately
+        g.v_R = np.ones(len(g)) * u.km / u.s
+        g.save("testing-galaxy-io", compression="gzip")
+        g_loaded = sfh.load("testing-galaxy-io", columns=["tau", "Z"])
+        self.assertTrue(np.all(g.tau == g_loaded.tau))
+        self.assertTrue(g_loaded.__dict__["_x"] is None)
+        self.assertTrue(np.all(g.x == g_loaded.x) and np.all(g.v_R == g_loaded.v_R))
+        lazy = sfh.load("testing-galaxy-io", columns=[])
+        self.assertTrue(np.all(g[:10].which_comp == lazy[:10].which_comp))
+
+        it_broke = False
+        try:
+            sfh.load("testing-galaxy-io", columns=["nonsense"])
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        # samples can only be appended if they were saved to be appendable
+        it_broke = False
+        try:
+            g.save("testing-galaxy-io", append=True)
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
 
         os.remove("testing-galaxy-io.h5")
 
@@ -0,0 +1,116 @@
+import unittest
+import os
+import numpy as np
+import cogsworth
+from cogsworth.sweep import PopulationSweep
+
+
+class Test(unittest.TestCase):
+    def test_sweep(self):
+        """Ensure that a sweep gives the same results as evolving each configuration separately"""
+        base = cogsworth.pop.Population(10, processes=1)
+        sweep = PopulationSweep(base, {"low": {"alpha1": 0.5}, "high": {"alpha1": 2.0}})
+        sweep.create_populations(with_timing=False)
+
+        self.assertTrue(len(sweep) == 2)
+        self.assertTrue(sweep["high"].BSE_settings["alpha1"] == 2.0)
+        self.assertTrue(np.all(sweep["low"].initC["alpha1"] == 0.5))
+
+        for label in sweep.labels:
+            p = sweep[label]
+            q = cogsworth.pop.Population(10, processes=1, BSE_settings=p.BSE_settings)
+            q._initial_binaries = base.initial_binaries
+            q._initial_galaxy = base.initial_galaxy
+            q.n_binaries_match = base.n_binaries_match
+            q.perform_stellar_evolution()
+            self.assertTrue(np.all(q.bpp.index == p.bpp.index))
+            self.assertTrue(np.allclose(q.bpp["mass_1"].values, p.bpp["mass_1"].values))
+
+            # with the same supernova orientations, the orbits should match too
+            for col in ["phase_sn_1", "phase_sn_2", "inc_sn_1", "inc_sn_2"]:
+                q.initC[col] = p.initC[col].values
+            q.perform_galactic_evolution(progress_bar=False)
+            self.assertTrue(np.allclose(q.final_pos.value, p.final_pos.value))
+
+        # orbits without kicks are shared between configurations
+        n_orbits = len(sweep["low"].orbits) + len(sweep["high"].orbits)
+        self.assertTrue(sweep.n_orbits_integrated < n_orbits)
+
+    def test_seeded_sweep(self):
+        """Check that seeded sweeps are reproducible and bad binaries are removed from each configuration"""
+        sweeps = []
+        for _ in range(2):
+            sweep = PopulationSweep(cogsworth.pop.Population(10, processes=1, seed=3),
+                                    [{"alpha1": 0.5}, {"alpha1": 2.0}])
+            sweep.perform_stellar_evolution()
+            sweeps.append(sweep)
+        for col in ["randomseed", "phase_sn_1", "inc_sn_2"]:
+            self.assertTrue(np.all(sweeps[0].population.initial_binaries[col]
+                                   == sweeps[1].population.initial_binaries[col]))
+        self.assertTrue(np.all(sweeps[0][1].bpp == sweeps[1][1].bpp))
+
+        # a binary with NaNs is removed from its configuration without changing the shared initial galaxy
+        p = sweeps[0][0]
+        n_bin = len(p)
+        bad = p._kick_info["bin_num"] == p.bin_nums[0]
+        p._kick_info.loc[bad, "delta_vsysx_1"] = np.nan
+        p._remove_nan_binaries()
+        os.remove("nans.h5")
+        self.assertTrue(len(p) == n_bin - 1 and len(p.initial_galaxy) == n_bin - 1)
+        self.assertTrue(len(p.initC) == n_bin - 1 and len(p.weights) == n_bin - 1)
+        self.assertTrue(len(sweeps[0][1].initial_galaxy) == n_bin)
+        self.assertTrue(len(sweeps[0].population.initial_galaxy) == n_bin)
+
+    def test_sweep_io(self):
+        """Check that a sweep can be saved and re-loaded"""
+        base = cogsworth.pop.Population(5, processes=1, bcm_timestep_conditions=[['dtp=100000.0']])
+        sweep = PopulationSweep(base, [{"alpha1": 0.5}, {"sigma": 30.0}])
+        sweep.create_populations(with_timing=False)
+        sweep.save("testing-sweep-io", overwrite=True)
+
+        loaded = cogsworth.sweep.load("testing-sweep-io")
+        self.assertTrue(loaded.labels == ["config_0", "config_1"])
+        self.assertTrue(loaded.configurations == sweep.configurations)
+        for i in range(len(sweep)):
+            self.assertTrue(np.all(loaded[i].bpp == sweep[i].bpp))
+            self.assertTrue(np.all(loaded[i].bcm["bin_num"] == sweep[i].bcm["bin_num"]))
+            self.assertTrue(np.all(loaded[i].final_pos == sweep[i].final_pos))
+
+        # the shared initial conditions can be loaded as a normal population
+        p = cogsworth.pop.load("testing-sweep-io", parts=["initial_binaries", "initial_galaxy"])
+        self.assertTrue(np.all(p.initial_binaries["mass_1"] == base.initial_binaries["mass_1"]))
+
+        os.remove("testing-sweep-io.h5")
+
+    def test_bad_inputs(self):
+        """Ensure the class fails with bad input"""
+        base = cogsworth.pop.Population(5, processes=1)
+        it_broke = False
+        try:
+            PopulationSweep(base, [])
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        sweep = PopulationSweep(base, {"a": {"alpha1": 0.5}})
+        it_broke = False
+        try:
+            sweep["a"]
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        it_broke = False
+        try:
+            sweep.save("testing-sweep-bad")
+        except ValueError:
+            it_broke = True
+        self.assertTrue(it_broke)
+
+        sweep.perform_stellar_evolution()
+        it_broke = False
+        try:
+            sweep["b"]
+        except KeyError:
+            it_broke = True
+        self.assertTrue(it_broke)
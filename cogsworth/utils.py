@@ -1,9 +1,19 @@
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 import numpy as np
+import pandas as pd
+import astropy.units as u
+import gala.potential as gp
+from gala.potential.potential.io import to_dict as potential_to_dict, from_dict as potential_from_dict
+from scipy.stats import qmc
+from contextlib import contextmanager
+import copyreg
 
+from cogsworth.tests.optional_deps import check_dependencies
 
-__all__ = ["kstar_translator", "evol_type_translator", "translate_COSMIC_tables"]
+
+__all__ = ["kstar_translator", "evol_type_translator", "translate_COSMIC_tables", "compact_COSMIC_tables",
+           "sobol_uniforms"]
 
 fs = 24
 
@@ -115,3 +125,254 @@ def translate_COSMIC_tables(tab, kstars=True, evol_type=True, label_type="short"
             tab.loc[:, "evol_type_str"] = evol_type_str
 
     return tab
+
+
+def compact_COSMIC_tables(tab, float_dtype="float32", full_precision_columns=["tphys", "randomseed"]):
+    """Reduce the memory usage of COSMIC BSE tables by downcasting their columns
+
+    COSMIC returns every column as a ``float64``, even those that only contain integer labels. This converts
+    integer-valued label columns (e.g. ``kstar_1``, ``evol_type``) to ``int8``, ``bin_num`` (and the index)
+    to ``int32`` and every other float column to `float_dtype`. Labels that have already been translated
+    with :func:`translate_COSMIC_tables` are stored as pandas Categoricals instead of arrays of strings.
+
+    Parameters
+    ----------
+    tab : :class:`~pandas.DataFrame`
+        Evolution table from COSMIC (e.g. bpp, bcm or kick_info)
+    float_dtype : `str`, optional
+        Floating point type to use for float columns, by default "float32"
+    full_precision_columns : `list`, optional
+        Float columns to leave untouched, by default ["tphys", "randomseed"] (times are used for matching
+        events to the galactic orbits and random seeds don't fit in a ``float32``)
+
+    Returns
+    -------
+    compacted_tab : :class:`~pandas.DataFrame`
+        The compacted table
+    """
+    label_columns = ["kstar_1", "kstar_2", "evol_type", "kstar_1_str", "kstar_2_str", "evol_type_str",
+                     "star", "disrupted", "bin_state", "SN_1", "SN_2"]
+
+    def fits_integer(values, dtype):
+        limits = np.iinfo(dtype)
+        return (len(values) == 0 or (np.all(np.mod(values, 1) == 0)
+                                     and values.min() >= limits.min and values.max() <= limits.max))
+
+    dtypes = {}
+    for col in tab.columns:
+        dtype = tab[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        elif col in label_columns and (dtype == object or pd.api.types.is_string_dtype(dtype)):
+            dtypes[col] = "category"
+        elif col in label_columns and dtype.kind in "fi" and fits_integer(tab[col].values, np.int8):
+            dtypes[col] = "int8"
+        elif col == "bin_num" and dtype.kind in "fi" and fits_integer(tab[col].values, np.int32):
+            dtypes[col] = "int32"
+        elif dtype.kind == "f" and col not in full_precision_columns:
+            dtypes[col] = float_dtype
+
+    compacted_tab = tab.astype(dtypes)
+    if compacted_tab.index.dtype.kind == "i" and fits_integer(compacted_tab.index.values, np.int32):
+        compacted_tab.index = compacted_tab.index.astype("int32")
+    return compacted_tab
+
+
+def sobol_uniforms(size, dims=1, rng=None):
+    """Draw quasi-random points that are uniformly distributed in the unit hypercube
+
+    Points are taken from a scrambled Sobol' sequence (see :class:`~scipy.stats.qmc.Sobol`), which covers
+    the hypercube far more evenly than pseudo-random draws. Passing these through an inverse CDF therefore
+    gives samples whose statistics converge faster with the number of samples. The scrambling is seeded from
+    `rng` (by default numpy's global random state so that ``np.random.seed`` still makes results
+    reproducible).
+
+    Parameters
+    ----------
+    size : `int`
+        Number of points to draw
+    dims : `int`, optional
+        Number of dimensions of each point, by default 1. Each quantity that is drawn for the same sample
+        should use its own dimension.
+    rng : :class:`~numpy.random.Generator` or :class:`~numpy.random.RandomState`, optional
+        Random number generator used to seed the scrambling, by default numpy's global random state
+
+    Returns
+    -------
+    U : :class:`~numpy.ndarray`, shape (size, dims)
+        Quasi-random points in [0, 1)
+    """
+    if size == 0:
+        return np.zeros((0, dims))
+
+    # the balance properties of Sobol' sequences need a power of two points, so take the start of one
+    rng = np.random.mtrand._rand if rng is None else rng
+    engine = qmc.Sobol(d=dims, scramble=True, seed=_random_integers(rng, 0, np.iinfo(np.int32).max))
+    return engine.random_base2(int(np.ceil(np.log2(size))))[:size]
+
+
+def _get_compression_kwargs(compression=None, compression_opts=None, shuffle=True):
+    """Convert compression settings into keyword arguments for :meth:`h5py.Group.create_dataset`
+
+    Parameters
+    ----------
+    compression : `str`, optional
+        One of [None, "gzip", "lzf", "blosc"], by default None
+    compression_opts : `int`, optional
+        Compression level (for "gzip" and "blosc"), by default None
+    shuffle : `bool`, optional
+        Whether to apply a byte-shuffle filter, by default True
+
+    Returns
+    -------
+    kwargs : `dict`
+        Keyword arguments for creating a dataset
+
+    Raises
+    ------
+    ValueError
+        If an unknown compression is provided
+    """
+    if compression is None:
+        return {}
+    elif compression in ["gzip", "lzf"]:
+        kwargs = {"compression": compression, "shuffle": shuffle}
+        if compression == "gzip":
+            kwargs["compression_opts"] = 4 if compression_opts is None else compression_opts
+        return kwargs
+    elif compression == "blosc":
+        assert check_dependencies("hdf5plugin")
+        import hdf5plugin
+        return dict(hdf5plugin.Blosc(cname="lz4", clevel=5 if compression_opts is None else compression_opts,
+                                     shuffle=hdf5plugin.Blosc.SHUFFLE if shuffle
+                                     else hdf5plugin.Blosc.NOSHUFFLE))
+    else:
+        raise ValueError(f"Unknown compression '{compression}', choose one of [None, 'gzip', 'lzf', 'blosc']")
+
+
+def _register_compression_filters():
+    """Register any extra HDF5 compression filters (e.g. blosc) so compressed datasets can be read"""
+    try:
+        import hdf5plugin       # noqa: F401
+    except ImportError:
+        pass
+
+
+def _get_time_knots(potential):
+    """Get the times at which a (possibly time-dependent) potential is specified
+
+    Parameters
+    ----------
+    potential : :class:`Potential <gala.potential.potential.PotentialBase>`
+        The potential
+
+    Returns
+    -------
+    knots : :class:`~astropy.units.Quantity` [time]
+        The times of the knots of any time interpolated components, or None if the potential is static
+    """
+    if not hasattr(gp, "TimeInterpolatedPotential"):      # pragma: no cover
+        return None
+    pots = (potential.values() if isinstance(potential, (gp.CompositePotential, gp.CCompositePotential))
+            else [potential])
+    knots = [p.parameters["time_knots"].to_value(u.Myr) for p in pots
+             if isinstance(p, gp.TimeInterpolatedPotential)]
+    return np.unique(np.concatenate(knots)) * u.Myr if len(knots) > 0 else None
+
+
+def _circular_velocity_at_times(potential, q, t):
+    """Calculate the circular velocity at each position at its own time
+
+    gala evaluates potentials at a single time in each call, so for time-dependent potentials the circular
+    velocity is evaluated at each of the knots of the potential and interpolated linearly in time.
+
+    Parameters
+    ----------
+    potential : :class:`Potential <gala.potential.potential.PotentialBase>`
+        The potential
+    q : :class:`~astropy.units.Quantity` [length], shape (3, N)
+        The positions
+    t : :class:`~astropy.units.Quantity` [time], shape (N,)
+        The time at which to evaluate each position
+
+    Returns
+    -------
+    v_circ : :class:`~astropy.units.Quantity` [velocity], shape (N,)
+        The circular velocity at each position
+    """
+    knots = _get_time_knots(potential)
+    if knots is None:
+        return potential.circular_velocity(q=q)
+
+    v_circ = u.Quantity([potential.circular_velocity(q=q, t=knot) for knot in knots])
+    t = t.to_value(u.Myr)
+    upper = np.clip(np.searchsorted(knots.value, t), 1, len(knots) - 1)
+    weight = np.clip((t - knots.value[upper - 1]) / np.diff(knots.value)[upper - 1], 0, 1)
+    inds = np.arange(len(t))
+    return v_circ[upper - 1, inds] * (1 - weight) + v_circ[upper, inds] * weight
+
+
+def _reduce_time_interpolated_potential(pot):
+    """Pickle time interpolated potentials through their dictionary representation (so they can be sent
+    to other processes)"""
+    return potential_from_dict, (potential_to_dict(pot),)
+
+
+if hasattr(gp, "TimeInterpolatedPotential"):
+    copyreg.pickle(gp.TimeInterpolatedPotential, _reduce_time_interpolated_potential)
+
+
+@contextmanager
+def _seeded_random_state(seed):
+    """Temporarily seed NumPy's global random state, restoring the previous state afterwards
+
+    This is only for code that we don't control which draws from the global state (e.g. COSMIC sampling) and
+    isn't thread-safe, use :func:`_rng_from_seed` for anything else.
+
+    Parameters
+    ----------
+    seed : `int`, :class:`~numpy.ndarray` or :class:`~numpy.random.SeedSequence`
+        The seed to use, if None then the global random state is used as it is
+    """
+    if seed is None:
+        yield
+        return
+    state = np.random.get_state()
+    np.random.seed(seed.generate_state(4) if isinstance(seed, np.random.SeedSequence) else seed)
+    try:
+        yield
+    finally:
+        np.random.set_state(state)
+
+
+def _as_seed_sequence(seed):
+    """Convert a seed (`int`, :class:`~numpy.random.SeedSequence` or :class:`~numpy.random.Generator`) to a
+    :class:`~numpy.random.SeedSequence` (None stays None)"""
+    if seed is None or isinstance(seed, np.random.SeedSequence):
+        return seed
+    if isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(int(seed.integers(np.iinfo(np.int64).max)))
+    return np.random.SeedSequence(seed)
+
+
+def _rng_from_seed(seed):
+    """Get a :class:`~numpy.random.Generator` for a :class:`~numpy.random.SeedSequence`, or NumPy's global
+    random state if it is None (such that :func:`numpy.random.seed` still gives reproducible results)"""
+    return np.random.mtrand._rand if seed is None else np.random.default_rng(seed)
+
+
+def _random_integers(rng, low, high, size=None):
+    """Draw random integers in [low, high) with either a :class:`~numpy.random.Generator` or a
+    :class:`~numpy.random.RandomState`"""
+    if isinstance(rng, np.random.Generator):
+        return rng.integers(low, high, size=size)
+    return rng.randint(low, high, size=size)
+
+
+def _spawn_seed(seed_seq, *keys):
+    """Get an independent child of a :class:`~numpy.random.SeedSequence` that only depends on the (integer)
+    keys, so the same keys always give the same stream regardless of which other streams have been used"""
+    if seed_seq is None:
+        return None
+    return np.random.SeedSequence(seed_seq.entropy, spawn_key=tuple(seed_seq.spawn_key) + keys,
+                                  pool_size=seed_seq.pool_size)